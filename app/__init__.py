@@ -1,10 +1,16 @@
 import os
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_restx import Api
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from .config import Config
 from .extensions import db, ma, migrate, jwt
 from .errors import register_error_handlers
+from .compression import init_compression
+from .metrics import init_metrics
+from .tracing import init_tracing
+from .routing import register_replica_routing
+from .storage import send_upload
 
 # Global RESTX API instance (Swagger UI at /docs)
 api = Api(
@@ -16,9 +22,17 @@ api = Api(
 )
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
-    app.config.from_object(Config())
+    app.config.from_object(config or Config())
+
+    # Real client address / scheme from the reverse proxy (rate limits key on it)
+    if app.config["PROXY_FIX_X_FOR"] or app.config["PROXY_FIX_X_PROTO"]:
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app,
+            x_for=app.config["PROXY_FIX_X_FOR"],
+            x_proto=app.config["PROXY_FIX_X_PROTO"],
+        )
 
     # Make sure upoad folder exists
     os.makedirs(app.config.get("UPLOAD_FOLDER", "uploads"), exist_ok=True)
@@ -35,6 +49,37 @@ def create_app():
 
     # Global Error Handlers
     register_error_handlers(app)
+    register_replica_routing(app)
+    init_metrics(app)                                  # /metrics
+    init_tracing(app)                                  # /admin/traces
+    # after_request hooks run last-registered first: compress before metrics
+    # count response bytes, so they count bytes on the wire
+    init_compression(app)
+
+    # CLI: flask images backfill
+    from .variants import images_cli
+    app.cli.add_command(images_cli)
+
+    # JWT blocklist loader + CLI: flask tokens purge
+    from .revocation import tokens_cli
+    app.cli.add_command(tokens_cli)
+
+    # CLI: flask webhooks dispatch|purge
+    from .webhooks import webhooks_cli
+    app.cli.add_command(webhooks_cli)
+
+    # Background job runner + CLI: flask jobs enqueue|work|list|cancel
+    from .jobs import init_jobs, jobs_cli
+    init_jobs(app)
+    app.cli.add_command(jobs_cli)
+
+    # CLI: flask listings archive
+    from .archive import listings_cli
+    app.cli.add_command(listings_cli)
+
+    # CLI: flask popular refresh
+    from .popularity import popular_cli
+    app.cli.add_command(popular_cli)
 
     # Import namespaces AFTER api.init_app
     from .resources.health import health_ns
@@ -43,6 +88,10 @@ def create_app():
     from .resources.agents import agents_ns
     from .resources.messages import messages_ns
     from .resources.bookings import bookings_ns
+    from .resources.events import events_ns
+    from .resources.admin import admin_ns
+    from .resources.saved_searches import saved_searches_ns
+    from .resources.jobs import jobs_ns
 
     # IMPORTANT: mount health at root, others at prefixes
     api.add_namespace(health_ns, path="/")            # /health
@@ -51,14 +100,25 @@ def create_app():
     api.add_namespace(agents_ns, path="/agents")   
     api.add_namespace(messages_ns, path="/messages")  # /agents/...
     api.add_namespace(bookings_ns, path="/bookings")  # /bookings/...
+    api.add_namespace(events_ns, path="/events")      # /events/stream
+    api.add_namespace(admin_ns, path="/admin")        # /admin/traces
+    api.add_namespace(saved_searches_ns, path="/saved-searches")
+    api.add_namespace(jobs_ns, path="/jobs")          # /jobs/<id>
     
-    # Server uploaded images (dev only)
+    # Serve uploaded images (or hand them to the front proxy, see app/storage.py)
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        return send_upload(filename)
     
-    # Create DB (dev only)
-    with app.app_context():
+    @app.cli.command("create-tables")
+    def create_tables():
+        """Create any missing tables (run once per deploy, not per worker)."""
         db.create_all()
 
+    # Create DB (dev/test only). Production boots without touching the
+    # database so gunicorn --preload can fork workers from a clean parent.
+    if app.config["AUTO_CREATE_TABLES"]:
+        with app.app_context():
+            db.create_all()
+
     return app
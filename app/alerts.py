@@ -0,0 +1,246 @@
+"""
+Saved-search alerts for new and updated listings.
+
+Saved searches keep their filters as columns plus three bucket keys
+(lowercased city, property type, lower price bound). Matching a listing is
+one query on ix_saved_search_bucket: city_key IN (city, '') AND
+property_type_key IN (type, '') AND price_floor <= price, i.e. at most four
+index ranges, with the remaining bounds checked on those rows and the radius
+in Python. Saved searches are never re-run against the catalogue.
+
+Unlike ListingList.get (substring), a saved search's city must equal the
+listing's city, ignoring case. A search without a status only matches
+active listings.
+
+ListingList.post / ListingItem.patch only queue the listing id after their
+commit. A per-process AlertMatcher thread matches everything queued every
+SEARCH_ALERT_INTERVAL_SECONDS and records SearchAlert rows (one per search
+and listing, however often it is edited), which users read from
+GET /saved-searches/alerts. With SEARCH_ALERT_PUSH (on by default with the
+redis events backend: a memory backend only reaches streams on the matcher's
+own worker) it also pushes undelivered alerts to the users' event streams in
+batches of SEARCH_ALERT_BATCH_SIZE. Every worker runs a matcher, so a batch
+is first claimed with one UPDATE ... SET delivered_at ... RETURNING (FOR
+UPDATE SKIP LOCKED on Postgres, the WHERE clause re-checked either way), then
+sent as one "search.alerts" event per user; an alert goes out at most once,
+and a worker dying between the two loses its batch. Ids still queued when a
+worker dies are not matched.
+"""
+import atexit
+import threading
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import insert, or_, select, update
+
+from .events import publish_event
+from .extensions import db
+from .geo import haversine_km
+from .models.listing import Listing
+from .models.saved_search import SavedSearch
+from .models.search_alert import SearchAlert
+
+FILTERS = (
+    "name", "city", "property_type", "status", "min_price", "max_price",
+    "bedrooms", "bathrooms", "lat", "lng", "radius_km",
+)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def apply_filters(search, data):
+    """Copy FILTERS from `data` onto `search` and derive its bucket keys."""
+    for key in FILTERS:
+        if key in data:
+            setattr(search, key, data[key])
+    search.city_key = (search.city or "").strip().lower()
+    search.property_type_key = search.property_type or ""
+    search.price_floor = search.min_price or 0
+    return search
+
+
+def matching_searches_query(listing):
+    """Saved searches whose column filters accept `listing` (radius not applied)."""
+    price = listing.price
+    if listing.status == "active":
+        status = or_(SavedSearch.status.is_(None), SavedSearch.status == "active")
+    else:
+        status = SavedSearch.status == listing.status
+    return SavedSearch.query.filter(
+        SavedSearch.city_key.in_({"", (listing.city or "").strip().lower()}),
+        SavedSearch.property_type_key.in_({"", listing.property_type or ""}),
+        SavedSearch.price_floor <= price,
+        or_(SavedSearch.max_price.is_(None), SavedSearch.max_price >= price),
+        or_(SavedSearch.bedrooms.is_(None), SavedSearch.bedrooms <= (listing.bedrooms or 0)),
+        or_(SavedSearch.bathrooms.is_(None), SavedSearch.bathrooms <= (listing.bathrooms or 0)),
+        status,
+        SavedSearch.user_id != listing.agent_id,
+    )
+
+
+def within_radius(search, listing):
+    if search.radius_km is None or search.lat is None or search.lng is None:
+        return True
+    if listing.lat is None or listing.lng is None:
+        return False
+    return haversine_km(search.lat, search.lng, listing.lat, listing.lng) <= search.radius_km
+
+
+def match_listings(listing_ids):
+    """Record alerts for the listings' matching searches. Returns how many are new."""
+    listings = Listing.query.filter(Listing.id.in_(listing_ids)).all()
+    if not listings:
+        return 0
+    known = set(
+        db.session.execute(
+            select(SearchAlert.saved_search_id, SearchAlert.listing_id)
+            .where(SearchAlert.listing_id.in_([l.id for l in listings]))
+        ).all()
+    )
+    now = _utcnow()
+    rows = [
+        {"saved_search_id": s.id, "listing_id": l.id, "user_id": s.user_id, "created_at": now}
+        for l in listings
+        for s in matching_searches_query(l)
+        if (s.id, l.id) not in known and within_radius(s, l)
+    ]
+    if rows:
+        db.session.execute(insert(SearchAlert), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def claim_alerts(batch_size):
+    """Mark up to batch_size undelivered alerts delivered and return them (committed)."""
+    alerts = SearchAlert.__table__
+    pending = alerts.c.delivered_at.is_(None)
+    claimed = db.session.execute(
+        update(alerts)
+        .where(
+            alerts.c.id.in_(
+                select(alerts.c.id).where(pending).order_by(alerts.c.id).limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ),
+            pending,
+        )
+        .values(delivered_at=_utcnow())
+        .returning(alerts.c.id, alerts.c.saved_search_id, alerts.c.listing_id, alerts.c.user_id)
+    ).all()
+    db.session.commit()
+    return sorted(claimed)
+
+
+def deliver_alerts(batch_size):
+    """Send undelivered alerts, one event per user and batch. Returns the count."""
+    delivered = 0
+    while True:
+        batch = claim_alerts(batch_size)
+        if not batch:
+            return delivered
+
+        listings = {
+            l.id: l for l in Listing.query.filter(Listing.id.in_({a.listing_id for a in batch}))
+        }
+        by_user = {}
+        for alert in batch:
+            listing = listings.get(alert.listing_id)
+            if listing is None:
+                continue  # deleted since it matched
+            by_user.setdefault(alert.user_id, []).append({
+                "id": alert.id,
+                "saved_search_id": alert.saved_search_id,
+                "listing_id": listing.id,
+                "title": listing.title,
+                "price": listing.price,
+                "city": listing.city,
+            })
+        for user_id, user_alerts in by_user.items():
+            publish_event(user_id, "search.alerts", {"alerts": user_alerts})
+
+        delivered += len(batch)
+        if len(batch) < batch_size:
+            return delivered
+
+
+class AlertMatcher:
+    def __init__(self, app, interval_seconds=10, batch_size=500, push=False):
+        self.app = app
+        self.interval = interval_seconds
+        self.batch_size = batch_size
+        self.push = push
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="search-alerts", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, listing_id):
+        with self._lock:
+            self._pending.add(listing_id)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Match the queued listings and deliver alerts. Returns (matched, delivered)."""
+        with self._flush_lock:
+            with self._lock:
+                listing_ids, self._pending = self._pending, set()
+            with self.app.app_context():
+                try:
+                    matched = match_listings(listing_ids) if listing_ids else 0
+                    return matched, deliver_alerts(self.batch_size) if self.push else 0
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Search alert run failed; retrying later")
+                    with self._lock:
+                        self._pending |= listing_ids
+                    return 0, 0
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+
+_lock = threading.Lock()
+
+
+def get_alert_matcher():
+    """This process's AlertMatcher (None when alerts are off), started on first use."""
+    app = current_app._get_current_object()
+    if not app.config["SEARCH_ALERTS_ENABLED"]:
+        return None
+    matcher = app.extensions.get("alert_matcher")
+    if matcher is None:
+        with _lock:
+            matcher = app.extensions.get("alert_matcher")
+            if matcher is None:
+                matcher = AlertMatcher(
+                    app,
+                    interval_seconds=app.config["SEARCH_ALERT_INTERVAL_SECONDS"],
+                    batch_size=app.config["SEARCH_ALERT_BATCH_SIZE"],
+                    push=app.config["SEARCH_ALERT_PUSH"],
+                )
+                app.extensions["alert_matcher"] = matcher
+    return matcher
+
+
+def queue_listing_alerts(listing_id):
+    """Call after a listing write commits."""
+    matcher = get_alert_matcher()
+    if matcher is not None:
+        matcher.submit(listing_id)
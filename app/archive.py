@@ -0,0 +1,123 @@
+"""
+Archiving of listings that stopped being active long ago.
+
+Listings in ARCHIVE_STATUSES (sold, rented, ...) whose status last changed
+more than ARCHIVE_AFTER_DAYS ago move from `listing` to `archived_listing`
+under the same id, so the hot table and its indexes only hold what browsing
+and search normally return. Public reads see them again with
+include_archived=true.
+
+Bookings and messages keep their listing_id (which has no foreign key for
+this reason); owner checks and the agent's bookings / inbox look the id up
+in both tables. Everything derived from a listing for browsing is dropped
+with it: image rows (kept as a JSON snapshot on the archived row), daily
+view counts, popular-ranking entries and saved-search alerts.
+
+Each batch of ARCHIVE_BATCH_SIZE listings is one transaction (FOR UPDATE
+SKIP LOCKED on Postgres, so concurrent archivers take different rows). Run
+it with `flask listings archive` or as the listings.archive job.
+"""
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select
+
+from .extensions import db
+from .models.archived_listing import ArchivedListing
+from .models.listing import Listing
+from .models.listing_image import ListingImage
+from .models.listing_view import ListingViewDaily
+from .models.popular_listing import PopularListing
+from .models.search_alert import SearchAlert
+
+# rows keyed by listing_id that only exist for live listings
+DERIVED = (ListingImage, ListingViewDaily, PopularListing, SearchAlert)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def archivable_query(cutoff, statuses):
+    """Ids of listings due for the archive (served by ix_listing_status_changed)."""
+    return select(Listing.id).where(
+        Listing.status.in_(statuses), Listing.status_changed_at < cutoff
+    )
+
+
+def archive_batch(ids):
+    """Move the listings `ids` into archived_listing (no commit)."""
+    listing = Listing.__table__
+    rows = db.session.execute(select(listing).where(listing.c.id.in_(ids))).mappings().all()
+    if not rows:
+        return 0
+    images = {}
+    for img in db.session.execute(
+        select(ListingImage.listing_id, ListingImage.url, ListingImage.sha256,
+               ListingImage.size, ListingImage.variants)
+        .where(ListingImage.listing_id.in_(ids))
+        .order_by(ListingImage.id)
+    ):
+        images.setdefault(img.listing_id, []).append({
+            "url": img.url, "sha256": img.sha256, "size": img.size, "variants": img.variants,
+        })
+
+    now = _utcnow()
+    db.session.execute(insert(ArchivedListing), [
+        {**row, "images": images.get(row["id"], []), "archived_at": now} for row in rows
+    ])
+    # not left to ON DELETE CASCADE, which SQLite only applies with PRAGMA foreign_keys
+    for model in DERIVED:
+        db.session.execute(delete(model).where(model.listing_id.in_(ids)))
+    db.session.execute(delete(listing).where(listing.c.id.in_(ids)))
+    return len(rows)
+
+
+def archive_listings(days, statuses, batch_size, on_batch=None):
+    """
+    Archive everything due, one committed batch at a time. Returns the count.
+    on_batch(archived_so_far, total) runs after each batch.
+    """
+    cutoff = _utcnow() - timedelta(days=days)
+    query = archivable_query(cutoff, statuses)
+    total = db.session.scalar(select(func.count()).select_from(query.subquery()))
+    archived = 0
+    while True:
+        ids = db.session.scalars(
+            query.limit(batch_size).with_for_update(skip_locked=True)
+        ).all()
+        if not ids:
+            return archived
+        archived += archive_batch(ids)
+        db.session.commit()
+        if on_batch is not None:
+            on_batch(archived, max(total, archived))
+        if len(ids) < batch_size:
+            return archived
+
+
+listings_cli = AppGroup("listings", help="Listing maintenance.")
+
+
+@listings_cli.command("archive")
+@click.option("--days", type=float, default=None, help="Default ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", type=int, default=None, help="Default ARCHIVE_BATCH_SIZE.")
+@click.option("--dry-run", is_flag=True, help="Only count the listings due.")
+def archive(days, batch_size, dry_run):
+    """Move long-inactive listings into archived_listing."""
+    config = current_app.config
+    days = config["ARCHIVE_AFTER_DAYS"] if days is None else days
+    statuses = config["ARCHIVE_STATUSES"]
+    if dry_run:
+        query = archivable_query(_utcnow() - timedelta(days=days), statuses)
+        due = db.session.scalar(select(func.count()).select_from(query.subquery()))
+        click.echo(f"{due} listings due for the archive")
+        return
+
+    def report(done, total):
+        click.echo(f"Archived {done}/{total}")
+
+    archived = archive_listings(days, statuses, batch_size or config["ARCHIVE_BATCH_SIZE"], report)
+    click.echo(f"Archived {archived} listings")
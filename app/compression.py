@@ -0,0 +1,73 @@
+"""
+Gzip response compression, negotiated through Accept-Encoding.
+
+Buffered responses of a compressible mimetype and at least COMPRESS_MIN_SIZE
+bytes are gzipped at COMPRESS_LEVEL. Streamed responses of those mimetypes
+are compressed chunk by chunk with a sync flush after every chunk, so each
+chunk still reaches the client as soon as it is produced. Files (uploads
+are direct-passthrough and already-compressed images), Range/206 responses
+and bodies that already carry a Content-Encoding are left alone.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+# gzip container, see zlib.compressobj(wbits=...)
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush(zlib.Z_FINISH)
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def init_compression(app):
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+
+    mimetypes = set(app.config["COMPRESS_MIMETYPES"])
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in mimetypes:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or request.method == "HEAD"
+            or request.accept_encodings["gzip"] <= 0  # also matches "*"
+        ):
+            return response
+
+        level = app.config["COMPRESS_LEVEL"]
+        if response.is_streamed:
+            response.response = _gzip_stream(response.response, level)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < app.config["COMPRESS_MIN_SIZE"]:
+                return response
+            response.set_data(gzip.compress(body, compresslevel=level, mtime=0))
+
+        response.headers["Content-Encoding"] = "gzip"
+        etag, weak = response.get_etag()
+        if etag:
+            # a different representation needs a different validator
+            response.set_etag(f"{etag}-gzip", weak=weak)
+        return response
@@ -4,7 +4,43 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def env_map(name, default):
+    """Parse a "a=1,b=2" environment variable (or `default`) into a dict."""
+    pairs = (item.split("=", 1) for item in os.getenv(name, default).split(",") if "=" in item)
+    return {k.strip(): v.strip() for k, v in pairs}
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS from DB_* environment variables."""
+    options = {"pool_pre_ping": env_bool("DB_POOL_PRE_PING", True)}
+    if uri.startswith("sqlite"):
+        # SQLite uses a file lock / StaticPool; pool sizing does not apply
+        return options
+
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    )
+    timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+    if timeout_ms and uri.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    return options
+
+
 class Config:
+    # development / testing / production
+    APP_ENV = os.getenv("APP_ENV") or os.getenv("FLASK_ENV", "production")
+
+    # db.create_all() at boot is a dev convenience; production uses
+    # `flask db upgrade` / `flask create-tables` once per deploy instead
+    AUTO_CREATE_TABLES = env_bool("AUTO_CREATE_TABLES", APP_ENV in ("development", "testing"))
+
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-jwt")
 
@@ -21,6 +57,150 @@ class Config:
 
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI", DATABASE_URL)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Optional read replica for @use_replica endpoints (see app/routing.py)
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+    REPLICA_ENGINE_OPTIONS = engine_options(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else {}
+    REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
 
     # Upload folder
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+    MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", 10 * 1024 * 1024))
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 50 * 1024 * 1024))
+
+    # How /uploads is served: "flask", "x-sendfile" or "x-accel" (nginx)
+    UPLOADS_SERVE_MODE = os.getenv("UPLOADS_SERVE_MODE", "flask")
+    UPLOADS_ACCEL_PREFIX = os.getenv("UPLOADS_ACCEL_PREFIX", "/protected-uploads/")
+    UPLOADS_MAX_AGE = int(os.getenv("UPLOADS_MAX_AGE", 3600))  # non content-addressed files
+    USE_X_SENDFILE = UPLOADS_SERVE_MODE == "x-sendfile"
+
+    # Thumbnail/medium variants: "process" pool, "inline" or "off"
+    IMAGE_VARIANTS_MODE = os.getenv("IMAGE_VARIANTS_MODE", "process")
+    IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", 2))
+
+    # Message ingestion: "direct" commits per request, "batched" queues rows
+    # for a background bulk insert (see app/ingest.py)
+    MESSAGE_INGEST_MODE = os.getenv("MESSAGE_INGEST_MODE", "direct")
+    MESSAGE_BATCH_MAX_ROWS = int(os.getenv("MESSAGE_BATCH_MAX_ROWS", 500))
+    MESSAGE_BATCH_INTERVAL_MS = int(os.getenv("MESSAGE_BATCH_INTERVAL_MS", 200))
+    MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", 10000))
+    MESSAGE_RETRY_AFTER = int(os.getenv("MESSAGE_RETRY_AFTER", 2))
+
+    # Server-Sent Events (/events/stream). EVENTS_BACKEND=redis shares events
+    # across gunicorn workers (needs the `redis` package)
+    EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+    EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://localhost:6379/0")
+    EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", 500))
+    EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+    EVENTS_STREAM_MAX_SECONDS = float(os.getenv("EVENTS_STREAM_MAX_SECONDS", 300))
+    EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", 3000))
+
+    # Prometheus-style metrics endpoint (per process)
+    METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+    METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+
+    # Slow-request tracing (see app/tracing.py); /admin/* needs ADMIN_TOKEN.
+    # Bound SQL parameters are reduced to their types / lengths unless
+    # TRACE_PARAMETERS is set: they include password hashes, emails and tokens
+    TRACE_ENABLED = env_bool("TRACE_ENABLED", False)
+    TRACE_PARAMETERS = env_bool("TRACE_PARAMETERS", False)
+    TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 500))
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0))
+    TRACE_EXPLAIN = env_bool("TRACE_EXPLAIN", False)
+    TRACE_OUTPUT = os.getenv("TRACE_OUTPUT", "both")  # log / buffer / both
+    TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 100))
+    TRACE_MAX_STATEMENTS = int(os.getenv("TRACE_MAX_STATEMENTS", 200))
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+    # Revoked JWTs are mirrored in memory; other workers' revocations (logout,
+    # refresh rotation) are picked up within this many seconds
+    REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", 5))
+
+    # Password hashing policy (any werkzeug method; outdated hashes are upgraded
+    # on login) and the per-process pool that runs it (0 workers = inline)
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 32))
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+
+    # Rate limits for the public endpoints, "<name>=<count>/<second|minute|hour|day>",
+    # per JWT identity or client IP (see app/ratelimit.py). RATELIMIT_BACKEND=redis
+    # shares the counters across workers (needs the `redis` package)
+    RATELIMIT_ENABLED = env_bool("RATELIMIT_ENABLED", True)
+    # Reverse proxies in front of gunicorn (e.g. an nginx front): the client
+    # address / scheme is taken from the X-Forwarded-For / -Proto entry this
+    # many hops back. 0 (the default, as docker-compose.yml exposes gunicorn
+    # directly) ignores the headers, which clients could otherwise make up
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", 0))
+    PROXY_FIX_X_PROTO = int(os.getenv("PROXY_FIX_X_PROTO", 0))
+    RATELIMIT_BACKEND = os.getenv("RATELIMIT_BACKEND", "memory")
+    RATELIMIT_REDIS_URL = os.getenv("RATELIMIT_REDIS_URL", "redis://localhost:6379/0")
+    RATE_LIMITS = env_map(
+        "RATE_LIMITS", "login=10/minute,bookings=30/minute,messages=30/minute,search=120/minute"
+    )
+
+    # Max requests in flight per worker process, by flask_restx namespace name;
+    # more get 503 + Retry-After immediately
+    LOAD_SHED_LIMITS = {
+        k: int(v) for k, v in env_map("LOAD_SHED_LIMITS", "Auth=8,Listings=16").items()
+    }
+    LOAD_SHED_RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", 1))
+
+    # Gzip responses for clients sending Accept-Encoding: gzip (app/compression.py).
+    # Off when a front proxy already compresses.
+    COMPRESS_ENABLED = env_bool("COMPRESS_ENABLED", True)
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))  # bytes
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", 6))  # 1 (fast) .. 9 (small)
+    COMPRESS_MIMETYPES = os.getenv(
+        "COMPRESS_MIMETYPES", "application/json,text/plain,text/html,text/css,application/javascript"
+    ).split(",")
+
+    # Listing view counters, flushed per worker in one bulk UPDATE, and the
+    # precomputed /listings/popular ranking (see app/popularity.py)
+    VIEW_COUNTS_ENABLED = env_bool("VIEW_COUNTS_ENABLED", True)
+    VIEW_FLUSH_SECONDS = float(os.getenv("VIEW_FLUSH_SECONDS", 5))
+    POPULAR_REFRESH_SECONDS = float(os.getenv("POPULAR_REFRESH_SECONDS", 300))
+    POPULAR_TOP_N = int(os.getenv("POPULAR_TOP_N", 100))
+
+    # /listings/<id>/similar: per-worker NumPy feature matrix (app/similarity.py),
+    # rebuilt in the background this often to pick up other workers' writes
+    SIMILAR_RADIUS_KM = float(os.getenv("SIMILAR_RADIUS_KM", 5))
+    SIMILAR_RELOAD_SECONDS = float(os.getenv("SIMILAR_RELOAD_SECONDS", 600))
+
+    # Saved-search alerts: listing writes are matched and alerts delivered
+    # in batches by a per-worker thread (app/alerts.py)
+    SEARCH_ALERTS_ENABLED = env_bool("SEARCH_ALERTS_ENABLED", True)
+    SEARCH_ALERT_INTERVAL_SECONDS = float(os.getenv("SEARCH_ALERT_INTERVAL_SECONDS", 10))
+    SEARCH_ALERT_BATCH_SIZE = int(os.getenv("SEARCH_ALERT_BATCH_SIZE", 500))
+    # Push alerts as "search.alerts" events and mark them delivered. Only with a
+    # backend every worker's streams read; otherwise GET /saved-searches/alerts
+    # is the only delivery path
+    SEARCH_ALERT_PUSH = env_bool("SEARCH_ALERT_PUSH", EVENTS_BACKEND == "redis")
+
+    # Partner webhooks: events go to an outbox table in the write's transaction
+    # and a per-worker dispatcher delivers them in batches (app/webhooks.py)
+    WEBHOOKS_ENABLED = env_bool("WEBHOOKS_ENABLED", True)
+    WEBHOOK_INTERVAL_SECONDS = float(os.getenv("WEBHOOK_INTERVAL_SECONDS", 2))
+    WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 100))  # events per request
+    WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", 4))  # requests in flight
+    WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", 5))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 10))
+    WEBHOOK_BACKOFF_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_SECONDS", 10))
+    WEBHOOK_BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_MAX_SECONDS", 3600))
+    WEBHOOK_LEASE_SECONDS = float(os.getenv("WEBHOOK_LEASE_SECONDS", 120))
+
+    # Background jobs (app/jobs.py): every worker runs up to JOB_WORKERS jobs
+    # from the shared table; 0 leaves them to `flask jobs work` processes
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 2))
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 60))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))  # runners lost before a job fails
+    JOB_EXPORT_FOLDER = os.getenv("JOB_EXPORT_FOLDER", "exports")
+
+    # Listings in these statuses move to archived_listing this long after their
+    # last status change (app/archive.py; `flask listings archive` or the
+    # listings.archive job), in batches of ARCHIVE_BATCH_SIZE
+    ARCHIVE_STATUSES = os.getenv("ARCHIVE_STATUSES", "sold,rented,expired,inactive").split(",")
+    ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", 180))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
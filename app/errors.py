@@ -1,4 +1,4 @@
-from flask import jsonify
+from flask import current_app, jsonify
 from marshmallow import ValidationError
 from werkzeug.exceptions import HTTPException
 
@@ -32,7 +32,7 @@ def register_error_handlers(app):
     # ------------------------------
     @app.errorhandler(Exception)
     def handle_general_exception(err):
-        print(err)  # You can log this
+        current_app.logger.exception("Unhandled exception: %s", err)
         return jsonify({
             "error": "Internal Server Error",
             "message": "Something went wrong on our side",
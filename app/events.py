@@ -0,0 +1,148 @@
+"""
+Agent event fan-out for the /events/stream SSE endpoint.
+
+Writes publish small events ("message.created", "booking.created", ...) keyed
+by the receiving user's id (the owning agent's, or a saved search's owner for
+"search.alerts") after their transaction commits. Each open stream reads
+events for its user after a given event id, which is also what makes
+Last-Event-ID resume work.
+
+Backends:
+- MemoryBackend (default): per-process history + condition variable. Only
+  streams served by the same worker see the event.
+- RedisBackend: one Redis stream per agent (XADD/XREAD), shared by every
+  worker. Requires the optional `redis` package; set
+  EVENTS_BACKEND=redis and EVENTS_REDIS_URL.
+"""
+import json
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+
+class Event:
+    __slots__ = ("id", "type", "data")
+
+    def __init__(self, id, type, data):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class MemoryBackend:
+    """In-process history of the last `history` events per agent."""
+
+    def __init__(self, history=500):
+        self.history = history
+        self._cond = threading.Condition()
+        self._events = {}
+        self._last_id = 0
+
+    def _next_id(self) -> int:
+        # Seeded from the clock so ids keep increasing across restarts and a
+        # stale Last-Event-ID never hides new events
+        self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+        return self._last_id
+
+    def publish(self, agent_id, type, data):
+        with self._cond:
+            event = Event(str(self._next_id()), type, data)
+            events = self._events.get(agent_id)
+            if events is None:
+                events = self._events[agent_id] = deque(maxlen=self.history)
+            events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def latest_id(self, agent_id):
+        with self._cond:
+            events = self._events.get(agent_id)
+            return events[-1].id if events else "0"
+
+    def read(self, agent_id, last_id, timeout):
+        """Return events for `agent_id` newer than `last_id`, waiting up to `timeout`s."""
+        try:
+            last = int(last_id or 0)
+        except ValueError:
+            last = 0
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events = [e for e in self._events.get(agent_id, ()) if int(e.id) > last]
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self._cond.wait(remaining)
+
+
+class RedisBackend:
+    """Cross-worker backend on Redis streams; ids are Redis stream ids."""
+
+    def __init__(self, url, history=500):
+        import redis  # optional dependency
+
+        self.history = history
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _key(agent_id):
+        return f"events:agent:{agent_id}"
+
+    def publish(self, agent_id, type, data):
+        event_id = self._redis.xadd(
+            self._key(agent_id),
+            {"type": type, "data": json.dumps(data)},
+            maxlen=self.history,
+            approximate=True,
+        )
+        return Event(event_id, type, data)
+
+    def latest_id(self, agent_id):
+        entries = self._redis.xrevrange(self._key(agent_id), count=1)
+        return entries[0][0] if entries else "0-0"
+
+    def read(self, agent_id, last_id, timeout):
+        response = self._redis.xread(
+            {self._key(agent_id): last_id or "0-0"}, block=int(timeout * 1000)
+        )
+        events = []
+        for _stream, entries in response or ():
+            for event_id, fields in entries:
+                events.append(Event(event_id, fields["type"], json.loads(fields["data"])))
+        return events
+
+
+_lock = threading.Lock()
+
+
+def get_event_backend():
+    """Return this process's event backend, created on first use."""
+    app = current_app._get_current_object()
+    backend = app.extensions.get("events")
+    if backend is None:
+        with _lock:
+            backend = app.extensions.get("events")
+            if backend is None:
+                if app.config["EVENTS_BACKEND"] == "redis":
+                    backend = RedisBackend(
+                        app.config["EVENTS_REDIS_URL"], history=app.config["EVENTS_HISTORY"]
+                    )
+                else:
+                    backend = MemoryBackend(history=app.config["EVENTS_HISTORY"])
+                app.extensions["events"] = backend
+    return backend
+
+
+def publish_event(agent_id, type, data):
+    """Publish after a commit. Never raises: a lost event must not fail the write."""
+    try:
+        return get_event_backend().publish(agent_id, type, data)
+    except Exception:
+        current_app.logger.exception("Failed to publish %s event", type)
+        return None
@@ -3,7 +3,9 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_marshmallow import Marshmallow
 
-db = SQLAlchemy()
+from .routing import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 ma = Marshmallow()      # <-- real Marshmallow extension (has init_app)
 migrate = Migrate()
 jwt = JWTManager()
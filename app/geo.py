@@ -0,0 +1,15 @@
+"""Great-circle helpers shared by the geo search, similar listings and alerts."""
+import math
+
+R_EARTH_KM = 6371.0088
+KM_PER_DEG_LAT = math.pi * R_EARTH_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R_EARTH_KM * c
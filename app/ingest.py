@@ -0,0 +1,225 @@
+"""
+Write-behind ingestion for public message submissions.
+
+When MESSAGE_INGEST_MODE = "batched", MessageList.post validates the payload
+and hands the row to a per-process MessageIngestor instead of committing its
+own transaction. A background thread bulk-inserts whatever is queued every
+MESSAGE_BATCH_INTERVAL_MS, or sooner once MESSAGE_BATCH_MAX_ROWS are waiting.
+A full queue means the database is behind and callers get a 503 +
+Retry-After.
+
+The 202 only promises the row is queued in this process's memory: rows still
+queued when the process is killed (stop() drains the queue on a clean exit)
+are lost. When the database cannot be reached (OperationalError /
+InterfaceError), the batch is kept and retried with a backoff doubling up to
+RETRY_MAX_SECONDS, while the queue fills up towards the 503s. When a bulk
+insert fails otherwise, the batch is retried one row per transaction, so that
+only the rows the database rejects are dropped (and logged).
+"""
+import atexit
+import queue
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from .events import publish_event
+from .extensions import db
+from .models.listing import Listing
+from .models.message import Message
+from .schemas.message import MessageSchema
+from .webhooks import record_events
+
+
+# database unreachable rather than the rows being bad
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+RETRY_MAX_SECONDS = 30
+
+
+class QueueFull(Exception):
+    """Raised when the ingestion queue cannot accept more rows."""
+
+
+class MessageIngestor:
+    def __init__(self, app, max_rows=500, interval_ms=200, queue_size=10000):
+        self.app = app
+        self.max_rows = max_rows
+        self.interval = interval_ms / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._held = []  # rows taken off the queue that the database did not take
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._thread = threading.Thread(
+            target=self._run, name="message-ingestor", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, row: dict):
+        """Queue one validated Message row; raises QueueFull on backpressure."""
+        if self._stopped.is_set():
+            raise QueueFull()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            raise QueueFull()
+        if self._queue.qsize() >= self.max_rows:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._held)
+
+    def flush(self) -> int:
+        """
+        Write everything queued so far. Returns the number of rows written.
+        Stops at the first batch the database cannot take and keeps it.
+        """
+        with self._flush_lock:
+            written = 0
+            while True:
+                batch, self._held = self._held, []
+                while len(batch) < self.max_rows:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                done, held = self._write(batch)
+                written += done
+                if held:
+                    self._held = held
+                    self._backoff = min(max(self._backoff * 2, 1.0), RETRY_MAX_SECONDS)
+                    self._retry_at = time.monotonic() + self._backoff
+                    return written
+                self._backoff = 0.0
+
+    def stop(self):
+        """Stop the flusher thread and drain the queue (called at exit)."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        if self.pending():
+            self.app.logger.error("Lost %d queued messages at shutdown", self.pending())
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            if time.monotonic() < self._retry_at:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Message ingestion run failed")
+
+    def _write(self, batch):
+        """Insert a batch. Returns (rows written, rows to retry later)."""
+        with self.app.app_context():
+            try:
+                payloads, held = self._insert_batch(batch)
+                if payloads:
+                    try:
+                        self._publish(payloads)
+                    except Exception:
+                        db.session.rollback()
+                        self.app.logger.exception(
+                            "Publishing %d message events failed", len(payloads)
+                        )
+                return len(payloads), held
+            finally:
+                db.session.remove()
+
+    def _insert_batch(self, batch):
+        try:
+            return self._insert(batch), []
+        except TRANSIENT_ERRORS:
+            db.session.rollback()
+            self.app.logger.warning(
+                "Database unavailable, keeping %d queued messages for a retry",
+                len(batch), exc_info=True,
+            )
+            return [], batch
+        except Exception:
+            db.session.rollback()
+            self.app.logger.warning(
+                "Bulk insert of %d queued messages failed, retrying one by one",
+                len(batch), exc_info=True,
+            )
+
+        payloads = []
+        for i, row in enumerate(batch):
+            try:
+                payloads += self._insert([row])
+            except TRANSIENT_ERRORS:
+                db.session.rollback()
+                self.app.logger.warning(
+                    "Database unavailable, keeping %d queued messages for a retry",
+                    len(batch) - i, exc_info=True,
+                )
+                return payloads, batch[i:]
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(
+                    "Dropped a queued message for listing %s", row.get("listing_id")
+                )
+        return payloads, []
+
+    @staticmethod
+    def _insert(rows):
+        """Insert rows and their webhook events in one transaction; returns payloads."""
+        messages = db.session.scalars(insert(Message).returning(Message), rows).all()
+        payloads = MessageSchema(many=True).dump(messages)
+        record_events("message.created", payloads)  # same transaction
+        db.session.commit()
+        return payloads
+
+    @staticmethod
+    def _publish(payloads):
+        listing_ids = {p["listing_id"] for p in payloads}
+        owners = dict(
+            db.session.query(Listing.id, Listing.agent_id)
+            .filter(Listing.id.in_(listing_ids))
+            .all()
+        )
+        for p in payloads:
+            publish_event(owners.get(p["listing_id"]), "message.created", p)
+
+
+_lock = threading.Lock()
+
+
+def get_message_ingestor():
+    """
+    Return this process's MessageIngestor, or None when batching is off.
+
+    Created lazily on first use so each gunicorn worker starts its own
+    flusher thread after forking.
+    """
+    app = current_app._get_current_object()
+    if app.config.get("MESSAGE_INGEST_MODE", "direct") != "batched":
+        return None
+
+    ingestor = app.extensions.get("message_ingestor")
+    if ingestor is None:
+        with _lock:
+            ingestor = app.extensions.get("message_ingestor")
+            if ingestor is None:
+                ingestor = MessageIngestor(
+                    app,
+                    max_rows=app.config["MESSAGE_BATCH_MAX_ROWS"],
+                    interval_ms=app.config["MESSAGE_BATCH_INTERVAL_MS"],
+                    queue_size=app.config["MESSAGE_QUEUE_SIZE"],
+                )
+                app.extensions["message_ingestor"] = ingestor
+    return ingestor
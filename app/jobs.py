@@ -0,0 +1,487 @@
+"""
+Background jobs for work that does not belong on the request path (exports,
+image rendering, ranking rebuilds, purges).
+
+A job is a Job row naming a registered handler (@job("name")) and its JSON
+params. Handlers run as handler(ctx, **params) and may report progress with
+ctx.progress(done, total, message), which also raises JobCancelled once a
+cancel was requested. Their return value is stored as the JSON result.
+
+Runners claim jobs with a lease, so any number of gunicorn workers and
+`flask jobs work` processes can share the table: one UPDATE ... RETURNING
+moves queued jobs to running under the runner's lease_owner (the claim
+subquery uses FOR UPDATE SKIP LOCKED on Postgres, and the WHERE clause is
+re-checked either way). A heartbeat thread renews the leases of a runner's
+running jobs every third of JOB_LEASE_SECONDS, whether or not the handler
+reports progress and whether or not the runner has room for more; a job
+whose lease expired (its worker died) is claimed again, up to
+JOB_MAX_ATTEMPTS times, then marked failed.
+
+Each process runs at most JOB_WORKERS jobs at a time on a thread pool
+(JOB_WORKERS=0 leaves jobs to dedicated `flask jobs work` processes).
+CPU-bound handlers fan out to a process pool themselves, like
+images.render_variants.
+"""
+import atexit
+import csv
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, or_, select, update
+
+from .extensions import db
+from .models.job import Job
+
+JOBS = {}  # name -> handler(ctx, **params)
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+# progress is written at most this often (the last call always wins at the end)
+PROGRESS_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job(name):
+    """Register a job handler under `name`."""
+    def decorator(fn):
+        JOBS[name] = fn
+        return fn
+    return decorator
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(job_type, params=None, user_id=None):
+    """Queue a job (commits) and wake this worker's runner. Raises KeyError for unknown types."""
+    if job_type not in JOBS:
+        raise KeyError(job_type)
+    row = Job(type=job_type, params=json.dumps(params or {}), created_by=user_id)
+    db.session.add(row)
+    db.session.commit()
+    runner = get_job_runner()
+    if runner is not None:
+        runner.wake()
+    return row
+
+
+def request_cancel(row):
+    """Cancel a queued job now, or ask a running one to stop. False if already finished."""
+    if row.status in FINISHED:
+        return False
+    if row.status == "queued":
+        row.status, row.finished_at = "cancelled", _utcnow()
+    row.cancel_requested = True
+    db.session.commit()
+    return True
+
+
+class JobContext:
+    """Handed to handlers: params, progress reporting and cancellation."""
+
+    def __init__(self, runner, job_id):
+        self.runner = runner
+        self.job_id = job_id
+        self._last_write = 0.0
+
+    def progress(self, done, total=None, message=None):
+        """Record progress (done/total, or a 0..1 fraction) and renew the lease."""
+        now = time.monotonic()
+        if now - self._last_write < PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        fraction = done / total if total else done
+        values = {"progress": min(max(float(fraction), 0.0), 1.0)}
+        if message is not None:
+            values["message"] = message[:255]
+        if self.runner.renew(self.job_id, **values):
+            raise JobCancelled()
+
+    def check_cancelled(self):
+        if self.runner.renew(self.job_id):
+            raise JobCancelled()
+
+
+class JobRunner:
+    def __init__(self, app, workers=2, poll_seconds=2, lease_seconds=60, max_attempts=3,
+                 background=True):
+        self.app = app
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._running = {}  # job id -> future
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        # foreground runners block on their jobs, so leases are renewed from here
+        self._heartbeat_thread = threading.Thread(
+            target=self._beat, args=(lease_seconds / 3,), name="job-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+        if background:
+            self._thread = threading.Thread(target=self._run, name="job-runner", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def running(self):
+        with self._lock:
+            return len(self._running)
+
+    def run_pending(self, wait=False):
+        """Claim and start as many jobs as there are free workers. Returns their ids."""
+        with self._lock:
+            free = self.workers - len(self._running)
+        if free <= 0:
+            return []
+        with self.app.app_context():
+            try:
+                claimed = self._claim(free)
+            finally:
+                db.session.remove()
+
+        futures = []
+        for job_id, job_type, params in claimed:
+            future = self._pool.submit(self._execute, job_id, job_type, params)
+            with self._lock:
+                self._running[job_id] = future
+            future.add_done_callback(lambda _, job_id=job_id: self._done(job_id))
+            futures.append(future)
+        if wait:
+            for future in futures:
+                future.result()
+        return [job_id for job_id, _, _ in claimed]
+
+    def drain(self):
+        """Run jobs until none are left to claim (foreground runners, tests)."""
+        ran = 0
+        while True:
+            ids = self.run_pending(wait=True)
+            if not ids:
+                return ran
+            ran += len(ids)
+
+    def renew(self, job_id, **values):
+        """Extend our lease on `job_id` (plus `values`); True if a cancel was requested."""
+        jobs = Job.__table__
+        with db.engine.begin() as conn:
+            row = conn.execute(
+                update(jobs)
+                .where(jobs.c.id == job_id, jobs.c.lease_owner == self.owner)
+                .values(lease_until=_utcnow() + self.lease, **values)
+                .returning(jobs.c.cancel_requested)
+            ).first()
+        # lost the lease (another runner took over): stop as if cancelled
+        return row is None or row.cancel_requested
+
+    def stop(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        if hasattr(self, "_thread"):
+            self._thread.join(timeout=5)
+        self._heartbeat_thread.join(timeout=5)
+        # running jobs keep their lease until it expires, then are claimed again
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.run_pending()
+            except Exception:
+                self.app.logger.exception("Job runner poll failed")
+
+    def _done(self, job_id):
+        with self._lock:
+            self._running.pop(job_id, None)
+        self._wakeup.set()
+
+    def _beat(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.heartbeat()
+            except Exception:
+                self.app.logger.exception("Job lease renewal failed")
+
+    def heartbeat(self):
+        """Extend the leases of the jobs this runner is running."""
+        with self._lock:
+            ids = list(self._running)
+        if not ids:
+            return
+        jobs = Job.__table__
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(
+                    update(jobs)
+                    .where(jobs.c.id.in_(ids), jobs.c.lease_owner == self.owner,
+                           jobs.c.status == "running")
+                    .values(lease_until=_utcnow() + self.lease)
+                )
+
+    def _claim(self, limit):
+        jobs = Job.__table__
+        now = _utcnow()
+        expired = and_(jobs.c.status == "running", jobs.c.lease_until < now)
+
+        # jobs whose runner died too often are given up on
+        db.session.execute(
+            update(jobs)
+            .where(expired, jobs.c.attempts >= self.max_attempts)
+            .values(status="failed", finished_at=now, lease_owner=None,
+                    error="Runner lost (lease expired) on every attempt")
+        )
+
+        claimable = or_(
+            and_(jobs.c.status == "queued", jobs.c.cancel_requested.is_(False)),
+            expired,
+        )
+        claimed = db.session.execute(
+            update(jobs)
+            .where(
+                jobs.c.id.in_(
+                    select(jobs.c.id).where(claimable).order_by(jobs.c.id).limit(limit)
+                    .with_for_update(skip_locked=True)
+                ),
+                claimable,
+            )
+            .values(
+                status="running", lease_owner=self.owner, lease_until=now + self.lease,
+                attempts=jobs.c.attempts + 1, started_at=now,
+            )
+            .returning(jobs.c.id, jobs.c.type, jobs.c.params)
+        ).all()
+        db.session.commit()
+        return sorted(claimed)
+
+    def _execute(self, job_id, job_type, params):
+        with self.app.app_context():
+            try:
+                handler = JOBS.get(job_type)
+                if handler is None:
+                    raise LookupError(f"no handler registered for job type {job_type!r}")
+                result = handler(JobContext(self, job_id), **json.loads(params))
+                self._finish(job_id, status="succeeded", progress=1.0,
+                             result=json.dumps(result))
+            except JobCancelled:
+                db.session.rollback()
+                self._finish(job_id, status="cancelled")
+            except Exception as exc:
+                db.session.rollback()
+                self.app.logger.exception("Job %s (%s) failed", job_id, job_type)
+                self._finish(job_id, status="failed", error=f"{type(exc).__name__}: {exc}")
+            finally:
+                db.session.remove()
+
+    def _finish(self, job_id, **values):
+        jobs = Job.__table__
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(jobs)
+                .where(jobs.c.id == job_id, jobs.c.lease_owner == self.owner)
+                .values(finished_at=_utcnow(), lease_until=None, **values)
+            )
+
+
+_lock = threading.Lock()
+
+
+def get_job_runner():
+    """This process's runner (None when JOB_WORKERS is 0), started on first use."""
+    app = current_app._get_current_object()
+    if app.config["JOB_WORKERS"] <= 0:
+        return None
+    runner = app.extensions.get("job_runner")
+    if runner is None:
+        with _lock:
+            runner = app.extensions.get("job_runner")
+            if runner is None:
+                runner = new_runner(app)
+                app.extensions["job_runner"] = runner
+    return runner
+
+
+def init_jobs(app):
+    """Start each worker's runner with its first request, not its first enqueue."""
+    @app.before_request
+    def _start_job_runner():
+        get_job_runner()
+
+
+def new_runner(app, workers=None, background=True):
+    config = app.config
+    return JobRunner(
+        app,
+        workers=workers or max(config["JOB_WORKERS"], 1),
+        poll_seconds=config["JOB_POLL_SECONDS"],
+        lease_seconds=config["JOB_LEASE_SECONDS"],
+        max_attempts=config["JOB_MAX_ATTEMPTS"],
+        background=background,
+    )
+
+
+# --- built-in jobs ------------------------------------------------------------
+
+@job("listings.export")
+def export_listings(ctx, filters=None, chunk_size=1000):
+    """CSV of the listings matching the GET /listings filters, into JOB_EXPORT_FOLDER."""
+    from .models.listing import Listing
+    from .resources.listings import filtered_listings_query
+
+    columns = ["id", "title", "price", "bedrooms", "bathrooms", "property_type",
+               "status", "address", "city", "lat", "lng", "agent_id", "created_at"]
+    query = filtered_listings_query(filters or {})
+    total = query.order_by(None).count()
+
+    folder = os.path.abspath(current_app.config["JOB_EXPORT_FOLDER"])
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"listings-{ctx.job_id}.csv")
+    rows = 0
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(columns)
+        select_columns = query.with_entities(*(getattr(Listing, c) for c in columns))
+        for row in select_columns.yield_per(chunk_size):
+            writer.writerow(row)
+            rows += 1
+            if rows % chunk_size == 0:
+                ctx.progress(rows, total, f"{rows}/{total} listings")
+    return {"path": path, "rows": rows}
+
+
+@job("listings.archive")
+def archive_old_listings(ctx, days=None, batch_size=None):
+    """Move long-inactive listings into archived_listing, one batch per transaction."""
+    from .archive import archive_listings
+
+    config = current_app.config
+
+    def report(done, total):
+        ctx.progress(done, total, f"{done}/{total} listings")
+
+    archived = archive_listings(
+        config["ARCHIVE_AFTER_DAYS"] if days is None else days,
+        config["ARCHIVE_STATUSES"],
+        batch_size or config["ARCHIVE_BATCH_SIZE"],
+        report,
+    )
+    return {"archived": archived}
+
+
+@job("images.render_variants")
+def render_image_variants(ctx, workers=None):
+    """Render missing thumbnail/medium variants on a process pool."""
+    from .variants import render_missing_variants
+
+    def report(finished, total, sha256, exc):
+        ctx.progress(finished, total, f"{finished}/{total} images")
+
+    done, total = render_missing_variants(current_app._get_current_object(), workers, report)
+    return {"rendered": done, "total": total}
+
+
+@job("popular.refresh")
+def refresh_popular(ctx):
+    from .popularity import recompute_popular
+
+    recompute_popular(current_app.config["POPULAR_TOP_N"])
+    return {}
+
+
+@job("tokens.purge")
+def purge_tokens(ctx):
+    from .revocation import purge_expired
+
+    return {"deleted": purge_expired()}
+
+
+@job("webhooks.purge")
+def purge_webhook_events(ctx, days=7):
+    from .webhooks import purge_events
+
+    return {"deleted": purge_events(days)}
+
+
+# --- CLI -----------------------------------------------------------------------
+
+jobs_cli = AppGroup("jobs", help="Background jobs.")
+
+
+@jobs_cli.command("enqueue")
+@click.argument("job_type")
+@click.option("--param", "-p", multiple=True, help="key=value, value parsed as JSON when possible.")
+def enqueue_command(job_type, param):
+    """Queue a job."""
+    params = {}
+    for item in param:
+        key, _, value = item.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    try:
+        row = enqueue(job_type, params)
+    except KeyError:
+        raise click.ClickException(f"Unknown job type {job_type}; known: {', '.join(sorted(JOBS))}")
+    click.echo(f"Queued job {row.id} ({job_type})")
+
+
+@jobs_cli.command("work")
+@click.option("--workers", default=None, type=int, help="Concurrent jobs (default JOB_WORKERS).")
+@click.option("--once", is_flag=True, help="Exit when no job is left instead of polling.")
+def work(workers, once):
+    """Run jobs in the foreground."""
+    app = current_app._get_current_object()
+    runner = new_runner(app, workers, background=False)
+    try:
+        while True:
+            ran = runner.drain()
+            if once:
+                click.echo(f"Ran {ran} jobs")
+                return
+            time.sleep(runner.poll_seconds)
+    finally:
+        runner.stop()
+
+
+@jobs_cli.command("list")
+@click.option("--limit", default=20, show_default=True)
+def list_jobs(limit):
+    """Most recent jobs."""
+    for row in Job.query.order_by(Job.id.desc()).limit(limit):
+        click.echo(f"{row.id:>6} {row.type:24s} {row.status:10s} {row.progress:5.0%} {row.message or ''}")
+
+
+@jobs_cli.command("cancel")
+@click.argument("job_id", type=int)
+def cancel_command(job_id):
+    """Cancel a queued job or ask a running one to stop."""
+    row = db.session.get(Job, job_id)
+    if row is None:
+        raise click.ClickException(f"No job {job_id}")
+    if not request_cancel(row):
+        raise click.ClickException(f"Job {job_id} already {row.status}")
+    click.echo(f"Job {job_id}: {row.status}")
@@ -0,0 +1,214 @@
+"""
+Per-endpoint request and SQL metrics, exposed at /metrics (Prometheus text).
+
+Every request records latency, status, response bytes and the number/time of
+SQL statements it ran (counted through SQLAlchemy engine events). Writes go
+to a per-thread shard, so the hot path never takes a lock; /metrics merges the
+shards when scraped. Numbers are per process: scrape each gunicorn worker (or
+aggregate in Prometheus).
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Stats of the request currently handled by this thread (None outside requests)
+_current = threading.local()
+
+
+class RequestStats:
+    __slots__ = ("start", "queries", "query_time", "_query_start")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self._query_start = 0.0
+
+
+def current_request_stats():
+    return getattr(_current, "stats", None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = getattr(_current, "stats", None)
+    if stats is not None:
+        stats._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = getattr(_current, "stats", None)
+    if stats is not None:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - stats._query_start
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.sum += other.sum
+        self.count += other.count
+
+
+class Shard:
+    """Metrics written by a single thread."""
+
+    def __init__(self):
+        self.requests = {}       # (endpoint, method, status) -> count
+        self.response_bytes = {}  # endpoint -> bytes
+        self.queries = {}        # endpoint -> statements
+        self.query_seconds = {}  # endpoint -> seconds
+        self.latency = {}        # (endpoint, method) -> Histogram
+        self.query_counts = {}   # endpoint -> Histogram of statements per request
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            # once per thread, not per request
+            shard = self._local.shard = Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(self, endpoint, method, status, nbytes, stats, elapsed):
+        shard = self._shard()
+        key = (endpoint, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        shard.response_bytes[endpoint] = shard.response_bytes.get(endpoint, 0) + nbytes
+        shard.queries[endpoint] = shard.queries.get(endpoint, 0) + stats.queries
+        shard.query_seconds[endpoint] = shard.query_seconds.get(endpoint, 0.0) + stats.query_time
+
+        hist = shard.latency.get((endpoint, method))
+        if hist is None:
+            hist = shard.latency[(endpoint, method)] = Histogram(LATENCY_BUCKETS)
+        hist.observe(elapsed)
+
+        hist = shard.query_counts.get(endpoint)
+        if hist is None:
+            hist = shard.query_counts[endpoint] = Histogram(QUERY_COUNT_BUCKETS)
+        hist.observe(stats.queries)
+
+    def _merged(self):
+        with self._shards_lock:
+            shards = list(self._shards)
+        total = Shard()
+        for shard in shards:
+            for name in ("requests", "response_bytes", "queries", "query_seconds"):
+                into = getattr(total, name)
+                for k, v in getattr(shard, name).copy().items():
+                    into[k] = into.get(k, 0) + v
+            for name in ("latency", "query_counts"):
+                into = getattr(total, name)
+                for k, h in getattr(shard, name).copy().items():
+                    if k not in into:
+                        into[k] = Histogram(h.buckets)
+                    into[k].merge(h)
+        return total
+
+    def render(self) -> str:
+        m = self._merged()
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, labels, hist):
+            cumulative = 0
+            for bound, count in zip(hist.buckets + ("+Inf",), hist.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {hist.sum}")
+            lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+        header("http_requests_total", "counter", "Requests by endpoint, method and status.")
+        for (endpoint, method, status), v in sorted(m.requests.items()):
+            lines.append(
+                f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {v}'
+            )
+
+        header("http_request_duration_seconds", "histogram", "Request latency.")
+        for (endpoint, method), hist in sorted(m.latency.items()):
+            histogram("http_request_duration_seconds", f'endpoint="{endpoint}",method="{method}"', hist)
+
+        header("http_response_bytes_total", "counter", "Response body bytes.")
+        for endpoint, v in sorted(m.response_bytes.items()):
+            lines.append(f'http_response_bytes_total{{endpoint="{endpoint}"}} {v}')
+
+        header("db_queries_total", "counter", "SQL statements executed.")
+        for endpoint, v in sorted(m.queries.items()):
+            lines.append(f'db_queries_total{{endpoint="{endpoint}"}} {v}')
+
+        header("db_query_seconds_total", "counter", "Time spent in SQL statements.")
+        for endpoint, v in sorted(m.query_seconds.items()):
+            lines.append(f'db_query_seconds_total{{endpoint="{endpoint}"}} {v}')
+
+        header("db_queries_per_request", "histogram", "SQL statements per request.")
+        for endpoint, hist in sorted(m.query_counts.items()):
+            histogram("db_queries_per_request", f'endpoint="{endpoint}"', hist)
+
+        return "\n".join(lines) + "\n"
+
+
+def init_metrics(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    registry = app.extensions["metrics"] = MetricsRegistry()
+    metrics_path = app.config.get("METRICS_PATH", "/metrics")
+
+    @app.before_request
+    def start_request_metrics():
+        _current.stats = RequestStats()
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = getattr(_current, "stats", None)
+        if stats is None or request.path == metrics_path:
+            return response
+        # label by route template (one per flask_restx resource); unmatched
+        # URLs share one label so scanners cannot blow up cardinality
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        nbytes = 0 if response.is_streamed else (response.calculate_content_length() or 0)
+        registry.record(
+            endpoint, request.method, response.status_code, nbytes,
+            stats, time.perf_counter() - stats.start,
+        )
+        return response
+
+    @app.teardown_request
+    def clear_request_metrics(exc=None):
+        _current.stats = None
+
+    @app.route(metrics_path)
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
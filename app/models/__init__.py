@@ -1,4 +1,15 @@
 from .user import User
 from .listing import Listing
 from .booking import Booking
-from .message import Message
\ No newline at end of file
+from .message import Message
+from .listing_image import ListingImage
+from .revoked_token import RevokedToken
+from .listing_view import ListingViewDaily
+from .popular_listing import PopularListing
+from .saved_search import SavedSearch
+from .search_alert import SearchAlert
+from .webhook_subscription import WebhookSubscription
+from .outbox_event import OutboxEvent
+from .webhook_delivery import WebhookDelivery
+from .job import Job
+from .archived_listing import ArchivedListing
@@ -0,0 +1,40 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class ArchivedListing(db.Model):
+    """
+    A listing moved out of the hot `listing` table by app/archive.py. Keeps
+    the listing's id (bookings and messages still refer to it) and its
+    images as a JSON snapshot.
+    """
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    price = db.Column(db.Float, nullable=False)
+    bedrooms = db.Column(db.Integer)
+    bathrooms = db.Column(db.Integer)
+    property_type = db.Column(db.String(50))
+    status = db.Column(db.String(20))
+    address = db.Column(db.String(200))
+    city = db.Column(db.String(120))
+    lat = db.Column(db.Float, index=True)
+    lng = db.Column(db.Float)
+    image_urls = db.Column(db.Text, default='[]')
+    images = db.Column(db.JSON, nullable=False, default=list)  # [{"url", "sha256", "size", "variants"}]
+    views = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime)
+    status_changed_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+    # the include_archived browse (-created_at by default)
+    __table_args__ = (
+        db.Index('ix_archived_listing_status_created', 'status', 'created_at'),
+        db.Index('ix_archived_listing_created', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedListing {self.title} - {self.city}>'
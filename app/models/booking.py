@@ -3,7 +3,8 @@ from ..extensions import db
 
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False)
+    # listing or archived_listing id, hence no foreign key (app/archive.py)
+    listing_id = db.Column(db.Integer, nullable=False)
     guest_name = db.Column(db.String(120), nullable=False)
     guest_email = db.Column(db.String(120))
     start_date = db.Column(db.Date, nullable=False)
@@ -11,5 +12,10 @@ class Booking(db.Model):
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Backs the overlap check and the agent bookings list (by start date)
+    __table_args__ = (
+        db.Index('ix_booking_listing_start', 'listing_id', 'start_date'),
+    )
+
     def __repr__(self):
         return f'<Booking {self.id} for Listing {self.listing_id} by User {self.user_id}>'
\ No newline at end of file
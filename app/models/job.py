@@ -0,0 +1,34 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class Job(db.Model):
+    """
+    A background job (app/jobs.py). queued -> running -> succeeded / failed /
+    cancelled. A running job belongs to lease_owner until lease_until.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    progress = db.Column(db.Float, nullable=False, default=0)  # 0..1
+    message = db.Column(db.String(255))
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    lease_owner = db.Column(db.String(100))
+    lease_until = db.Column(db.DateTime)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    # the runners' claim scan (queued, oldest first) and the list endpoint
+    __table_args__ = (
+        db.Index('ix_job_status_id', 'status', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.type} {self.status}>'
@@ -6,7 +6,7 @@ class Listing(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
     bedrooms = db.Column(db.Integer, default=0)
     bathrooms = db.Column(db.Integer, default=0)
     property_type = db.Column(db.String(50), default='apartment')
@@ -16,9 +16,31 @@ class Listing(db.Model):
     lat = db.Column(db.Float, index=True)
     lng = db.Column(db.Float, index=True)
     image_urls = db.Column(db.Text, default='[]')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained in batches by app/popularity.py, never per request
+    views = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Set when status changes; drives archiving (app/archive.py)
+    status_changed_at = db.Column(
+        db.DateTime, default=datetime.utcnow, nullable=False, server_default=db.func.now()
+    )
 
-    agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    agent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+    # Back the default listing sort (-created_at) under the equality filters
+    __table_args__ = (
+        db.Index('ix_listing_status_created', 'status', 'created_at'),
+        db.Index('ix_listing_type_created', 'property_type', 'created_at'),
+        # the archiver's scan: given statuses, changed before the cutoff
+        db.Index('ix_listing_status_changed', 'status', 'status_changed_at'),
+        # archived listings keep their id: SQLite must never hand it out again
+        {'sqlite_autoincrement': True},
+    )
+
+    # selectin: one extra query per page of listings instead of one per listing
+    images = db.relationship(
+        'ListingImage', backref='listing', lazy='selectin',
+        cascade='all, delete-orphan', order_by='ListingImage.id',
+    )
 
     def __repr__(self):
         return f'<Listing {self.title} - {self.city}>'
\ No newline at end of file
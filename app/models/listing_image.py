@@ -0,0 +1,20 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class ListingImage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False, index=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    url = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer)
+    variants = db.Column(db.JSON(none_as_null=True))  # {"thumb": url, "medium": url}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # The same file can back many listings, but only once per listing
+    __table_args__ = (
+        db.UniqueConstraint('listing_id', 'sha256', name='uq_listing_image_sha256'),
+    )
+
+    def __repr__(self):
+        return f'<ListingImage {self.sha256[:12]} for Listing {self.listing_id}>'
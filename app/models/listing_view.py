@@ -0,0 +1,14 @@
+from ..extensions import db
+
+
+class ListingViewDaily(db.Model):
+    """Views per listing per UTC day, flushed in batches by app/popularity.py."""
+
+    listing_id = db.Column(
+        db.Integer, db.ForeignKey('listing.id', ondelete='CASCADE'), primary_key=True
+    )
+    day = db.Column(db.Date, primary_key=True, index=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ListingViewDaily {self.listing_id} {self.day}: {self.views}>'
@@ -3,13 +3,20 @@ from ..extensions import db
 
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    listing_id = db.Column(db.Integer, db.ForeignKey('listing.id'), nullable=False)
+    # listing or archived_listing id, hence no foreign key (app/archive.py)
+    listing_id = db.Column(db.Integer, nullable=False)
     name = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(50))
     content = db.Column(db.Text, nullable=False)
+    is_read = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Backs the agent inbox: per-listing scans ordered by recency
+    __table_args__ = (
+        db.Index('ix_message_listing_created', 'listing_id', 'created_at'),
+    )
+
 
     def __repr__(self):
         return f'<Message from {self.sender_id} to {self.receiver_id} regarding Listing {self.listing_id}>'
\ No newline at end of file
@@ -0,0 +1,18 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class OutboxEvent(db.Model):
+    """
+    A domain event, inserted in the same transaction as the change itself.
+    dispatched_at is set once it has been fanned out to WebhookDelivery rows.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    dispatched_at = db.Column(db.DateTime, index=True)
+
+    def __repr__(self):
+        return f'<OutboxEvent {self.id} {self.event_type}>'
@@ -0,0 +1,24 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class PopularListing(db.Model):
+    """Precomputed top-N ranking per window and city ('' = all cities)."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    window = db.Column(db.String(10), nullable=False)
+    city = db.Column(db.String(120), nullable=False, default='')
+    rank = db.Column(db.Integer, nullable=False)
+    listing_id = db.Column(
+        db.Integer, db.ForeignKey('listing.id', ondelete='CASCADE'), nullable=False
+    )
+    views = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # One ranking per (window, city); also what the endpoint reads in order
+    __table_args__ = (
+        db.UniqueConstraint('window', 'city', 'rank', name='uq_popular_listing_rank'),
+    )
+
+    def __repr__(self):
+        return f'<PopularListing {self.window} {self.city or "*"} #{self.rank}: {self.listing_id}>'
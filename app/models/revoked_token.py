@@ -0,0 +1,14 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class RevokedToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), nullable=False, unique=True)
+    token_type = db.Column(db.String(10), nullable=False)  # access / refresh
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.token_type} {self.jti}>'
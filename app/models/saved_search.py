@@ -0,0 +1,39 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class SavedSearch(db.Model):
+    """
+    A user's listing filters (the ListingList.get parameters plus an optional
+    radius around lat/lng), matched against new and updated listings.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True
+    )
+    name = db.Column(db.String(120))
+    city = db.Column(db.String(120))
+    property_type = db.Column(db.String(50))
+    status = db.Column(db.String(20))
+    min_price = db.Column(db.Float)
+    max_price = db.Column(db.Float)
+    bedrooms = db.Column(db.Integer)  # minimum
+    bathrooms = db.Column(db.Integer)  # minimum
+    lat = db.Column(db.Float)
+    lng = db.Column(db.Float)
+    radius_km = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Match buckets: lowercased city / property type ('' = any) and the lower
+    # price bound (0 = none), so a listing probes at most four index ranges
+    city_key = db.Column(db.String(120), nullable=False, default='')
+    property_type_key = db.Column(db.String(50), nullable=False, default='')
+    price_floor = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_saved_search_bucket', 'city_key', 'property_type_key', 'price_floor'),
+    )
+
+    def __repr__(self):
+        return f'<SavedSearch {self.id} of User {self.user_id}>'
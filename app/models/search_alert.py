@@ -0,0 +1,30 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class SearchAlert(db.Model):
+    """A listing that matched a saved search; delivered_at is set once sent."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    saved_search_id = db.Column(
+        db.Integer, db.ForeignKey('saved_search.id', ondelete='CASCADE'), nullable=False
+    )
+    listing_id = db.Column(
+        db.Integer, db.ForeignKey('listing.id', ondelete='CASCADE'), nullable=False
+    )
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False
+    )
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    delivered_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # a listing alerts each saved search once, however often it is edited
+        db.UniqueConstraint('saved_search_id', 'listing_id', name='uq_search_alert_listing'),
+        # the delivery batch scan (undelivered, oldest first) and the user's feed
+        db.Index('ix_search_alert_pending', 'delivered_at', 'id'),
+        db.Index('ix_search_alert_user', 'user_id', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<SearchAlert {self.saved_search_id}: Listing {self.listing_id}>'
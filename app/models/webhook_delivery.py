@@ -0,0 +1,29 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class WebhookDelivery(db.Model):
+    """One event for one subscription: pending -> delivered, or dead after the last retry."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    subscription_id = db.Column(
+        db.Integer, db.ForeignKey('webhook_subscription.id', ondelete='CASCADE'), nullable=False
+    )
+    event_id = db.Column(
+        db.Integer, db.ForeignKey('outbox_event.id', ondelete='CASCADE'), nullable=False
+    )
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lease_until = db.Column(db.DateTime)  # set while a dispatcher is sending it
+    last_error = db.Column(db.String(500))
+    delivered_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('subscription_id', 'event_id', name='uq_webhook_delivery_event'),
+        # the dispatcher's "due" scan
+        db.Index('ix_webhook_delivery_due', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<WebhookDelivery {self.event_id} -> {self.subscription_id} {self.status}>'
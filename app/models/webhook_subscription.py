@@ -0,0 +1,20 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class WebhookSubscription(db.Model):
+    """A partner endpoint receiving batches of the events it subscribed to."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), nullable=False)
+    secret = db.Column(db.String(128), nullable=False)  # HMAC-SHA256 key for X-Webhook-Signature
+    event_types = db.Column(db.String(255), nullable=False, default='*')  # comma list or '*'
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def wants(self, event_type):
+        types = {t.strip() for t in self.event_types.split(',')}
+        return '*' in types or event_type in types
+
+    def __repr__(self):
+        return f'<WebhookSubscription {self.id} {self.url}>'
@@ -0,0 +1,105 @@
+"""
+Password hashing policy and an offloaded hashing pool.
+
+PASSWORD_HASH_METHOD is any werkzeug method string, e.g. "scrypt:32768:8:1"
+(werkzeug's default) or "pbkdf2:sha256:600000". Hashes stored under another
+method or cost are replaced on the next successful login.
+
+Hashing and verification run on a small per-process thread pool
+(PASSWORD_HASH_WORKERS); hashlib's scrypt/pbkdf2 release the GIL, so a
+login burst uses at most that many cores while the request threads keep
+serving other endpoints. At most PASSWORD_HASH_QUEUE jobs may wait for a
+worker; beyond that HashQueueFull is raised and the endpoint answers 503.
+PASSWORD_HASH_WORKERS=0 hashes inline in the request thread.
+
+This needs threaded workers (gthread, as gunicorn.conf.py ships): the
+request thread still waits for its hash, so with sync workers (one thread
+per process) the pool isolates nothing and only the queue cap applies.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashQueueFull(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def normalized_method(method):
+    """The method prefix werkzeug stores for `method`, defaults filled in."""
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+def needs_rehash(stored_hash, method):
+    return stored_hash.split("$", 1)[0] != normalized_method(method)
+
+
+def _verify(stored_hash, password, method):
+    """Runs on the pool. Returns (valid, replacement hash or None)."""
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if needs_rehash(stored_hash, method):
+        return True, generate_password_hash(password, method)
+    return True, None
+
+
+class PasswordHasher:
+    def __init__(self, workers, queue_size):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashQueueFull()
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """This process's hashing pool (None when hashing inline), created on first use."""
+    app = current_app._get_current_object()
+    workers = app.config["PASSWORD_HASH_WORKERS"]
+    if workers <= 0:
+        return None
+    hasher = app.extensions.get("password_hasher")
+    if hasher is None:
+        with _lock:
+            hasher = app.extensions.get("password_hasher")
+            if hasher is None:
+                hasher = PasswordHasher(workers, app.config["PASSWORD_HASH_QUEUE"])
+                app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def _run(fn, *args):
+    hasher = get_password_hasher()
+    return fn(*args) if hasher is None else hasher.run(fn, *args)
+
+
+def hash_password(password):
+    """Hash under the current policy. May raise HashQueueFull."""
+    return _run(generate_password_hash, password, current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def verify_password(stored_hash, password):
+    """
+    Check `password` against `stored_hash`. Returns (valid, new_hash) where
+    new_hash is set when the stored hash is outdated and should be replaced.
+    May raise HashQueueFull.
+    """
+    return _run(_verify, stored_hash, password, current_app.config["PASSWORD_HASH_METHOD"])
@@ -0,0 +1,231 @@
+"""
+Listing view counters and the precomputed "popular listings" ranking.
+
+ListingItem.get only bumps an in-memory counter (record_view). A per-process
+ViewCounter thread swaps the counters out every VIEW_FLUSH_SECONDS and
+writes them with one executemany UPDATE of listing.views plus one upsert
+into the per-day ListingViewDaily table; on failure the counts are merged
+back and retried on the next flush.
+
+The same thread rebuilds the PopularListing table (top POPULAR_TOP_N per
+window and per city) when the stored ranking is older than
+POPULAR_REFRESH_SECONDS, so /listings/popular is a short indexed read.
+`flask popular refresh` rebuilds it on demand (e.g. from cron).
+"""
+import atexit
+import threading
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, delete, func, insert, literal, select, update
+
+from .extensions import db
+from .models.listing import Listing
+from .models.listing_view import ListingViewDaily
+from .models.popular_listing import PopularListing
+
+# window name -> number of UTC days, today included
+POPULAR_WINDOWS = {"1d": 1, "7d": 7, "30d": 30}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _upsert_daily(rows):
+    """Add {listing_id, day, views} rows onto ListingViewDaily."""
+    table = ListingViewDaily.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.listing_id, table.c.day],
+            set_={"views": table.c.views + stmt.excluded.views},
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:  # other databases: update, insert when missing
+        result = db.session.execute(
+            update(table)
+            .where(table.c.listing_id == row["listing_id"], table.c.day == row["day"])
+            .values(views=table.c.views + row["views"])
+        )
+        if not result.rowcount:
+            db.session.execute(insert(table), row)
+
+
+def write_view_counts(counts, day):
+    """Apply {listing_id: views} for `day` in one transaction."""
+    listing = Listing.__table__
+    # listings archived or deleted since they were viewed would fail the upsert's FK
+    live = set(db.session.scalars(select(listing.c.id).where(listing.c.id.in_(counts))))
+    counts = {lid: n for lid, n in counts.items() if lid in live}
+    if not counts:
+        return
+    db.session.execute(
+        update(listing)
+        .where(listing.c.id == bindparam("listing_id"))
+        .values(views=listing.c.views + bindparam("delta")),
+        [{"listing_id": lid, "delta": n} for lid, n in counts.items()],
+    )
+    _upsert_daily([{"listing_id": lid, "day": day, "views": n} for lid, n in counts.items()])
+    db.session.commit()
+
+
+def recompute_popular(top_n, now=None):
+    """Rebuild PopularListing for every window, overall and per city."""
+    now = now or _utcnow()
+    daily = ListingViewDaily.__table__
+    city = func.lower(func.coalesce(Listing.city, ""))
+
+    db.session.execute(delete(PopularListing))
+    for window, days in POPULAR_WINDOWS.items():
+        since = now.date() - timedelta(days=days - 1)
+        totals = (
+            select(daily.c.listing_id, func.sum(daily.c.views).label("views"))
+            .where(daily.c.day >= since)
+            .group_by(daily.c.listing_id)
+            .subquery()
+        )
+        order = (totals.c.views.desc(), totals.c.listing_id)
+        rankings = (
+            # all cities, stored under city ""
+            (literal(""), func.row_number().over(order_by=order)),
+            (city, func.row_number().over(partition_by=city, order_by=order)),
+        )
+        for city_key, rank in rankings:
+            ranked = (
+                select(
+                    city_key.label("city"),
+                    rank.label("rank"),
+                    totals.c.listing_id,
+                    totals.c.views,
+                )
+                .join(Listing, Listing.id == totals.c.listing_id)
+                .where(Listing.status == "active")  # what /listings shows by default
+                .subquery()
+            )
+            db.session.execute(
+                insert(PopularListing).from_select(
+                    ["window", "city", "rank", "listing_id", "views", "computed_at"],
+                    select(
+                        literal(window), ranked.c.city, ranked.c.rank,
+                        ranked.c.listing_id, ranked.c.views, literal(now),
+                    ).where(ranked.c.rank <= top_n),
+                )
+            )
+    db.session.commit()
+
+
+class ViewCounter:
+    def __init__(self, app, flush_seconds=5, refresh_seconds=300, top_n=100):
+        self.app = app
+        self.flush_seconds = flush_seconds
+        self.refresh_seconds = refresh_seconds
+        self.top_n = top_n
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def add(self, listing_id, n=1):
+        with self._lock:
+            self._counts[listing_id] = self._counts.get(listing_id, 0) + n
+
+    def pending(self):
+        with self._lock:
+            return sum(self._counts.values())
+
+    def flush(self):
+        """Write the counted views. Returns the number of views written."""
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, {}
+            if not counts:
+                return 0
+            with self.app.app_context():
+                try:
+                    write_view_counts(counts, _utcnow().date())
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("View count flush failed; retrying later")
+                    for listing_id, n in counts.items():
+                        self.add(listing_id, n)
+                    return 0
+                finally:
+                    db.session.remove()
+            return sum(counts.values())
+
+    def refresh_ranking_if_stale(self):
+        with self.app.app_context():
+            try:
+                latest = db.session.query(func.max(PopularListing.computed_at)).scalar()
+                if latest is None or latest <= _utcnow() - timedelta(seconds=self.refresh_seconds):
+                    recompute_popular(self.top_n)
+            except Exception:
+                # e.g. another worker rebuilt it at the same moment
+                db.session.rollback()
+                self.app.logger.warning("Popular listings refresh skipped", exc_info=True)
+            finally:
+                db.session.remove()
+
+    def stop(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_seconds):
+            self.flush()
+            self.refresh_ranking_if_stale()
+
+
+_lock = threading.Lock()
+
+
+def get_view_counter():
+    """This process's ViewCounter (None when disabled), started on first use."""
+    app = current_app._get_current_object()
+    if not app.config["VIEW_COUNTS_ENABLED"]:
+        return None
+    counter = app.extensions.get("view_counter")
+    if counter is None:
+        with _lock:
+            counter = app.extensions.get("view_counter")
+            if counter is None:
+                counter = ViewCounter(
+                    app,
+                    flush_seconds=app.config["VIEW_FLUSH_SECONDS"],
+                    refresh_seconds=app.config["POPULAR_REFRESH_SECONDS"],
+                    top_n=app.config["POPULAR_TOP_N"],
+                )
+                app.extensions["view_counter"] = counter
+    return counter
+
+
+def record_view(listing_id):
+    counter = get_view_counter()
+    if counter is not None:
+        counter.add(listing_id)
+
+
+popular_cli = AppGroup("popular", help="Listing view counts and rankings.")
+
+
+@popular_cli.command("refresh")
+def refresh():
+    """Rebuild the popular listings ranking now."""
+    recompute_popular(current_app.config["POPULAR_TOP_N"])
+    click.echo(f"Ranked {PopularListing.query.count()} entries")
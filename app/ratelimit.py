@@ -0,0 +1,225 @@
+"""
+Rate limiting and load shedding for the expensive public endpoints.
+
+@rate_limit("login") applies the sliding-window limit RATE_LIMITS["login"]
+(e.g. "10/minute") per client: the JWT identity when a valid token is sent,
+otherwise the client IP (behind the proxies counted in PROXY_FIX_X_FOR, the
+address they report in X-Forwarded-For; see create_app). Over the limit the request gets 429 with
+Retry-After. The window is approximated from two fixed windows (previous
+count weighted by its overlap + current count), so each key costs two
+counters instead of a log of timestamps.
+
+Backends:
+- MemoryBackend (default): per-process counters. With N gunicorn workers a
+  client effectively gets up to N times the limit.
+- RedisBackend: counters shared by every worker, checked and incremented
+  in one Lua script so concurrent requests cannot all pass on the same read.
+  Requires the optional `redis` package; set RATELIMIT_BACKEND=redis and
+  RATELIMIT_REDIS_URL.
+
+@shed_load(namespace) caps the requests in flight per process for a
+flask_restx namespace at LOAD_SHED_LIMITS[namespace.name]; beyond that the
+request is answered 503 with Retry-After right away instead of queueing
+behind the busy ones. Only meaningful with threaded workers (gthread).
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limit(spec):
+    """Parse "10/minute" into (10, 60) and "5/30s" into (5, 30)."""
+    count, _, period = spec.partition("/")
+    period = period.strip().lower()
+    if period.endswith("s") and period[:-1].isdigit():
+        seconds = int(period[:-1])
+    else:
+        seconds = PERIODS[period.rstrip("s")]
+    return int(count), seconds
+
+
+class MemoryBackend:
+    """Per-process sliding-window counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = {}  # key -> [window index, current count, previous count]
+        self._calls = 0
+
+    def hit(self, key, limit, period, now=None):
+        """Count one request; return (allowed, seconds until a retry can pass)."""
+        now = time.time() if now is None else now
+        index, offset = divmod(now, period)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or window[0] < index - 1:
+                window = self._windows[key] = [index, 0, 0]
+            elif window[0] == index - 1:
+                window[:] = [index, 0, window[1]]
+
+            weight = 1 - offset / period
+            used = window[2] * weight + window[1]
+            if used >= limit:
+                return False, _retry_after(window[2], window[1], limit, offset, period)
+            window[1] += 1
+
+            self._calls += 1
+            if self._calls % 1000 == 0:
+                self._prune(index)
+        return True, 0
+
+    def _prune(self, index):
+        for key in [k for k, w in self._windows.items() if w[0] < index - 1]:
+            del self._windows[key]
+
+
+# KEYS: current window, previous window; ARGV: previous window weight, limit,
+# ttl. Returns {allowed, current count, previous count}.
+HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[1]) + current >= tonumber(ARGV[2]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, current, previous}
+"""
+
+
+class RedisBackend:
+    """Sliding-window counters shared through Redis (one atomic script per hit)."""
+
+    def __init__(self, url):
+        import redis  # optional dependency
+
+        self._redis = redis.Redis.from_url(url)
+        self._hit = self._redis.register_script(HIT_SCRIPT)
+
+    def hit(self, key, limit, period, now=None):
+        now = time.time() if now is None else now
+        index, offset = divmod(now, period)
+        current_key = f"ratelimit:{key}:{int(index)}"
+        previous_key = f"ratelimit:{key}:{int(index) - 1}"
+
+        allowed, current, previous = self._hit(
+            keys=[current_key, previous_key],
+            args=[repr(1 - offset / period), limit, int(period * 2)],
+        )
+        if not allowed:
+            return False, _retry_after(previous, current, limit, offset, period)
+        return True, 0
+
+
+def _retry_after(previous, current, limit, offset, period):
+    """Seconds until the weighted count drops below the limit again."""
+    if current >= limit or previous == 0:
+        # only the next window helps
+        return max(1, math.ceil(period - offset))
+    # previous * (1 - t / period) + current < limit
+    t = period * (1 - (limit - current) / previous)
+    return max(1, math.ceil(t - offset))
+
+
+_lock = threading.Lock()
+
+
+def get_rate_limit_backend():
+    """Return this process's rate limit backend, created on first use."""
+    app = current_app._get_current_object()
+    backend = app.extensions.get("ratelimit")
+    if backend is None:
+        with _lock:
+            backend = app.extensions.get("ratelimit")
+            if backend is None:
+                if app.config["RATELIMIT_BACKEND"] == "redis":
+                    backend = RedisBackend(app.config["RATELIMIT_REDIS_URL"])
+                else:
+                    backend = MemoryBackend()
+                app.extensions["ratelimit"] = backend
+    return backend
+
+
+def client_key():
+    """JWT identity when a valid token is sent, else the remote address."""
+    try:
+        if verify_jwt_in_request(optional=True):
+            return f"user:{get_jwt_identity()}"
+    except Exception:
+        pass  # invalid/expired tokens are limited by IP; the endpoint rejects them
+    return f"ip:{request.remote_addr}"
+
+
+def rate_limit(name):
+    """Limit the decorated resource method to RATE_LIMITS[name] per client."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            spec = config["RATE_LIMITS"].get(name)
+            if not config["RATELIMIT_ENABLED"] or not spec:
+                return fn(*args, **kwargs)
+
+            limit, period = parse_limit(spec)
+            try:
+                allowed, retry_after = get_rate_limit_backend().hit(
+                    f"{name}:{client_key()}", limit, period
+                )
+            except Exception:
+                # a broken shared backend must not take the endpoint down
+                current_app.logger.exception("Rate limit backend failed")
+                return fn(*args, **kwargs)
+
+            if not allowed:
+                return (
+                    {"message": "Too many requests, please retry later"},
+                    429,
+                    {"Retry-After": str(retry_after), "X-RateLimit-Limit": spec},
+                )
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _slots(app, pool, limit):
+    slots = app.extensions.setdefault("load_shed", {})
+    semaphore = slots.get(pool)
+    if semaphore is None:
+        with _lock:
+            semaphore = slots.get(pool)
+            if semaphore is None:
+                semaphore = slots[pool] = threading.BoundedSemaphore(limit)
+    return semaphore
+
+
+def shed_load(namespace):
+    """503 instead of queueing when the namespace's in-flight limit is reached."""
+    pool = namespace.name
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            app = current_app._get_current_object()
+            limit = app.config["LOAD_SHED_LIMITS"].get(pool)
+            if not limit:
+                return fn(*args, **kwargs)
+
+            semaphore = _slots(app, pool, limit)
+            if not semaphore.acquire(blocking=False):
+                return (
+                    {"message": "Server busy, please retry"},
+                    503,
+                    {"Retry-After": str(app.config["LOAD_SHED_RETRY_AFTER"])},
+                )
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                semaphore.release()
+        return wrapper
+    return decorator
@@ -0,0 +1,115 @@
+import hmac
+import secrets
+
+from flask import current_app, request
+from flask_restx import Namespace, Resource, fields
+from sqlalchemy import func
+
+from ..extensions import db
+from ..models.webhook_delivery import WebhookDelivery
+from ..models.webhook_subscription import WebhookSubscription
+from ..tracing import recent_traces
+from ..webhooks import EVENT_TYPES
+
+admin_ns = Namespace("admin", description="Operational endpoints (X-Admin-Token)")
+
+
+def admin_allowed() -> bool:
+    token = current_app.config.get("ADMIN_TOKEN")
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+
+@admin_ns.route("/traces")
+class TraceList(Resource):
+    @admin_ns.doc(params={"limit": "Max traces to return (newest first)"})
+    @admin_ns.response(200, "Recent slow/sampled request traces")
+    @admin_ns.response(403, "Admin token required")
+    def get(self):
+        """Recent slow or sampled request traces (SQL, parameters, plans)"""
+        if not admin_allowed():
+            return {"message": "Admin token required"}, 403
+
+        limit = request.args.get("limit", type=int)
+        items = recent_traces(limit)
+        return {"items": items, "count": len(items)}
+
+
+webhook_in = admin_ns.model("WebhookSubscriptionIn", {
+    "url": fields.String(required=True, example="https://partner.example.com/hooks/listings"),
+    "event_types": fields.List(fields.String, example=["listing.created"],
+                               description="Default: all (" + ", ".join(EVENT_TYPES) + ")"),
+    "secret": fields.String(description="HMAC key; generated when omitted"),
+})
+
+
+def subscription_data(s, counts=None):
+    data = {
+        "id": s.id,
+        "url": s.url,
+        "event_types": s.event_types.split(","),
+        "is_active": s.is_active,
+        "created_at": s.created_at.isoformat() if s.created_at else None,
+    }
+    if counts is not None:
+        data["deliveries"] = counts.get(s.id, {})
+    return data
+
+
+@admin_ns.route("/webhooks")
+class WebhookSubscriptionList(Resource):
+    @admin_ns.response(403, "Admin token required")
+    def get(self):
+        """Webhook subscriptions with their delivery counts by status"""
+        if not admin_allowed():
+            return {"message": "Admin token required"}, 403
+
+        counts = {}
+        for subscription_id, status, n in (
+            db.session.query(WebhookDelivery.subscription_id, WebhookDelivery.status, func.count())
+            .group_by(WebhookDelivery.subscription_id, WebhookDelivery.status)
+        ):
+            counts.setdefault(subscription_id, {})[status] = n
+        subscriptions = WebhookSubscription.query.order_by(WebhookSubscription.id).all()
+        return {"items": [subscription_data(s, counts) for s in subscriptions]}
+
+    @admin_ns.expect(webhook_in, validate=True)
+    @admin_ns.response(201, "Subscription created; the secret is only returned here")
+    @admin_ns.response(400, "Unknown event type")
+    @admin_ns.response(403, "Admin token required")
+    def post(self):
+        """Subscribe a partner URL to events"""
+        if not admin_allowed():
+            return {"message": "Admin token required"}, 403
+
+        data = request.get_json() or {}
+        types = data.get("event_types") or ["*"]
+        unknown = set(types) - set(EVENT_TYPES) - {"*"}
+        if unknown:
+            return {"message": f"Unknown event types: {', '.join(sorted(unknown))}"}, 400
+
+        subscription = WebhookSubscription(
+            url=data["url"],
+            event_types=",".join(types),
+            secret=data.get("secret") or secrets.token_hex(32),
+        )
+        db.session.add(subscription)
+        db.session.commit()
+        return {**subscription_data(subscription), "secret": subscription.secret}, 201
+
+
+@admin_ns.route("/webhooks/<int:subscription_id>")
+class WebhookSubscriptionItem(Resource):
+    @admin_ns.response(403, "Admin token required")
+    @admin_ns.response(404, "Subscription not found")
+    def delete(self, subscription_id):
+        """Deactivate a subscription; its pending deliveries are dropped"""
+        if not admin_allowed():
+            return {"message": "Admin token required"}, 403
+
+        subscription = db.session.get(WebhookSubscription, subscription_id)
+        if subscription is None:
+            return {"message": "Subscription not found"}, 404
+        subscription.is_active = False
+        db.session.commit()
+        return {"message": "deactivated"}
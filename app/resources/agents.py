@@ -1,10 +1,15 @@
 from flask import request
 from flask_restx import Namespace, Resource
-from sqlalchemy import or_
+from sqlalchemy import func, or_
 
+from ..extensions import db
+from ..models.archived_listing import ArchivedListing
+from ..models.listing import Listing
 from ..models.user import User
+from ..routing import use_replica
 from ..schemas.user import UserSchema
-from ..schemas.listing import ListingSchema
+from ..schemas.listing import ArchivedListingSchema, ListingSchema
+from .listings import include_archived, listing_conditions
 
 # 🔹 RESTX Namespace
 agents_ns = Namespace("agents", description="Agents & profiles")
@@ -12,10 +17,12 @@ agents_ns = Namespace("agents", description="Agents & profiles")
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
 listings_schema = ListingSchema(many=True)
+archived_listings_schema = ArchivedListingSchema(many=True)
 
 
 @agents_ns.route("")
 class AgentList(Resource):
+    @use_replica
     def get(self):
         """
         List agents (with optional search)
@@ -44,10 +51,20 @@ class AgentList(Resource):
 
         paged = q.paginate(page=page, per_page=per_page, error_out=False)
 
+        # one grouped COUNT of active listings for the whole page instead of
+        # loading agent.listings for every agent
+        ids = [agent.id for agent in paged.items]
+        counts = dict(
+            db.session.query(Listing.agent_id, func.count(Listing.id))
+            .filter(Listing.agent_id.in_(ids), Listing.status == "active")
+            .group_by(Listing.agent_id)
+            .all()
+        ) if ids else {}
+
         items = []
         for agent in paged.items:
             data = user_schema.dump(agent)
-            data["listing_count"] = len(agent.listings or [])
+            data["listing_count"] = counts.get(agent.id, 0)
             items.append(data)
 
         return {
@@ -60,14 +77,29 @@ class AgentList(Resource):
 
 @agents_ns.route("/<int:agent_id>")
 class AgentDetail(Resource):
+    @agents_ns.doc(params={
+        "status": "Filter the listings by status (default active; empty for any)",
+        "include_archived": "Also archived listings, any status unless given (1/true)",
+    })
     def get(self, agent_id: int):
-        """Get agent profile plus their listings"""
+        """Get agent profile plus their listings (as filtered on /listings)"""
         agent = User.query.filter_by(id=agent_id, is_agent=True).first()
         if not agent:
             return {"message": "Agent not found"}, 404
 
+        args = request.args
         agent_data = user_schema.dump(agent)
-        listings_data = listings_schema.dump(agent.listings or [])
+        listings_data = listings_schema.dump(
+            Listing.query.filter(Listing.agent_id == agent.id, *listing_conditions(Listing, args))
+            .order_by(Listing.id)
+        )
+        if include_archived(args):
+            listings_data += archived_listings_schema.dump(
+                ArchivedListing.query.filter(
+                    ArchivedListing.agent_id == agent.id,
+                    *listing_conditions(ArchivedListing, args),
+                ).order_by(ArchivedListing.id)
+            )
         return {"agent": agent_data, "listings": listings_data}
 
     
\ No newline at end of file
@@ -1,10 +1,19 @@
-from flask import request
+from flask import current_app, request
 from flask_restx import Namespace, Resource, fields
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    get_jwt,
+    get_jwt_identity,
+    jwt_required,
+)
 
 from ..extensions import db
+from ..ratelimit import rate_limit, shed_load
+from ..revocation import revoke_token
 from ..models.user import User
+from ..passwords import HashQueueFull, hash_password, verify_password
 from ..schemas.user import UserSchema
 
 auth_ns = Namespace('Auth', description='Authentication operations')    
@@ -26,11 +35,29 @@ login_model = auth_ns.model("Login", {
     "password": fields.String(required=True, example="password123"),
 })
 
+logout_model = auth_ns.model("Logout", {
+    "refresh_token": fields.String(description="Also revoke this refresh token"),
+})
+
+
+def issue_tokens(user):
+    return {
+        "access_token": create_access_token(identity=user.id),
+        "refresh_token": create_refresh_token(identity=user.id),
+    }
+
+
+def busy():
+    retry_after = current_app.config["PASSWORD_HASH_RETRY_AFTER"]
+    return {"message": "Too many sign-ins right now, please retry"}, 503, {"Retry-After": str(retry_after)}
+
+
 @auth_ns.route('/register')
 class Register(Resource):
     @auth_ns.expect(register_model, validate=True)
     @auth_ns.response(201, 'User registered successfully')
     @auth_ns.response(400, 'Validation Error')
+    @auth_ns.response(503, 'Password hashing queue full, retry later')
     def post(self):
         """Register a new user"""
         data = request.get_json() or {}
@@ -38,19 +65,22 @@ class Register(Resource):
             return {"message": "name, email, password required"}, 400
         if User.query.filter_by(email=data["email"]).first():
             return {"message": "Email already registered"}, 400
+        try:
+            password_hash = hash_password(data["password"])
+        except HashQueueFull:
+            return busy()
         user = User(
         name=data["name"],
         email=data["email"],
         phone=data.get("phone"),
-        password_hash=generate_password_hash(data["password"]),
+        password_hash=password_hash,
         is_agent=bool(data.get("is_agent", False)),
         bio=data.get("bio"),
         company=data.get("company"),
         )
         db.session.add(user)
         db.session.commit()
-        token = create_access_token(identity=user.id)
-        return {"access_token": token, "user": user_schema.dump(user)}, 201
+        return {**issue_tokens(user), "user": user_schema.dump(user)}, 201
 
 
 @auth_ns.route('/login')
@@ -58,12 +88,63 @@ class Login(Resource):
     @auth_ns.expect(login_model, validate=True)
     @auth_ns.response(200, 'Login successful')
     @auth_ns.response(401, 'Invalid credentials')
+    @auth_ns.response(429, 'Too many login attempts')
+    @auth_ns.response(503, 'Server busy, retry later')
+    @rate_limit("login")
+    @shed_load(auth_ns)
     def post(self):
         """Logi and return access token"""
         data = request.get_json() or {}
         user = User.query.filter_by(email=data.get("email")).first()
-        if not user or not check_password_hash(user.password_hash, data.get("password", "")):
+        if not user:
+            return {"message": "Invalid credentials"}, 401
+        try:
+            valid, new_hash = verify_password(user.password_hash, data.get("password", ""))
+        except HashQueueFull:
+            return busy()
+        if not valid:
             return {"message": "Invalid credentials"}, 401
-        token = create_access_token(identity=user.id)
-        return {"access_token": token, "user": user_schema.dump(user)}
+        if new_hash:
+            # stored under an outdated method/cost: upgrade while we know the password
+            user.password_hash = new_hash
+            db.session.commit()
+        return {**issue_tokens(user), "user": user_schema.dump(user)}
+
+
+@auth_ns.route('/refresh')
+class Refresh(Resource):
+    @jwt_required(refresh=True)
+    @auth_ns.response(200, 'New access and refresh tokens')
+    @auth_ns.response(401, 'Refresh token missing, expired or revoked')
+    def post(self):
+        """Exchange a refresh token for new tokens (the old refresh token is revoked)"""
+        identity = get_jwt_identity()
+        if not revoke_token(get_jwt()):
+            # another refresh with this token got there first
+            return {"message": "token revoked"}, 401
+        return {
+            "access_token": create_access_token(identity=identity),
+            "refresh_token": create_refresh_token(identity=identity),
+        }
+
+
+@auth_ns.route('/logout')
+class Logout(Resource):
+    @jwt_required()
+    @auth_ns.expect(logout_model)
+    @auth_ns.response(200, 'Tokens revoked')
+    def post(self):
+        """Revoke the current access token (and optionally a refresh token)"""
+        revoke_token(get_jwt())
+
+        refresh = (request.get_json(silent=True) or {}).get("refresh_token")
+        if refresh:
+            try:
+                payload = decode_token(refresh)
+            except Exception:
+                return {"message": "Invalid refresh token"}, 400
+            if payload.get("type") != "refresh" or payload["sub"] != get_jwt_identity():
+                return {"message": "Invalid refresh token"}, 400
+            revoke_token(payload)
+        return {"message": "logged out"}
 
@@ -2,13 +2,17 @@ from datetime import datetime, date
 
 from flask import request
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 
+from ..events import publish_event
 from ..extensions import db
 from ..models.booking import Booking
 from ..models.listing import Listing
-from ..models.user import User
+from ..ratelimit import rate_limit
 from ..schemas.booking import BookingSchema
+from ..tracing import span
+from ..webhooks import record_event
+from .common import agent_listing_ids, current_user, load_owned
 
 bookings_ns = Namespace("bookings", description="Bookings & viewing requests")
 
@@ -16,18 +20,30 @@ booking_schema = BookingSchema()
 bookings_schema = BookingSchema(many=True)
 
 
-def current_user():
-    uid = get_jwt_identity()
-    return User.query.get(uid) if uid else None
-
-
 def parse_date(value: str) -> date:
     return datetime.strptime(value, "%Y-%m-%d").date()
 
 
-def ranges_overlap(a_start: date, a_end: date, b_start: date, b_end: date) -> bool:
-    """Return True if two inclusive ranges [a_start, a_end] and [b_start, b_end] overlap."""
-    return not (a_end < b_start or b_end < a_start)
+def overlapping_booking_query(listing_id: int, start: date, end: date):
+    """Active bookings of a listing overlapping the inclusive range [start, end]."""
+    return Booking.query.filter(
+        Booking.listing_id == listing_id,
+        Booking.start_date <= end,
+        Booking.end_date >= start,
+        Booking.status.in_(["pending", "confirmed"]),
+    ).order_by(Booking.start_date)
+
+
+def agent_bookings_query(agent_id: int, status: str = None):
+    """Bookings on the agent's listings (archived ones too), latest start date first."""
+    q = (
+        db.session.query(Booking)
+        .filter(Booking.listing_id.in_(agent_listing_ids(agent_id)))
+        .order_by(Booking.start_date.desc())
+    )
+    if status:
+        q = q.filter(Booking.status == status)
+    return q
 
 
 # Swagger models
@@ -50,6 +66,8 @@ class BookingList(Resource):
     @bookings_ns.response(201, "Booking created")
     @bookings_ns.response(400, "Validation error")
     @bookings_ns.response(404, "Listing not found")
+    @bookings_ns.response(429, "Too many requests")
+    @rate_limit("bookings")
     def post(self):
         """Create a booking request for a listing (public)"""
         data = request.get_json() or {}
@@ -68,17 +86,12 @@ class BookingList(Resource):
             return {"message": "end_date cannot be before start_date"}, 400
 
         # Check for overlap with existing bookings for this listing
-        existing = Booking.query.filter(
-            Booking.listing_id == listing.id,
-            Booking.status.in_(["pending", "confirmed"]),
-        ).all()
-
-        for b in existing:
-            if ranges_overlap(start, end, b.start_date, b.end_date):
-                return {
-                    "message": "Dates not available for this listing",
-                    "conflict": booking_schema.dump(b),
-                }, 400
+        conflict = overlapping_booking_query(listing.id, start, end).first()
+        if conflict:
+            return {
+                "message": "Dates not available for this listing",
+                "conflict": booking_schema.dump(conflict),
+            }, 400
 
         booking = Booking(
             listing_id=listing.id,
@@ -88,10 +101,15 @@ class BookingList(Resource):
             end_date=end,
             status="pending",
         )
+        agent_id = listing.agent_id  # read before commit expires the listing
         db.session.add(booking)
+        db.session.flush()  # assigns the id for the outbox payload
+        data = booking_schema.dump(booking)
+        record_event("booking.created", data)
         db.session.commit()
 
-        return booking_schema.dump(booking), 201
+        publish_event(agent_id, "booking.created", data)
+        return data, 201
 
     @jwt_required()
     @bookings_ns.doc(params={
@@ -112,20 +130,14 @@ class BookingList(Resource):
         per_page = min(int(args.get("per_page", 20)), 100)
         status = args.get("status")
 
-        # bookings joined to listings, filtered by agent
-        q = (
-            db.session.query(Booking)
-            .join(Listing, Booking.listing_id == Listing.id)
-            .filter(Listing.agent_id == user.id)
-            .order_by(Booking.start_date.desc())
-        )
-        if status:
-            q = q.filter(Booking.status == status)
-
+        q = agent_bookings_query(user.id, status)
         paged = q.paginate(page=page, per_page=per_page, error_out=False)
 
+        with span("serialize"):
+            items = bookings_schema.dump(paged.items)
+
         return {
-            "items": bookings_schema.dump(paged.items),
+            "items": items,
             "total": paged.total,
             "page": page,
             "per_page": per_page,
@@ -140,17 +152,9 @@ class BookingDetail(Resource):
     @bookings_ns.response(404, "Booking not found")
     def get(self, booking_id: int):
         """Get a booking (only owning agent can view)"""
-        user = current_user()
-        if not user or not user.is_agent:
-            return {"message": "Agents only"}, 403
-
-        booking = Booking.query.get(booking_id)
-        if not booking:
-            return {"message": "Booking not found"}, 404
-
-        listing = Listing.query.get(booking.listing_id)
-        if not listing or listing.agent_id != user.id:
-            return {"message": "Forbidden"}, 403
+        booking, error = load_owned(Booking, booking_id, "Booking not found")
+        if error:
+            return error
 
         return booking_schema.dump(booking)
 
@@ -161,17 +165,9 @@ class BookingDetail(Resource):
     @bookings_ns.response(404, "Booking not found")
     def patch(self, booking_id: int):
         """Update booking status (owning agent only)"""
-        user = current_user()
-        if not user or not user.is_agent:
-            return {"message": "Agents only"}, 403
-
-        booking = Booking.query.get(booking_id)
-        if not booking:
-            return {"message": "Booking not found"}, 404
-
-        listing = Listing.query.get(booking.listing_id)
-        if not listing or listing.agent_id != user.id:
-            return {"message": "Forbidden"}, 403
+        booking, error = load_owned(Booking, booking_id, "Booking not found")
+        if error:
+            return error
 
         data = request.get_json() or {}
         new_status = data.get("status")
@@ -0,0 +1,51 @@
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import func, select
+
+from ..extensions import db
+from ..models.archived_listing import ArchivedListing
+from ..models.listing import Listing
+from ..models.user import User
+
+
+def current_user():
+    """Return the current logged-in user (or None)."""
+    uid = get_jwt_identity()
+    return db.session.get(User, uid) if uid else None
+
+
+def load_owned(model, pk, not_found="Not found", forbidden="Forbidden"):
+    """
+    Fetch `model` by primary key together with the owning agent in ONE query.
+
+    `model` is either Listing itself or a model with a `listing_id` column
+    (Booking, Message), whose listing may be live or archived. Returns
+    (obj, None) when the current JWT identity owns the listing, otherwise
+    (None, (body, status)) ready to return from a Resource method.
+    """
+    uid = get_jwt_identity()
+
+    if model is Listing:
+        obj = db.session.get(Listing, pk)
+        agent_id = obj.agent_id if obj else None
+    else:
+        row = (
+            db.session.query(model, func.coalesce(Listing.agent_id, ArchivedListing.agent_id))
+            .outerjoin(Listing, model.listing_id == Listing.id)
+            .outerjoin(ArchivedListing, model.listing_id == ArchivedListing.id)
+            .filter(model.id == pk)
+            .first()
+        )
+        obj, agent_id = row if row else (None, None)
+
+    if obj is None:
+        return None, ({"message": not_found}, 404)
+    if uid is None or agent_id != uid:
+        return None, ({"message": forbidden}, 403)
+    return obj, None
+
+
+def agent_listing_ids(agent_id):
+    """Ids of the agent's live and archived listings, for `listing_id IN (...)`."""
+    return select(Listing.id).where(Listing.agent_id == agent_id).union_all(
+        select(ArchivedListing.id).where(ArchivedListing.agent_id == agent_id)
+    )
@@ -0,0 +1,62 @@
+import time
+
+from flask import Response, current_app, request, stream_with_context
+from flask_restx import Namespace, Resource
+from flask_jwt_extended import jwt_required
+
+from ..events import get_event_backend
+from ..extensions import db
+from .common import current_user
+
+events_ns = Namespace("events", description="Real-time user notifications (SSE)")
+
+
+@events_ns.route("/stream")
+class EventStream(Resource):
+    @jwt_required()
+    @events_ns.doc(params={
+        "last_event_id": "Resume after this event id (same as the Last-Event-ID header)",
+    })
+    @events_ns.response(200, "text/event-stream of message.created / booking.* / search.alerts events")
+    @events_ns.response(404, "User not found")
+    def get(self):
+        """Stream the current user's events: their listings' messages and bookings, search alerts"""
+        user = current_user()
+        if not user:
+            return {"message": "User not found"}, 404
+
+        user_id = user.id  # events are keyed by the receiving user's id
+        last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        backend = get_event_backend()
+        if not last_id:
+            # fresh connection: only events from now on
+            last_id = backend.latest_id(user_id)
+        heartbeat = current_app.config["EVENTS_HEARTBEAT_SECONDS"]
+        max_seconds = current_app.config["EVENTS_STREAM_MAX_SECONDS"]
+        # stream_with_context keeps the app context for the whole stream; give
+        # the pooled connection back now rather than when the client goes away
+        db.session.remove()
+
+        def generate(last_id):
+            # Bounded lifetime so worker threads are recycled (gunicorn.conf.py
+            # runs gthread workers); EventSource reconnects on its own and
+            # resumes from the last id it saw
+            yield f"retry: {current_app.config['EVENTS_RETRY_MS']}\n\n"
+            deadline = time.monotonic() + max_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                events = backend.read(user_id, last_id, min(heartbeat, remaining))
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in events:
+                    last_id = event.id
+                    yield event.to_sse()
+
+        return Response(
+            stream_with_context(generate(last_id)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
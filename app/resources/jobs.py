@@ -0,0 +1,109 @@
+import json
+
+from flask import request
+from flask_restx import Namespace, Resource, fields
+
+from ..extensions import db
+from ..jobs import JOBS, enqueue, request_cancel
+from ..models.job import Job
+from .admin import admin_allowed
+
+jobs_ns = Namespace("jobs", description="Background jobs (X-Admin-Token)")
+
+job_in = jobs_ns.model("JobIn", {
+    "type": fields.String(required=True, example="listings.export"),
+    "params": fields.Raw(example={"filters": {"city": "Nairobi"}}),
+})
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def job_data(j):
+    return {
+        "id": j.id,
+        "type": j.type,
+        "params": json.loads(j.params or "{}"),
+        "status": j.status,
+        "progress": j.progress,
+        "message": j.message,
+        "result": json.loads(j.result) if j.result else None,
+        "error": j.error,
+        "cancel_requested": j.cancel_requested,
+        "attempts": j.attempts,
+        "created_at": _isoformat(j.created_at),
+        "started_at": _isoformat(j.started_at),
+        "finished_at": _isoformat(j.finished_at),
+    }
+
+
+@jobs_ns.route("")
+class JobList(Resource):
+    @jobs_ns.doc(params={
+        "status": "queued, running, succeeded, failed or cancelled",
+        "limit": "Number of jobs, newest first (default 20, max 100)",
+    })
+    @jobs_ns.response(403, "Admin token required")
+    def get(self):
+        """Recent jobs"""
+        if not admin_allowed():
+            return {"message": "Admin token required"}, 403
+
+        q = Job.query.order_by(Job.id.desc())
+        if request.args.get("status"):
+            q = q.filter_by(status=request.args["status"])
+        limit = min(request.args.get("limit", 20, type=int), 100)
+        return {"items": [job_data(j) for j in q.limit(limit)]}
+
+    @jobs_ns.expect(job_in, validate=True)
+    @jobs_ns.response(202, "Job queued; poll /jobs/<id>")
+    @jobs_ns.response(400, "Unknown job type or bad params")
+    @jobs_ns.response(403, "Admin token required")
+    def post(self):
+        """Queue a job"""
+        if not admin_allowed():
+            return {"message": "Admin token required"}, 403
+
+        data = request.get_json() or {}
+        params = data.get("params") or {}
+        if not isinstance(params, dict):
+            return {"message": "params must be an object"}, 400
+        try:
+            row = enqueue(data["type"], params)
+        except KeyError:
+            return {"message": f"Unknown job type; known: {', '.join(sorted(JOBS))}"}, 400
+        return job_data(row), 202, {"Location": f"/jobs/{row.id}"}
+
+
+@jobs_ns.route("/<int:job_id>")
+class JobItem(Resource):
+    @jobs_ns.response(403, "Admin token required")
+    @jobs_ns.response(404, "Job not found")
+    def get(self, job_id):
+        """A job's status, progress and result"""
+        if not admin_allowed():
+            return {"message": "Admin token required"}, 403
+
+        row = db.session.get(Job, job_id)
+        if row is None:
+            return {"message": "Job not found"}, 404
+        return job_data(row)
+
+
+@jobs_ns.route("/<int:job_id>/cancel")
+class JobCancel(Resource):
+    @jobs_ns.response(403, "Admin token required")
+    @jobs_ns.response(404, "Job not found")
+    @jobs_ns.response(409, "Job already finished")
+    def post(self, job_id):
+        """Cancel a queued job, or ask a running one to stop at its next progress report"""
+        if not admin_allowed():
+            return {"message": "Admin token required"}, 403
+
+        row = db.session.get(Job, job_id)
+        if row is None:
+            return {"message": "Job not found"}, 404
+        if not request_cancel(row):
+            return {"message": f"Job already {row.status}"}, 409
+        return job_data(row)
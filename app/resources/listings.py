@@ -1,24 +1,38 @@
 import math
-import os
-import json
-from uuid import uuid4
+from datetime import datetime
 
-from flask import request, current_app
+from flask import abort, request, current_app
 from flask_restx import Resource, Api, Namespace, fields
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.exc import IntegrityError
 
 
+from ..alerts import queue_listing_alerts
 from ..extensions import db
+from ..geo import KM_PER_DEG_LAT, R_EARTH_KM, haversine_km
+from ..popularity import POPULAR_WINDOWS, record_view
+from ..ratelimit import rate_limit, shed_load
+from ..routing import use_replica
+from ..similarity import get_similarity_index, listing_changed, listing_removed
+from ..tracing import span
+from ..webhooks import record_event
+from ..models.archived_listing import ArchivedListing
 from ..models.listing import Listing
-from ..models.user import User
-from ..schemas.listing import ListingSchema
+from ..models.listing_image import ListingImage
+from ..models.popular_listing import PopularListing
+from ..schemas.listing import ArchivedListingSchema, ListingSchema
+from ..storage import ImageTooLarge, remove_unreferenced, save_content_addressed
+from ..variants import schedule_variants
+from .common import current_user, load_owned
 
 
 listings_ns = Namespace('Listings', description='Property listing operations')
 listing_schema = ListingSchema()
 listings_schema = ListingSchema(many=True)
+archived_listing_schema = ArchivedListingSchema()
 
 # Allowed image extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
@@ -38,11 +52,6 @@ upload_parser.add_argument(
      help='One or more image files',
 )
 
-def current_user():
-    """Return the current logged-in user (or None)."""
-    uid = get_jwt_identity()
-    return User.query.get(uid) if uid else None
-
 listing_in = listings_ns.model("ListingIn", {
     "title": fields.String(required=True, example="Modern 2BR Apartment in Kilimani"),
     "description": fields.String(example="Spacious 2BR with balcony, close to Yaya Centre."),
@@ -58,23 +67,113 @@ listing_in = listings_ns.model("ListingIn", {
 })
 
 
-R_EARTH_KM = 6371.0088
+def include_archived(args):
+    return args.get("include_archived", "").lower() in ("1", "true")
+
+
+def listing_conditions(model, args):
+    """
+    WHERE clauses for the ListingList.get filters, on Listing or ArchivedListing.
+
+    Only active listings unless a status is given (an empty status means any)
+    or archived listings are asked for.
+    """
+    conditions = []
+    status = args.get("status", None if include_archived(args) else "active")
+    if status:
+        conditions.append(model.status == status)
+    if args.get("city"):
+        conditions.append(model.city.ilike(f"%{args['city']}%"))
+    if args.get("property_type"):
+        conditions.append(model.property_type == args["property_type"])
+    if args.get("min_price"):
+        conditions.append(model.price >= float(args["min_price"]))
+    if args.get("max_price"):
+        conditions.append(model.price <= float(args["max_price"]))
+    if args.get("bedrooms"):
+        conditions.append(model.bedrooms >= int(args["bedrooms"]))
+    if args.get("bathrooms"):
+        conditions.append(model.bathrooms >= int(args["bathrooms"]))
+    return conditions
+
+
+def listing_sort(args):
+    """(column name, descending) for the `sort` argument."""
+    sort = args.get("sort", "-created_at")
+    return sort.lstrip("-"), sort.startswith("-")
+
+
+def filtered_listings_query(args):
+    """Listing query for the ListingList.get filters and sort."""
+    column, descending = listing_sort(args)
+    column = getattr(Listing, column)
+    return Listing.query.filter(*listing_conditions(Listing, args)).order_by(
+        column.desc() if descending else column.asc()
+    )
+
+
+def listings_with_archive_page(args, page, per_page):
+    """
+    ListingList.get with include_archived: one page over live and archived
+    listings (a UNION ALL of ids and sort keys), then each side loaded by id.
+    Returns (serialized items, total).
+    """
+    column, descending = listing_sort(args)
+    ids = union_all(
+        select(Listing.id, literal(False).label("archived"), getattr(Listing, column).label("key"))
+        .where(*listing_conditions(Listing, args)),
+        select(ArchivedListing.id, literal(True).label("archived"),
+               getattr(ArchivedListing, column).label("key"))
+        .where(*listing_conditions(ArchivedListing, args)),
+    ).subquery()
+    total = db.session.scalar(select(func.count()).select_from(ids))
+    order = ids.c.key.desc() if descending else ids.c.key.asc()
+    rows = db.session.execute(
+        select(ids.c.id, ids.c.archived).order_by(order, ids.c.id)
+        .limit(per_page).offset((page - 1) * per_page)
+    ).all()
+
+    live_ids = [i for i, archived in rows if not archived]
+    archived_ids = [i for i, archived in rows if archived]
+    found = {}
+    if live_ids:
+        for l in Listing.query.filter(Listing.id.in_(live_ids)):
+            found[(l.id, False)] = listing_schema.dump(l)
+    if archived_ids:
+        for l in ArchivedListing.query.filter(ArchivedListing.id.in_(archived_ids)):
+            found[(l.id, True)] = archived_listing_schema.dump(l)
+    return [found[row] for row in map(tuple, rows) if row in found], total
+
+
+def geo_candidates_query(lat, lng, radius_km, status="active", model=Listing):
+    """
+    Listings inside the bounding box of the search circle, in `status` (None: any).
+
+    The box is a cheap, index-backed superset of the circle; the exact
+    haversine distance is applied to the candidates in Python.
+    """
+    dlat = radius_km / KM_PER_DEG_LAT
+    q = model.query.filter(model.lat.between(lat - dlat, lat + dlat))
+    if status:
+        q = q.filter(model.status == status)
 
-def haversine_km(lat1, lon1, lat2, lon2):
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
+    # widest longitude offset on the circle; no bound if it covers a pole
+    # or crosses the antimeridian
+    ratio = math.sin(radius_km / R_EARTH_KM) / math.cos(math.radians(lat))
+    if 0 <= ratio < 1:
+        dlng = math.degrees(math.asin(ratio))
+        if -180 <= lng - dlng and lng + dlng <= 180:
+            q = q.filter(model.lng.between(lng - dlng, lng + dlng))
+    return q.filter(model.lng.isnot(None))
 
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R_EARTH_KM * c
 
 @listings_ns.route('')
 class ListingList(Resource):
     @listings_ns.doc(params={
         'city': 'Filter by city',
         'property_type': 'Filter by property type',
-        'status': 'Filter by status',
+        'status': 'Filter by status (default active; empty for any)',
+        'include_archived': 'Also archived listings, any status unless given (1/true)',
         'min_price': 'Minimum price',
         'max_price': 'Maximum price',
         'bedrooms': 'Minimum number of bedrooms',
@@ -82,39 +181,26 @@ class ListingList(Resource):
         'page': 'Page number for pagination',
         'per_page': 'Number of items per page (max 100)',
     })
+    @use_replica
     def get(self):
         """List + filter listings."""
-        q = Listing.query
         args = request.args
-
-        if args.get("city"):
-            q = q.filter(Listing.city.ilike(f"%{args['city']}%"))
-        if args.get("property_type"):
-            q = q.filter_by(property_type=args["property_type"])
-        if args.get("status"):
-            q = q.filter_by(status=args["status"])
-        if args.get("min_price"):
-            q = q.filter(Listing.price >= float(args["min_price"]))
-        if args.get("max_price"):
-            q = q.filter(Listing.price <= float(args["max_price"]))
-        if args.get("bedrooms"):
-            q = q.filter(Listing.bedrooms >= int(args["bedrooms"]))
-        if args.get("bathrooms"):
-            q = q.filter(Listing.bathrooms >= int(args["bathrooms"]))
-
-        sort = args.get("sort", "-created_at")
-        if sort.startswith("-"):
-            q = q.order_by(getattr(Listing, sort[1:]).desc())
-        else:
-            q = q.order_by(getattr(Listing, sort).asc())
-
         page = int(args.get("page", 1))
         per_page = min(int(args.get("per_page", 20)), 100)
-        paged = q.paginate(page=page, per_page=per_page, error_out=False)
+
+        if include_archived(args):
+            items, total = listings_with_archive_page(args, page, per_page)
+        else:
+            paged = filtered_listings_query(args).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            total = paged.total
+            with span("serialize"):
+                items = listings_schema.dump(paged.items)
 
         return {
-            "items": listings_schema.dump(paged.items),
-            "total": paged.total,
+            "items": items,
+            "total": total,
             "page": page,
             "per_page": per_page,
         }
@@ -150,26 +236,40 @@ class ListingList(Resource):
             },
         )
         db.session.add(listing)
+        db.session.flush()  # assigns the id for the outbox payload
+        data = listing_schema.dump(listing)
+        record_event("listing.created", data)
         db.session.commit()
-        return listing_schema.dump(listing), 201
+
+        listing_changed(data)
+        queue_listing_alerts(data["id"])
+        return data, 201
 
 @listings_ns.route('/<int:listing_id>')
 class ListingItem(Resource):
+    @listings_ns.doc(params={'include_archived': 'Also look in the archive (1/true)'})
     def get(self, listing_id):
         """Get a single listing by ID."""
-        listing = Listing.query.get_or_404(listing_id)
+        listing = db.session.get(Listing, listing_id)
+        if listing is None:
+            if include_archived(request.args):
+                return archived_listing_schema.dump(db.get_or_404(ArchivedListing, listing_id))
+            abort(404)
+        record_view(listing.id)  # in memory; written by the view counter thread
         return listing_schema.dump(listing)
 
     @jwt_required()
     def patch(self, listing_id):
         """Update a listing (only by owning agent)."""
-        user = current_user()
-        listing = Listing.query.get_or_404(listing_id)
-
-        if not user or (not user.is_agent or listing.agent_id != user.id):
-            return {"message": "Only the owning agent can update"}, 403
+        listing, error = load_owned(
+            Listing, listing_id, "Listing not found", "Only the owning agent can update"
+        )
+        if error:
+            return error
 
         data = request.get_json() or {}
+        if "status" in data and data["status"] != listing.status:
+            listing.status_changed_at = datetime.utcnow()
         for k in [
             "title",
             "description",
@@ -187,19 +287,23 @@ class ListingItem(Resource):
                 setattr(listing, k, data[k])
 
         db.session.commit()
-        return listing_schema.dump(listing)
+        data = listing_schema.dump(listing)
+        listing_changed(data)
+        queue_listing_alerts(listing_id)
+        return data
 
     @jwt_required()
     def delete(self, listing_id):
         """Delete a listing (only by owning agent)."""
-        user = current_user()
-        listing = Listing.query.get_or_404(listing_id)
-
-        if not user or (not user.is_agent or listing.agent_id != user.id):
-            return {"message": "Only the owning agent can delete"}, 403
+        listing, error = load_owned(
+            Listing, listing_id, "Listing not found", "Only the owning agent can delete"
+        )
+        if error:
+            return error
 
         db.session.delete(listing)
         db.session.commit()
+        listing_removed(listing_id)
         return {"message": "deleted"}
 
 @listings_ns.route('/search')
@@ -213,7 +317,14 @@ class ListingGeoSearch(Resource):
         'lat': 'Latitude of the center point (required)',
         'lng': 'Longitude of the center point (required)',
         'radius_km': 'Search radius in kilometers (default 10 km)',
+        'status': 'Listing status (default active; empty for any)',
+        'include_archived': 'Also archived listings, any status unless given (1/true)',
     })
+    @listings_ns.response(429, 'Too many requests')
+    @listings_ns.response(503, 'Server busy, retry later')
+    @rate_limit("search")
+    @shed_load(listings_ns)
+    @use_replica
     def get(self):
         """Geo-spatial search for listings within a radius."""
         args = request.args
@@ -228,20 +339,30 @@ class ListingGeoSearch(Resource):
         except ValueError:
             return {"message": "radius_km must be a number"}, 400
 
-        listings = Listing.query.all()
-        results = []
-
-        for l in listings:
-            if l.lat is None or l.lng is None:
-                continue
+        archived = include_archived(args)
+        status = args.get("status", None if archived else "active") or None
+        candidates = [(l, listing_schema) for l in geo_candidates_query(lat, lng, radius_km, status)]
+        if archived:
+            candidates += [
+                (l, archived_listing_schema)
+                for l in geo_candidates_query(lat, lng, radius_km, status, model=ArchivedListing)
+            ]
+        matches = []
+
+        for l, schema in candidates:
             d = haversine_km(lat, lng, l.lat, l.lng)
             if d <= radius_km:
-                item = listing_schema.dump(l)
-                item["distance_km"] = round(d, 3)
-                results.append(item)
+                matches.append((d, l, schema))
 
         # sort by distance
-        results.sort(key=lambda x: x["distance_km"])
+        matches.sort(key=lambda m: m[0])
+
+        results = []
+        with span("serialize"):
+            for d, l, schema in matches:
+                item = schema.dump(l)
+                item["distance_km"] = round(d, 3)
+                results.append(item)
 
         return {
             "items": results,
@@ -251,6 +372,92 @@ class ListingGeoSearch(Resource):
             "radius_km": radius_km,
         }
 
+@listings_ns.route('/<int:listing_id>/similar')
+class SimilarListings(Resource):
+    @listings_ns.doc(params={
+        'k': 'Number of listings (default 10, max 50)',
+        'radius_km': 'Look this far first, widening up to 8x when too few (default SIMILAR_RADIUS_KM)',
+    })
+    @use_replica
+    def get(self, listing_id):
+        """Similar active listings nearby (price, rooms, type and location)."""
+        args = request.args
+        try:
+            k = min(max(int(args.get("k", 10)), 1), 50)
+            radius_km = float(args.get("radius_km", current_app.config["SIMILAR_RADIUS_KM"]))
+        except ValueError:
+            return {"message": "k must be an integer and radius_km a number"}, 400
+
+        listing = Listing.query.get_or_404(listing_id)
+        if listing.lat is None or listing.lng is None:
+            return {"items": [], "count": 0}
+
+        index = get_similarity_index()
+        with span("similar"):
+            ranked = index.similar(listing, k, radius_km, max_radius_km=radius_km * 8)
+
+        found = {
+            l.id: l for l in Listing.query.filter(Listing.id.in_([i for i, _ in ranked]))
+        }
+        results = []
+        with span("serialize"):
+            for similar_id, score in ranked:
+                l = found.get(similar_id)
+                if l is None:
+                    index.remove(similar_id)  # deleted by another worker
+                    continue
+                item = listing_schema.dump(l)
+                item["distance_km"] = round(haversine_km(listing.lat, listing.lng, l.lat, l.lng), 3)
+                item["score"] = round(score, 4)
+                results.append(item)
+
+        return {"items": results, "count": len(results)}
+
+@listings_ns.route('/popular')
+class PopularListings(Resource):
+    @listings_ns.doc(params={
+        'city': 'Only listings in this city (exact, case-insensitive)',
+        'window': 'Views counted over: 1d, 7d (default) or 30d',
+        'limit': 'Number of listings (default 20, max 100)',
+    })
+    @use_replica
+    def get(self):
+        """Most viewed listings, from the periodically recomputed ranking."""
+        args = request.args
+        window = args.get("window", "7d")
+        if window not in POPULAR_WINDOWS:
+            return {"message": f"window must be one of {', '.join(POPULAR_WINDOWS)}"}, 400
+        try:
+            limit = min(max(int(args.get("limit", 20)), 1), 100)
+        except ValueError:
+            return {"message": "limit must be an integer"}, 400
+        city = (args.get("city") or "").strip().lower()
+
+        rows = (
+            db.session.query(PopularListing, Listing)
+            .join(Listing, Listing.id == PopularListing.listing_id)
+            .filter(PopularListing.window == window, PopularListing.city == city,
+                    Listing.status == "active")  # sold since the last refresh
+            .order_by(PopularListing.rank)
+            .limit(limit)
+            .all()
+        )
+
+        items = []
+        with span("serialize"):
+            for ranked, listing in rows:
+                item = listing_schema.dump(listing)
+                item["rank"] = ranked.rank
+                item["window_views"] = ranked.views
+                items.append(item)
+
+        return {
+            "items": items,
+            "window": window,
+            "city": city or None,
+            "computed_at": rows[0][0].computed_at.isoformat() if rows else None,
+        }
+
 @listings_ns.route('/<int:listing_id>/images')
 class ListingImageUpload(Resource):
     @jwt_required()
@@ -260,11 +467,11 @@ class ListingImageUpload(Resource):
     @listings_ns.response(400, 'Invalid file upload')
     def post(self, listing_id):
         """Upload images for a listing (only by owning agent)."""
-        user = current_user()
-        listing = Listing.query.get_or_404(listing_id)
-
-        if not user or (not user.is_agent or listing.agent_id != user.id):
-            return {"message": "Only the owning agent can upload images"}, 403
+        listing, error = load_owned(
+            Listing, listing_id, "Listing not found", "Only the owning agent can upload images"
+        )
+        if error:
+            return error
 
         args = upload_parser.parse_args()
         files = args.get('images')
@@ -273,20 +480,53 @@ class ListingImageUpload(Resource):
             return {"message": "No images uploaded"}, 400
 
         upload_folder = current_app.config['UPLOAD_FOLDER']
-        existing = json.loads(listing.image_urls or "[]")
-        saved_urls = []
+        max_bytes = current_app.config['MAX_IMAGE_BYTES']
+        stored = {}
+        created = []  # files this request put on disk
 
         for f in files:
             if f and allowed_file(f.filename):
                 filename = secure_filename(f.filename)
                 ext = filename.rsplit(".", 1)[1].lower()
-                new_name = f"{uuid4().hex}.{ext}"
-                filepath = os.path.join(upload_folder, new_name)
-                f.save(filepath)
-                saved_urls.append(f"/uploads/{new_name}")
-
-        listing.image_urls = json.dumps(existing + saved_urls)
-        db.session.commit()
+                try:
+                    sha256, size, name, new = save_content_addressed(
+                        f.stream, ext, upload_folder, max_bytes
+                    )
+                except ImageTooLarge:
+                    # the earlier files of this batch get no rows
+                    remove_unreferenced(created, upload_folder)
+                    return {"message": f"{filename} exceeds {max_bytes} bytes"}, 413
+                if new:
+                    created.append(name)
+                stored.setdefault(sha256, (name, size))
+
+        # Plain inserts; skip files this listing already references. A
+        # concurrent upload of the same file can still win the unique
+        # constraint, so on IntegrityError look again and insert what is left.
+        listing_id = listing.id
+        for attempt in range(2):
+            known = {
+                sha for (sha,) in db.session.query(ListingImage.sha256).filter(
+                    ListingImage.listing_id == listing_id,
+                    ListingImage.sha256.in_(stored),
+                )
+            }
+            for sha256, (name, size) in stored.items():
+                if sha256 not in known:
+                    db.session.add(ListingImage(
+                        listing_id=listing_id, sha256=sha256, url=f"/uploads/{name}", size=size
+                    ))
+            try:
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                if attempt:
+                    raise
+        saved_urls = [f"/uploads/{name}" for name, _ in stored.values()]
+
+        # thumbnails are rendered off the request worker
+        schedule_variants([(sha256, name) for sha256, (name, _) in stored.items()])
 
         return {"image_urls": saved_urls}, 201
 # 
\ No newline at end of file
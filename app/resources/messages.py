@@ -1,12 +1,20 @@
-from flask import request
+from datetime import datetime
+
+from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from sqlalchemy import case, func
 
+from ..events import publish_event
 from ..extensions import db
+from ..ingest import QueueFull, get_message_ingestor
 from ..models.message import Message
 from ..models.listing import Listing
-from ..models.user import User
+from ..ratelimit import rate_limit
 from ..schemas.message import MessageSchema
+from ..tracing import span
+from ..webhooks import record_event
+from .common import agent_listing_ids, current_user, load_owned
 
 messages_ns = Namespace("messages", description="Listing inquiries and messages")
 
@@ -22,17 +30,32 @@ message_in = messages_ns.model("MessageIn", {
     "content": fields.String(required=True, description="Message content"),
 })
 
+message_read_update = messages_ns.model("MessageReadUpdate", {
+    "is_read": fields.Boolean(required=True, description="Mark the message read (true) or unread (false)"),
+})
+
 
-def current_user():
-    uid = get_jwt_identity()
-    return User.query.get(uid) if uid else None
+def agent_messages_query(agent_id: int, unread: bool = False):
+    """Messages about the agent's listings (archived ones too), newest first."""
+    q = (
+        db.session.query(Message)
+        .filter(Message.listing_id.in_(agent_listing_ids(agent_id)))
+        .order_by(Message.created_at.desc())
+    )
+    if unread:
+        q = q.filter(Message.is_read.is_(False))
+    return q
 
 
 @messages_ns.route("")
 class MessageList(Resource):
     @messages_ns.expect(message_in, validate=True)
     @messages_ns.response(201, "Message created")
+    @messages_ns.response(202, "Message queued (batched ingestion)")
     @messages_ns.response(404, "Listing not found")
+    @messages_ns.response(503, "Ingestion queue full, retry later")
+    @messages_ns.response(429, "Too many requests")
+    @rate_limit("messages")
     def post(self):
         """Send a message about a listing (public endpoint)"""
         data = request.get_json() or {}
@@ -41,6 +64,32 @@ class MessageList(Resource):
         if not listing:
             return {"message": "Listing not found"}, 404
 
+        ingestor = get_message_ingestor()
+        if ingestor is not None:
+            row = {
+                "listing_id": listing.id,
+                "name": data["name"],
+                "email": data.get("email"),
+                "phone": data.get("phone"),
+                "content": data["content"],
+                "is_read": False,
+                "created_at": datetime.utcnow(),
+            }
+            try:
+                ingestor.submit(row)
+            except QueueFull:
+                retry_after = current_app.config["MESSAGE_RETRY_AFTER"]
+                return (
+                    {"message": "Too many messages right now, please retry"},
+                    503,
+                    {"Retry-After": str(retry_after)},
+                )
+            return {
+                "status": "queued",
+                **row,
+                "created_at": row["created_at"].isoformat(),
+            }, 202
+
         msg = Message(
             listing_id=listing.id,
             name=data["name"],
@@ -48,15 +97,21 @@ class MessageList(Resource):
             phone=data.get("phone"),
             content=data["content"],
         )
+        agent_id = listing.agent_id  # read before commit expires the listing
         db.session.add(msg)
+        db.session.flush()  # assigns the id for the outbox payload
+        data = message_schema.dump(msg)
+        record_event("message.created", data)
         db.session.commit()
 
-        return message_schema.dump(msg), 201
+        publish_event(agent_id, "message.created", data)
+        return data, 201
 
     @jwt_required()
     @messages_ns.doc(params={
         "page": "Page number (default 1)",
         "per_page": "Items per page (default 20, max 100)",
+        "unread": "Only return unread messages (1/true)",
     })
     @messages_ns.response(200, "Messages fetched")
     @messages_ns.response(403, "Agents only")
@@ -70,18 +125,79 @@ class MessageList(Resource):
         page = int(args.get("page", 1))
         per_page = min(int(args.get("per_page", 20)), 100)
 
-        # join Message -> Listing to filter by agent
+        unread = args.get("unread", "").lower() in ("1", "true")
+        q = agent_messages_query(user.id, unread)
+        paged = q.paginate(page=page, per_page=per_page, error_out=False)
+
+        with span("serialize"):
+            items = messages_schema.dump(paged.items)
+
+        return {
+            "items": items,
+            "total": paged.total,
+            "page": page,
+            "per_page": per_page,
+        }
+
+
+@messages_ns.route("/threads")
+class MessageThreads(Resource):
+    @jwt_required()
+    @messages_ns.doc(params={
+        "page": "Page number (default 1)",
+        "per_page": "Items per page (default 20, max 100)",
+    })
+    @messages_ns.response(200, "Threads fetched")
+    @messages_ns.response(403, "Agents only")
+    def get(self):
+        """Inbox grouped by listing + sender email, newest thread first"""
+        user = current_user()
+        if not user or not user.is_agent:
+            return {"message": "Agents only"}, 403
+
+        args = request.args
+        page = int(args.get("page", 1))
+        per_page = min(int(args.get("per_page", 20)), 100)
+
+        # one aggregate pass per (listing, sender); ids grow with created_at
+        # so max(id) identifies the latest message of each thread
+        threads = (
+            db.session.query(
+                Message.listing_id.label("listing_id"),
+                Message.email.label("email"),
+                func.count(Message.id).label("message_count"),
+                func.sum(case((Message.is_read.is_(False), 1), else_=0)).label("unread_count"),
+                func.max(Message.id).label("latest_id"),
+            )
+            .filter(Message.listing_id.in_(agent_listing_ids(user.id)))
+            .group_by(Message.listing_id, Message.email)
+            .subquery()
+        )
+
         q = (
-            db.session.query(Message)
-            .join(Listing, Message.listing_id == Listing.id)
-            .filter(Listing.agent_id == user.id)
-            .order_by(Message.created_at.desc())
+            db.session.query(
+                Message,
+                threads.c.message_count,
+                threads.c.unread_count,
+            )
+            .join(threads, Message.id == threads.c.latest_id)
+            .order_by(Message.created_at.desc(), Message.id.desc())
         )
 
         paged = q.paginate(page=page, per_page=per_page, error_out=False)
 
+        items = []
+        for latest, message_count, unread_count in paged.items:
+            items.append({
+                "listing_id": latest.listing_id,
+                "email": latest.email,
+                "message_count": message_count,
+                "unread_count": int(unread_count or 0),
+                "latest": message_schema.dump(latest),
+            })
+
         return {
-            "items": messages_schema.dump(paged.items),
+            "items": items,
             "total": paged.total,
             "page": page,
             "per_page": per_page,
@@ -96,16 +212,25 @@ class MessageDetail(Resource):
     @messages_ns.response(404, "Message not found")
     def get(self, message_id: int):
         """Get a single message (only the listing's agent can view)"""
-        user = current_user()
-        if not user or not user.is_agent:
-            return {"message": "Agents only"}, 403
+        msg, error = load_owned(Message, message_id, "Message not found")
+        if error:
+            return error
+
+        return message_schema.dump(msg)
 
-        msg = Message.query.get(message_id)
-        if not msg:
-            return {"message": "Message not found"}, 404
+    @jwt_required()
+    @messages_ns.expect(message_read_update, validate=True)
+    @messages_ns.response(200, "Message updated")
+    @messages_ns.response(403, "Forbidden")
+    @messages_ns.response(404, "Message not found")
+    def patch(self, message_id: int):
+        """Mark a message read/unread (only the listing's agent)"""
+        msg, error = load_owned(Message, message_id, "Message not found")
+        if error:
+            return error
 
-        listing = Listing.query.get(msg.listing_id)
-        if not listing or listing.agent_id != user.id:
-            return {"message": "Forbidden"}, 403
+        data = request.get_json() or {}
+        msg.is_read = bool(data.get("is_read"))
+        db.session.commit()
 
         return message_schema.dump(msg)
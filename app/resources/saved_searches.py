@@ -0,0 +1,112 @@
+from flask import request
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import get_jwt_identity, jwt_required
+
+from ..alerts import apply_filters
+from ..extensions import db
+from ..models.listing import Listing
+from ..models.saved_search import SavedSearch
+from ..models.search_alert import SearchAlert
+from ..schemas.saved_search import SavedSearchSchema, SearchAlertSchema
+
+saved_searches_ns = Namespace(
+    "saved-searches", description="Saved listing searches and their alerts"
+)
+
+saved_search_schema = SavedSearchSchema()
+saved_searches_schema = SavedSearchSchema(many=True)
+alert_schema = SearchAlertSchema()
+
+# Same filters as GET /listings, plus an optional radius around lat/lng
+saved_search_in = saved_searches_ns.model("SavedSearchIn", {
+    "name": fields.String(example="3BR in Karen under 150k"),
+    "city": fields.String(example="Nairobi"),
+    "property_type": fields.String(example="house"),
+    "status": fields.String(description="Default: active listings only"),
+    "min_price": fields.Float,
+    "max_price": fields.Float(example=150000),
+    "bedrooms": fields.Integer(description="Minimum", example=3),
+    "bathrooms": fields.Integer(description="Minimum"),
+    "lat": fields.Float(example=-1.3197),
+    "lng": fields.Float(example=36.7073),
+    "radius_km": fields.Float(example=3),
+})
+
+
+@saved_searches_ns.route("")
+class SavedSearchList(Resource):
+    @jwt_required()
+    def get(self):
+        """The current user's saved searches"""
+        searches = (
+            SavedSearch.query.filter_by(user_id=get_jwt_identity())
+            .order_by(SavedSearch.id)
+            .all()
+        )
+        return saved_searches_schema.dump(searches)
+
+    @jwt_required()
+    @saved_searches_ns.expect(saved_search_in, validate=True)
+    @saved_searches_ns.response(201, "Saved search created")
+    @saved_searches_ns.response(400, "Validation error")
+    def post(self):
+        """Save a search; new and updated listings matching it raise alerts"""
+        data = request.get_json() or {}
+        if data.get("radius_km") is not None and (data.get("lat") is None or data.get("lng") is None):
+            return {"message": "radius_km needs lat and lng"}, 400
+        if data.get("radius_km") is None and (data.get("lat") is not None or data.get("lng") is not None):
+            return {"message": "lat and lng need radius_km"}, 400
+
+        search = apply_filters(SavedSearch(user_id=get_jwt_identity()), data)
+        db.session.add(search)
+        db.session.commit()
+        return saved_search_schema.dump(search), 201
+
+
+@saved_searches_ns.route("/<int:search_id>")
+class SavedSearchItem(Resource):
+    @jwt_required()
+    def delete(self, search_id):
+        """Delete one of the current user's saved searches (and its alerts)"""
+        deleted = SavedSearch.query.filter_by(
+            id=search_id, user_id=get_jwt_identity()
+        ).delete()
+        if not deleted:
+            return {"message": "Saved search not found"}, 404
+        # not left to ON DELETE CASCADE, which SQLite only applies with PRAGMA foreign_keys
+        SearchAlert.query.filter_by(saved_search_id=search_id).delete()
+        db.session.commit()
+        return {"message": "deleted"}
+
+
+@saved_searches_ns.route("/alerts")
+class SearchAlertList(Resource):
+    @saved_searches_ns.doc(params={
+        "before_id": "Only alerts older than this id (next page)",
+        "limit": "Number of alerts (default 20, max 100)",
+    })
+    @jwt_required()
+    def get(self):
+        """The current user's alerts, newest first, with the matched listings"""
+        args = request.args
+        limit = min(max(args.get("limit", 20, type=int), 1), 100)
+        q = (
+            db.session.query(SearchAlert, Listing)
+            .join(Listing, Listing.id == SearchAlert.listing_id)
+            .filter(SearchAlert.user_id == get_jwt_identity())
+            .order_by(SearchAlert.id.desc())
+        )
+        before_id = args.get("before_id", type=int)
+        if before_id:
+            q = q.filter(SearchAlert.id < before_id)
+
+        items = []
+        for alert, listing in q.limit(limit):
+            item = alert_schema.dump(alert)
+            item["listing"] = {
+                "id": listing.id, "title": listing.title, "price": listing.price,
+                "city": listing.city, "property_type": listing.property_type,
+                "bedrooms": listing.bedrooms,
+            }
+            items.append(item)
+        return {"items": items, "count": len(items)}
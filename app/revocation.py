@@ -0,0 +1,142 @@
+"""
+JWT revocation (logout, refresh-token rotation) without a query per request.
+
+Revoked token ids (`jti`) are stored in the RevokedToken table and mirrored
+in a per-process dict {jti: expiry}. flask_jwt_extended's blocklist loader
+only does a dict lookup; at most every REVOCATION_SYNC_SECONDS one request
+pulls the rows revoked since the last sync (by revoked_at, re-reading a
+small overlap so rows from transactions that committed late are not
+missed). Revocations made by this process are visible immediately, other
+workers' within REVOCATION_SYNC_SECONDS.
+
+Entries are dropped from memory once the token has expired anyway;
+`flask tokens purge` deletes those rows from the table.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db, jwt
+from .models.revoked_token import RevokedToken
+
+# re-read rows revoked this long before the last sync
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class Denylist:
+    def __init__(self, sync_seconds):
+        self.sync_seconds = sync_seconds
+        self._expires = {}  # jti -> naive UTC expiry
+        self._since = None  # revoked_at watermark of the last sync
+        self._next_sync = 0.0
+        self._loaded = False
+        self._sync_lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        return jti in self._expires
+
+    def add(self, jti, expires_at):
+        self._expires[jti] = expires_at
+
+    def sync(self):
+        # The first load must finish before answering; later syncs are
+        # skipped by threads that find one already running.
+        if not self._sync_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            started = _utcnow()
+            query = select(RevokedToken.jti, RevokedToken.expires_at).where(
+                RevokedToken.expires_at > started
+            )
+            if self._since is not None:
+                query = query.where(RevokedToken.revoked_at >= self._since - SYNC_OVERLAP)
+            with db.engine.connect() as conn:
+                rows = conn.execute(query).all()
+
+            expires = dict(self._expires)
+            expires.update(rows)
+            self._expires = {jti: exp for jti, exp in expires.items() if exp > started}
+            self._since = started
+            self._loaded = True
+            self._next_sync = time.monotonic() + self.sync_seconds
+        finally:
+            self._sync_lock.release()
+
+    def __len__(self):
+        return len(self._expires)
+
+
+_lock = threading.Lock()
+
+
+def get_denylist():
+    """This process's denylist, created (and loaded) on first use."""
+    app = current_app._get_current_object()
+    denylist = app.extensions.get("denylist")
+    if denylist is None:
+        with _lock:
+            denylist = app.extensions.get("denylist")
+            if denylist is None:
+                denylist = Denylist(app.config["REVOCATION_SYNC_SECONDS"])
+                app.extensions["denylist"] = denylist
+    return denylist
+
+
+def revoke_token(payload):
+    """
+    Revoke a decoded token (its jti) for every worker. Commits.
+
+    Returns False when the token was already revoked, including by a
+    concurrent request whose row won the unique jti (the IntegrityError is
+    rolled back here), so a refresh can refuse to rotate the same token twice.
+    """
+    expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc).replace(tzinfo=None)
+    revoked = False
+    if not db.session.query(RevokedToken.id).filter_by(jti=payload["jti"]).first():
+        db.session.add(RevokedToken(
+            jti=payload["jti"],
+            token_type=payload.get("type", "access"),
+            user_id=payload.get("sub"),
+            expires_at=expires_at,
+        ))
+        try:
+            db.session.commit()
+            revoked = True
+        except IntegrityError:
+            db.session.rollback()
+    get_denylist().add(payload["jti"], expires_at)
+    return revoked
+
+
+@jwt.token_in_blocklist_loader
+def _token_is_revoked(jwt_header, jwt_payload):
+    return get_denylist().is_revoked(jwt_payload["jti"])
+
+
+tokens_cli = AppGroup("tokens", help="JWT revocation maintenance.")
+
+
+def purge_expired():
+    """Delete revocation rows of tokens that have expired anyway. Returns the count."""
+    deleted = RevokedToken.query.filter(RevokedToken.expires_at <= _utcnow()).delete()
+    db.session.commit()
+    return deleted
+
+
+@tokens_cli.command("purge")
+def purge():
+    """Delete revocation rows of tokens that have expired anyway."""
+    deleted = purge_expired()
+    click.echo(f"Purged {deleted} expired revocations")
@@ -0,0 +1,61 @@
+"""
+Read-replica routing.
+
+When DATABASE_REPLICA_URL is set, a second engine is created for it.
+Resource methods decorated with @use_replica send their SELECTs there; every
+other request, anything flushed in the session, and clients that wrote
+recently (the `db_primary` cookie, REPLICA_STICKY_SECONDS) stay on the
+primary so users always read their own writes.
+"""
+from functools import wraps
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+
+REPLICA_FLAG = "app.db_use_replica"
+STICKY_COOKIE = "db_primary"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and request.environ.get(REPLICA_FLAG):
+            if self._flushing:
+                # the request wrote after all: pin it to the primary from now on
+                request.environ[REPLICA_FLAG] = False
+            else:
+                engine = current_app.extensions.get("db_replica")
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_replica(fn):
+    """Route the reads of a read-only endpoint to the replica, if configured."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if STICKY_COOKIE not in request.cookies:
+            request.environ[REPLICA_FLAG] = True
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def register_replica_routing(app):
+    url = app.config.get("DATABASE_REPLICA_URL")
+    if not url:
+        return
+
+    engine = create_engine(url, **app.config.get("REPLICA_ENGINE_OPTIONS", {}))
+    app.extensions["db_replica"] = engine
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+        # Replicas lag; keep this client on the primary for a few seconds
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                STICKY_COOKIE, "1",
+                max_age=current_app.config["REPLICA_STICKY_SECONDS"],
+                httponly=True, samesite="Lax",
+            )
+        return response
@@ -1,8 +1,42 @@
+import json
+
 from ..extensions import ma
+from ..models.archived_listing import ArchivedListing
 from ..models.listing import Listing
 
 class ListingSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Listing
         load_instance = True
-        include_fk = True
\ No newline at end of file
+        include_fk = True
+
+    image_urls = ma.Method("get_image_urls")
+    images = ma.Method("get_images")
+
+    def get_image_urls(self, obj):
+        # legacy JSON column first, then rows from the ListingImage table
+        legacy = json.loads(obj.image_urls or "[]")
+        return legacy + [img.url for img in obj.images]
+
+    def get_images(self, obj):
+        # variants stay empty until the background resize has finished
+        return [{"url": img.url, "variants": img.variants or {}} for img in obj.images]
+
+
+class ArchivedListingSchema(ma.SQLAlchemyAutoSchema):
+    """Same shape as ListingSchema, plus archived_at."""
+
+    class Meta:
+        model = ArchivedListing
+        load_instance = True
+        include_fk = True
+
+    image_urls = ma.Method("get_image_urls")
+    images = ma.Method("get_images")
+
+    def get_image_urls(self, obj):
+        legacy = json.loads(obj.image_urls or "[]")
+        return legacy + [img["url"] for img in obj.images]
+
+    def get_images(self, obj):
+        return [{"url": img["url"], "variants": img.get("variants") or {}} for img in obj.images]
@@ -0,0 +1,18 @@
+from ..extensions import ma
+from ..models.saved_search import SavedSearch
+from ..models.search_alert import SearchAlert
+
+
+class SavedSearchSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = SavedSearch
+        load_instance = True
+        include_fk = True
+        exclude = ("city_key", "property_type_key", "price_floor")
+
+
+class SearchAlertSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = SearchAlert
+        load_instance = True
+        include_fk = True
@@ -0,0 +1,292 @@
+"""
+"Similar homes nearby" from an in-memory feature matrix.
+
+Each worker keeps the active listings that have coordinates as NumPy arrays,
+one float32 row per listing:
+
+    [log price (standardized), bedrooms, bathrooms, property_type one-hot...,
+     north, east (km)]
+
+each group scaled by its FEATURE_WEIGHTS entry, so a single squared euclidean
+distance ranks both "looks alike" and "is close by". Rows are sorted by
+latitude: the candidates for a query are one contiguous block found with
+searchsorted, narrowed by longitude with a vectorized mask, and the top k come
+from argpartition over that block only - no database scan per page view.
+
+Writes made through the API update this worker's matrix right away (the old
+row is tombstoned and the new one appended to a small unsorted tail). The
+whole matrix is rebuilt in a background thread every SIMILAR_RELOAD_SECONDS,
+which compacts the tail and picks up other workers' writes; listings deleted
+elsewhere are dropped when a query no longer finds them.
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from .extensions import db
+from .geo import KM_PER_DEG_LAT
+from .models.listing import Listing
+
+# what the index needs of a listing, detached from the session
+ListingPoint = namedtuple(
+    "ListingPoint", "id price bedrooms bathrooms property_type status lat lng"
+)
+
+
+def listing_point(data):
+    """From a serialized listing (ListingSchema output)."""
+    return ListingPoint(*(data.get(f) for f in ListingPoint._fields))
+
+
+# scale of each feature group; a distance of 1.0 is roughly one standard
+# deviation of log price, two bedrooms, a different property type or 2 km
+FEATURE_WEIGHTS = {"price": 1.0, "rooms": 0.5, "type": 0.7, "km": 0.5}
+
+
+def _positions(lat, lng):
+    """North/east offsets in km (equirectangular, fine at neighbourhood scale)."""
+    north = lat * KM_PER_DEG_LAT
+    east = lng * KM_PER_DEG_LAT * np.cos(np.radians(lat))
+    return north, east
+
+
+class FeatureSpace:
+    """Turns listing columns into weighted feature rows."""
+
+    def __init__(self, prices, property_types):
+        log_prices = np.log1p(np.asarray(prices, dtype=np.float64))
+        self.price_mean = float(log_prices.mean()) if len(log_prices) else 0.0
+        self.price_std = float(log_prices.std()) if len(log_prices) else 0.0
+        self.price_std = self.price_std or 1.0
+        # types first seen after a rebuild get no one-hot column until the next one
+        self.types = {t: i for i, t in enumerate(sorted({t for t in property_types if t}))}
+        self.width = 5 + len(self.types)
+
+    def rows(self, price, bedrooms, bathrooms, property_type, lat, lng):
+        """Feature rows for column arrays of equal length."""
+        w = FEATURE_WEIGHTS
+        n = len(price)
+        out = np.zeros((n, self.width), dtype=np.float32)
+        log_price = np.log1p(np.asarray(price, dtype=np.float64))
+        out[:, 0] = (log_price - self.price_mean) / self.price_std * w["price"]
+        out[:, 1] = np.nan_to_num(np.asarray(bedrooms, dtype=np.float64)) * w["rooms"]
+        out[:, 2] = np.nan_to_num(np.asarray(bathrooms, dtype=np.float64)) * w["rooms"]
+        for row, t in enumerate(property_type):
+            col = self.types.get(t)
+            if col is not None:
+                out[row, 5 + col] = w["type"]
+        north, east = _positions(np.asarray(lat, dtype=np.float64), np.asarray(lng, dtype=np.float64))
+        out[:, 3] = north * w["km"]
+        out[:, 4] = east * w["km"]
+        return out
+
+    def row(self, listing):
+        return self.rows(
+            [listing.price], [listing.bedrooms], [listing.bathrooms],
+            [listing.property_type], [listing.lat], [listing.lng],
+        )[0]
+
+
+class FeatureBlock:
+    """
+    The matrix plus its id/lat/lng columns. Rows [0, sorted_rows) are ordered
+    by latitude; later rows are the tail appended since the rebuild.
+    """
+
+    def __init__(self, space, ids, lat, lng, features):
+        order = np.argsort(lat, kind="stable")
+        n = len(ids)
+        capacity = max(16, int(n * 1.1) + 16)
+        self.space = space
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.lat = np.zeros(capacity, dtype=np.float64)
+        self.lng = np.zeros(capacity, dtype=np.float64)
+        self.features = np.zeros((capacity, space.width), dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.ids[:n] = np.asarray(ids, dtype=np.int64)[order]
+        self.lat[:n] = np.asarray(lat)[order]
+        self.lng[:n] = np.asarray(lng)[order]
+        self.features[:n] = features[order]
+        self.alive[:n] = True
+        self.size = self.sorted_rows = n
+        self.row_of = {int(i): r for r, i in enumerate(self.ids[:n])}
+
+    def _grow(self):
+        # readers keep whichever arrays they picked up; both stay valid
+        capacity = len(self.ids) * 2
+        for name in ("ids", "lat", "lng", "alive"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        features = np.zeros((capacity, self.space.width), dtype=np.float32)
+        features[:len(self.features)] = self.features
+        self.features = features
+
+    def remove(self, listing_id):
+        row = self.row_of.pop(listing_id, None)
+        if row is not None:
+            self.alive[row] = False
+
+    def put(self, point):
+        self.remove(point.id)
+        if point.status != "active" or point.lat is None or point.lng is None:
+            return
+        if self.size == len(self.ids):
+            self._grow()
+        row = self.size
+        self.ids[row] = point.id
+        self.lat[row] = point.lat
+        self.lng[row] = point.lng
+        self.features[row] = self.space.row(point)
+        self.alive[row] = True
+        self.row_of[point.id] = row
+        self.size += 1
+
+    def candidates(self, lat, lng, radius_km):
+        """Row numbers of the live rows inside the bounding box of the circle."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        lo, hi = np.searchsorted(self.lat[:self.sorted_rows], [lat - dlat, lat + dlat])
+        rows = np.concatenate([
+            np.arange(lo, hi), np.arange(self.sorted_rows, self.size)
+        ])
+        cos_lat = math.cos(math.radians(lat))
+        mask = self.alive[rows]
+        if cos_lat > 1e-6:
+            dlng = dlat / cos_lat
+            if dlng < 180:
+                mask &= np.abs(self.lng[rows] - lng) <= dlng
+        if len(rows) > hi - lo:  # tail rows are not latitude-filtered yet
+            mask &= np.abs(self.lat[rows] - lat) <= dlat
+        return rows[mask]
+
+
+def _load_block():
+    query = select(
+        Listing.id, Listing.price, Listing.bedrooms, Listing.bathrooms,
+        Listing.property_type, Listing.lat, Listing.lng,
+    ).where(Listing.status == "active", Listing.lat.isnot(None), Listing.lng.isnot(None))
+    with db.engine.connect() as conn:
+        rows = conn.execute(query).all()
+
+    ids, price, bedrooms, bathrooms, ptype, lat, lng = (
+        zip(*rows) if rows else ([],) * 7
+    )
+    space = FeatureSpace(price, ptype)
+    features = space.rows(price, bedrooms, bathrooms, ptype, lat, lng)
+    return FeatureBlock(space, ids, np.asarray(lat, dtype=np.float64), lng, features)
+
+
+class SimilarityIndex:
+    def __init__(self, app, reload_seconds):
+        self.app = app
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._replay = None  # writes seen while a rebuild runs
+        self._block = _load_block()
+        self._next_reload = time.monotonic() + reload_seconds
+
+    def similar(self, listing, k, radius_km, max_radius_km):
+        """[(listing_id, feature distance)] nearest first, `listing` excluded."""
+        self._maybe_reload()
+        block = self._block
+        target = block.space.row(listing)
+        while True:
+            with self._lock:
+                rows = block.candidates(listing.lat, listing.lng, radius_km)
+                ids = block.ids[rows]
+                features = block.features[rows]
+            keep = ids != listing.id
+            ids, features = ids[keep], features[keep]
+            if len(ids) >= k or radius_km >= max_radius_km:
+                break
+            radius_km = min(radius_km * 2, max_radius_km)
+
+        diff = features - target
+        d2 = np.einsum("ij,ij->i", diff, diff)
+        if len(d2) > k:
+            top = np.argpartition(d2, k)[:k]
+        else:
+            top = np.arange(len(d2))
+        top = top[np.argsort(d2[top], kind="stable")]
+        return [(int(ids[i]), float(math.sqrt(d2[i]))) for i in top]
+
+    def put(self, point):
+        with self._lock:
+            self._block.put(point)
+            if self._replay is not None:
+                self._replay.append(("put", point))
+
+    def remove(self, listing_id):
+        with self._lock:
+            self._block.remove(listing_id)
+            if self._replay is not None:
+                self._replay.append(("remove", listing_id))
+
+    def _maybe_reload(self):
+        if time.monotonic() < self._next_reload:
+            return
+        with self._lock:
+            if self._replay is not None or time.monotonic() < self._next_reload:
+                return  # already rebuilding
+            self._replay = []
+        threading.Thread(target=self.reload, name="similarity-reload", daemon=True).start()
+
+    def reload(self):
+        """Rebuild the matrix from the database and swap it in."""
+        with self._lock:
+            if self._replay is None:
+                self._replay = []
+        try:
+            with self.app.app_context():
+                block = _load_block()
+        except Exception:
+            self.app.logger.exception("Similar listings rebuild failed")
+            block = None
+        with self._lock:
+            if block is not None:
+                for op, arg in self._replay:
+                    if op == "put":
+                        block.put(arg)
+                    else:
+                        block.remove(arg)
+                self._block = block
+            self._replay = None
+            self._next_reload = time.monotonic() + self.reload_seconds
+
+    def __len__(self):
+        return len(self._block.row_of)
+
+
+_lock = threading.Lock()
+
+
+def get_similarity_index():
+    """This process's index, built (blocking) on first use."""
+    app = current_app._get_current_object()
+    index = app.extensions.get("similarity")
+    if index is None:
+        with _lock:
+            index = app.extensions.get("similarity")
+            if index is None:
+                index = SimilarityIndex(app, app.config["SIMILAR_RELOAD_SECONDS"])
+                app.extensions["similarity"] = index
+    return index
+
+
+def listing_changed(data):
+    """Reflect a committed create/update (the serialized listing); no-op until built."""
+    index = current_app.extensions.get("similarity")
+    if index is not None:
+        index.put(listing_point(data))
+
+
+def listing_removed(listing_id):
+    index = current_app.extensions.get("similarity")
+    if index is not None:
+        index.remove(listing_id)
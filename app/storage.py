@@ -0,0 +1,135 @@
+"""
+Content-addressed storage for uploaded images.
+
+Files are streamed to a temp file in the upload folder in fixed-size chunks
+while being hashed, then atomically renamed to "<sha256>.<ext>". Identical
+uploads (to any listing) therefore share one file on disk.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+
+from flask import abort, current_app, send_from_directory
+from sqlalchemy import select
+from werkzeug.security import safe_join
+
+from .extensions import db
+from .models.listing_image import ListingImage
+
+CHUNK_SIZE = 64 * 1024
+
+# "<sha256>.<ext>" or a derived "<sha256>-<variant>.<ext>"; the bytes behind
+# such a name never change, so it can be cached forever
+CONTENT_NAME_RE = re.compile(r"^[0-9a-f]{64}(?:-[a-z0-9]+)?\.[a-z0-9]+$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Different spellings of the same format should not store the bytes twice
+EXTENSION_ALIASES = {"jpeg": "jpg"}
+
+
+class ImageTooLarge(Exception):
+    """Raised when an upload exceeds MAX_IMAGE_BYTES."""
+
+
+def save_content_addressed(stream, ext, folder, max_bytes, chunk_size=CHUNK_SIZE):
+    """
+    Copy `stream` into `folder` under its SHA-256 name.
+
+    Returns (sha256, size, filename, created); created is False when the
+    file was already there (another upload of the same bytes, which may not
+    have committed its row yet). Raises ImageTooLarge (leaving nothing
+    behind) once more than `max_bytes` have been read.
+    """
+    ext = EXTENSION_ALIASES.get(ext, ext)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImageTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        filename = f"{sha256}.{ext}"
+        final_path = os.path.join(folder, filename)
+        # link() fails if the name exists, so exactly one upload creates it
+        try:
+            os.link(tmp_path, final_path)
+            created = True
+        except FileExistsError:
+            created = False
+        os.remove(tmp_path)
+        return sha256, size, filename, created
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def remove_unreferenced(filenames, folder):
+    """
+    Delete content-addressed uploads that no listing_image row points at.
+    Only pass files the caller created itself (the files of a rejected upload
+    batch): a file that already existed may belong to a concurrent upload
+    whose row is not committed yet.
+    """
+    by_sha = {name.split(".", 1)[0]: name for name in filenames}
+    if not by_sha:
+        return
+    referenced = set(db.session.scalars(
+        select(ListingImage.sha256).where(ListingImage.sha256.in_(by_sha)).distinct()
+    ))
+    for sha256, name in by_sha.items():
+        if sha256 not in referenced:
+            try:
+                os.remove(os.path.join(folder, name))
+            except FileNotFoundError:
+                pass
+
+
+def is_content_addressed(filename: str) -> bool:
+    return bool(CONTENT_NAME_RE.match(filename))
+
+
+def send_upload(filename):
+    """
+    Response for GET /uploads/<filename>.
+
+    UPLOADS_SERVE_MODE:
+    - "flask" (default): Flask streams the file itself, with ETag /
+      If-None-Match, If-Modified-Since and Range support.
+    - "x-sendfile": same, but werkzeug emits X-Sendfile (USE_X_SENDFILE) and
+      an empty body for Apache/lighttpd to fill.
+    - "x-accel": empty response with X-Accel-Redirect to
+      UPLOADS_ACCEL_PREFIX for an nginx `internal` location.
+    """
+    config = current_app.config
+    folder = os.path.abspath(config["UPLOAD_FOLDER"])
+    immutable = is_content_addressed(filename)
+    max_age = IMMUTABLE_MAX_AGE if immutable else config["UPLOADS_MAX_AGE"]
+
+    if config["UPLOADS_SERVE_MODE"] == "x-accel":
+        path = safe_join(folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = current_app.response_class()
+        response.headers["X-Accel-Redirect"] = config["UPLOADS_ACCEL_PREFIX"].rstrip("/") + "/" + filename
+        response.content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    else:
+        response = send_from_directory(folder, filename, max_age=max_age)
+
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,204 @@
+"""
+Slow-request tracing.
+
+With TRACE_ENABLED, every request collects lightweight spans: the handler
+itself, each SQL statement (text, parameters, row count, timing) and any
+`span("serialize")` blocks in the resources. Parameters are emitted as their
+type (and length for strings / bytes) only; TRACE_PARAMETERS=true keeps the
+values, which include password hashes, emails and message bodies. Requests slower than TRACE_SLOW_MS, or picked by
+TRACE_SAMPLE_RATE, are emitted as one JSON document to the "app.trace" logger
+and/or an in-memory ring buffer (GET /admin/traces). With TRACE_EXPLAIN the
+SELECTs of an emitted trace are re-run under EXPLAIN (QUERY PLAN on SQLite)
+after the response has been produced.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .extensions import db
+
+trace_logger = logging.getLogger("app.trace")
+
+_current = threading.local()
+
+
+class Trace:
+    __slots__ = ("start", "spans", "max_statements", "dropped", "_sql_start")
+
+    def __init__(self, max_statements):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.max_statements = max_statements
+        self.dropped = 0
+        self._sql_start = 0.0
+
+    def offset_ms(self, t):
+        return round((t - self.start) * 1000, 3)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _trace_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = getattr(_current, "trace", None)
+    if trace is not None:
+        trace._sql_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _trace_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = getattr(_current, "trace", None)
+    if trace is None:
+        return
+    if len(trace.spans) >= trace.max_statements:
+        trace.dropped += 1
+        return
+    end = time.perf_counter()
+    trace.spans.append({
+        "kind": "sql",
+        "start_ms": trace.offset_ms(trace._sql_start),
+        "duration_ms": round((end - trace._sql_start) * 1000, 3),
+        "statement": statement,
+        "parameters": parameters,
+        "rowcount": cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None,
+        "executemany": executemany,
+        "dialect": conn.dialect.name,
+    })
+
+
+@contextmanager
+def span(name):
+    """Time a block of the current request (no-op outside a traced request)."""
+    trace = getattr(_current, "trace", None)
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append({
+            "kind": name,
+            "start_ms": trace.offset_ms(start),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+        })
+
+
+def _json_safe(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return repr(value)
+
+
+def _redact(value):
+    """Describe a bound parameter without its value: "str(12)", "int", None."""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return {str(k): _redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact(v) for v in value]
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def explain(statement, parameters, dialect):
+    """Plan for one captured SELECT, as a list of text rows."""
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    return [" | ".join(str(col) for col in row) for row in rows]
+
+
+def init_tracing(app):
+    if not app.config.get("TRACE_ENABLED", False):
+        return
+
+    buffer = app.extensions["traces"] = deque(maxlen=app.config["TRACE_BUFFER_SIZE"])
+
+    # reading traces/metrics must not push real traces out of the buffer
+    skip_prefixes = ("/admin/", app.config.get("METRICS_PATH", "/metrics"))
+
+    @app.before_request
+    def start_trace():
+        if request.path.startswith(skip_prefixes):
+            _current.trace = None
+            return
+        _current.trace = Trace(app.config["TRACE_MAX_STATEMENTS"])
+
+    @app.after_request
+    def finish_trace(response):
+        trace = getattr(_current, "trace", None)
+        if trace is not None and response.is_streamed:
+            # long-lived streams (SSE) are slow by design
+            _current.trace = None
+        elif trace is not None:
+            trace.spans.insert(0, {
+                "kind": "request",
+                "start_ms": 0.0,
+                "duration_ms": trace.offset_ms(time.perf_counter()),
+                "status": response.status_code,
+            })
+        return response
+
+    @app.teardown_request
+    def emit_trace(exc=None):
+        trace = getattr(_current, "trace", None)
+        _current.trace = None  # stop capturing before any EXPLAIN below
+        if trace is None or not trace.spans or trace.spans[0]["kind"] != "request":
+            return
+
+        duration_ms = trace.spans[0]["duration_ms"]
+        slow = duration_ms >= app.config["TRACE_SLOW_MS"]
+        sampled = random.random() < app.config["TRACE_SAMPLE_RATE"]
+        if not (slow or sampled):
+            return
+
+        sql = [s for s in trace.spans if s["kind"] == "sql"]
+        if app.config["TRACE_EXPLAIN"]:
+            for s in sql:
+                if s["statement"].lstrip().upper().startswith("SELECT") and not s["executemany"]:
+                    try:
+                        s["plan"] = explain(s["statement"], s["parameters"], s["dialect"])
+                    except Exception as err:
+                        s["plan_error"] = str(err)
+        if not app.config["TRACE_PARAMETERS"]:
+            for s in sql:
+                s["parameters"] = _redact(s["parameters"])
+
+        document = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.url_rule.rule if request.url_rule else None,
+            "reason": "slow" if slow else "sampled",
+            "duration_ms": duration_ms,
+            "sql_count": len(sql) + trace.dropped,
+            "sql_ms": round(sum(s["duration_ms"] for s in sql), 3),
+            "dropped_statements": trace.dropped,
+            "spans": _json_safe(trace.spans),
+        }
+
+        output = app.config["TRACE_OUTPUT"]
+        if output in ("buffer", "both"):
+            buffer.append(document)
+        if output in ("log", "both"):
+            trace_logger.warning(json.dumps(document))
+
+
+def recent_traces(limit=None):
+    traces = list(current_app.extensions.get("traces", ()))
+    traces.reverse()
+    return traces[:limit] if limit else traces
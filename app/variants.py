@@ -0,0 +1,198 @@
+"""
+Resized variants (thumbnails) of uploaded listing images.
+
+Decoding and resizing is CPU-bound, so uploads hand it to a process pool and
+return immediately; when a job finishes, the variant URLs are recorded on every
+ListingImage row sharing that content hash. Variants are named
+"<sha256>-<variant>.jpg" and are immutable like their originals.
+
+IMAGE_VARIANTS_MODE: "process" (default), "inline" (render in the request,
+handy for tests and tiny deployments) or "off".
+"""
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+
+from .extensions import db
+from .models.listing import Listing
+from .models.listing_image import ListingImage
+from .storage import save_content_addressed
+
+VARIANT_SIZES = {"thumb": 300, "medium": 1024}
+
+
+def render_variants(src_path, sha256, folder, sizes=VARIANT_SIZES):
+    """Runs in a worker process. Returns {variant: url}."""
+    targets = {name: f"{sha256}-{name}.jpg" for name in sizes}
+    missing = {
+        name: filename for name, filename in targets.items()
+        if not os.path.exists(os.path.join(folder, filename))
+    }
+
+    if missing:
+        from PIL import Image, ImageOps
+
+        with Image.open(src_path) as im:
+            im = ImageOps.exif_transpose(im).convert("RGB")
+            for name, filename in missing.items():
+                copy = im.copy()
+                copy.thumbnail((sizes[name], sizes[name]))
+                tmp_path = os.path.join(folder, f".{filename}.tmp")
+                copy.save(tmp_path, "JPEG", quality=85, optimize=True)
+                os.replace(tmp_path, os.path.join(folder, filename))
+
+    return {name: f"/uploads/{filename}" for name, filename in targets.items()}
+
+
+def record_variants(app, sha256, variants):
+    with app.app_context():
+        try:
+            ListingImage.query.filter_by(sha256=sha256).update(
+                {"variants": variants}, synchronize_session=False
+            )
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def _on_done(app, sha256, future):
+    try:
+        variants = future.result()
+    except Exception:
+        app.logger.exception("Variant generation failed for %s", sha256)
+        return
+    record_variants(app, sha256, variants)
+
+
+_lock = threading.Lock()
+
+
+def get_variant_pool(app):
+    """Per-process pool, created on first use (i.e. after gunicorn forks)."""
+    pool = app.extensions.get("variant_pool")
+    if pool is None:
+        with _lock:
+            pool = app.extensions.get("variant_pool")
+            if pool is None:
+                pool = ProcessPoolExecutor(
+                    max_workers=app.config["IMAGE_VARIANT_WORKERS"],
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                app.extensions["variant_pool"] = pool
+    return pool
+
+
+def schedule_variants(images):
+    """Queue variant generation for [(sha256, filename), ...] after upload."""
+    app = current_app._get_current_object()
+    mode = app.config["IMAGE_VARIANTS_MODE"]
+    if mode == "off":
+        return
+
+    folder = os.path.abspath(app.config["UPLOAD_FOLDER"])
+    for sha256, filename in images:
+        args = (os.path.join(folder, filename), sha256, folder)
+        if mode == "inline":
+            try:
+                record_variants(app, sha256, render_variants(*args))
+            except Exception:
+                app.logger.exception("Variant generation failed for %s", sha256)
+        else:
+            future = get_variant_pool(app).submit(render_variants, *args)
+            future.add_done_callback(partial(_on_done, app, sha256))
+
+
+images_cli = AppGroup("images", help="Listing image maintenance.")
+
+
+@images_cli.command("backfill")
+@click.option("--workers", default=None, type=int, help="Worker processes (default IMAGE_VARIANT_WORKERS).")
+def backfill(workers):
+    """Import legacy image_urls into ListingImage and render missing variants."""
+    app = current_app._get_current_object()
+    folder = os.path.abspath(app.config["UPLOAD_FOLDER"])
+
+    # 1. legacy JSON image_urls -> content-addressed ListingImage rows
+    imported = 0
+    legacy = Listing.query.filter(
+        Listing.image_urls.isnot(None), Listing.image_urls.notin_(["", "[]"])
+    ).all()
+    for listing in legacy:
+        known = {img.sha256 for img in listing.images}
+        for url in json.loads(listing.image_urls):
+            name = url.rsplit("/", 1)[-1]
+            path = os.path.join(folder, name)
+            if not os.path.isfile(path):
+                click.echo(f"listing {listing.id}: missing {path}, skipped", err=True)
+                continue
+            ext = name.rsplit(".", 1)[-1].lower()
+            with open(path, "rb") as fh:
+                sha256, size, filename, _ = save_content_addressed(
+                    fh, ext, folder, float("inf")
+                )
+            if sha256 not in known:
+                listing.images.append(ListingImage(
+                    sha256=sha256, url=f"/uploads/{filename}", size=size
+                ))
+                known.add(sha256)
+                imported += 1
+        listing.image_urls = "[]"
+        db.session.commit()
+    click.echo(f"Imported {imported} legacy images from {len(legacy)} listings")
+
+    # 2. render variants for every distinct hash that has none yet
+    def report(done, total, sha256, exc):
+        if exc is not None:
+            click.echo(f"{sha256}: {exc}", err=True)
+
+    done, total = render_missing_variants(app, workers, on_result=report)
+    click.echo(f"Rendered variants for {done}/{total} images")
+
+
+def render_missing_variants(app, workers=None, on_result=None):
+    """
+    Render variants for every image hash that has none, on a process pool.
+    on_result(finished, total, sha256, exc or None) is called after each image.
+    Returns (rendered, total).
+    """
+    folder = os.path.abspath(app.config["UPLOAD_FOLDER"])
+    pending = (
+        db.session.query(ListingImage.sha256, func.min(ListingImage.url))
+        .filter(ListingImage.variants.is_(None))
+        .group_by(ListingImage.sha256)
+        .all()
+    )
+    jobs = [
+        (os.path.join(folder, url.rsplit("/", 1)[-1]), sha256, folder)
+        for sha256, url in pending
+    ]
+
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=workers or app.config["IMAGE_VARIANT_WORKERS"],
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as pool:
+        futures = {pool.submit(render_variants, *job): job[1] for job in jobs}
+        try:
+            for finished, (future, sha256) in enumerate(futures.items(), 1):
+                try:
+                    record_variants(app, sha256, future.result())
+                    done += 1
+                    error = None
+                except Exception as exc:
+                    error = exc
+                if on_result is not None:
+                    on_result(finished, len(jobs), sha256, error)
+        except BaseException:
+            # e.g. a cancelled job: don't render the rest first
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return done, len(jobs)
@@ -0,0 +1,355 @@
+"""
+Partner webhooks through a transactional outbox.
+
+Writes call record_event() before their commit, so an OutboxEvent row exists
+exactly when the listing/booking/message does; no partner URL is called on
+the request path. A per-process WebhookDispatcher thread then, every
+WEBHOOK_INTERVAL_SECONDS:
+
+1. fans undispatched events out into one WebhookDelivery per interested
+   subscription (claimed with UPDATE ... RETURNING, so two workers never fan
+   out the same event);
+2. leases up to WEBHOOK_BATCH_SIZE x WEBHOOK_CONCURRENCY due deliveries
+   (lease_until, re-checked in the UPDATE's WHERE so competing workers skip
+   each other's rows);
+3. POSTs them as batches of at most WEBHOOK_BATCH_SIZE events per
+   subscription, at most WEBHOOK_CONCURRENCY subscriptions at a time, over a
+   pooled requests.Session;
+4. marks 2xx batches delivered; others are retried with exponential backoff
+   (WEBHOOK_BACKOFF_SECONDS doubling up to WEBHOOK_BACKOFF_MAX_SECONDS, with
+   jitter) and given up ("dead") after WEBHOOK_MAX_ATTEMPTS.
+
+Each request body is {"events": [{"id", "type", "created_at", "data"}]} and is
+signed: X-Webhook-Signature: sha256=<hex HMAC of the body with the
+subscription's secret>. Delivery is at least once; receivers dedupe on id.
+
+`flask webhooks dispatch` runs one pass in the foreground and `flask webhooks
+purge` deletes old delivered events.
+"""
+import atexit
+import hashlib
+import hmac
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import click
+import requests
+from flask import current_app
+from flask.cli import AppGroup
+from requests.adapters import HTTPAdapter
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+
+from .extensions import db
+from .models.outbox_event import OutboxEvent
+from .models.webhook_delivery import WebhookDelivery
+from .models.webhook_subscription import WebhookSubscription
+
+EVENT_TYPES = ("listing.created", "booking.created", "message.created")
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def record_event(event_type, payload):
+    """Add an outbox row to the current transaction; the caller commits."""
+    record_events(event_type, [payload])
+
+
+def record_events(event_type, payloads):
+    if not current_app.config["WEBHOOKS_ENABLED"] or not payloads:
+        return
+    now = _utcnow()
+    db.session.execute(insert(OutboxEvent), [
+        {"event_type": event_type, "payload": json.dumps(p), "created_at": now}
+        for p in payloads
+    ])
+    get_webhook_dispatcher()  # this worker delivers what it records
+
+
+def sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def backoff_seconds(attempts, base, cap):
+    """Delay before retry number `attempts` (1-based), with equal jitter."""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class WebhookDispatcher:
+    def __init__(self, app, interval_seconds=2, batch_size=100, concurrency=4,
+                 timeout=5, max_attempts=10, backoff=10, backoff_max=3600, lease_seconds=120):
+        self.app = app
+        self.interval = interval_seconds
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lease = timedelta(seconds=lease_seconds)
+
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        self._senders = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="webhook")
+
+        self._run_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="webhook-dispatcher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def run_once(self):
+        """One fan-out + send pass. Returns (fanned_out, delivered, failed)."""
+        with self._run_lock, self.app.app_context():
+            try:
+                fanned_out = self._fan_out()
+                delivered, failed = self._send_due()
+                return fanned_out, delivered, failed
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Webhook dispatch failed; retrying later")
+                return 0, 0, 0
+            finally:
+                db.session.remove()
+
+    def stop(self):
+        # undelivered rows stay in the outbox for the next process
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join(timeout=self.timeout + 5)
+        self._senders.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.run_once()
+
+    def _fan_out(self):
+        events = OutboxEvent.__table__
+        total = 0
+        while True:
+            now = _utcnow()
+            claimed = db.session.execute(
+                update(events)
+                .where(
+                    events.c.id.in_(
+                        select(events.c.id)
+                        .where(events.c.dispatched_at.is_(None))
+                        .order_by(events.c.id)
+                        .limit(self.batch_size)
+                    ),
+                    events.c.dispatched_at.is_(None),
+                )
+                .values(dispatched_at=now)
+                .returning(events.c.id, events.c.event_type)
+            ).all()
+            if not claimed:
+                db.session.commit()
+                return total
+
+            subscriptions = WebhookSubscription.query.filter_by(is_active=True).all()
+            rows = [
+                {"subscription_id": s.id, "event_id": event_id, "status": "pending",
+                 "attempts": 0, "next_attempt_at": now}
+                for event_id, event_type in sorted(claimed)
+                for s in subscriptions
+                if s.wants(event_type)
+            ]
+            if rows:
+                db.session.execute(insert(WebhookDelivery), rows)
+            db.session.commit()
+            total += len(claimed)
+            if len(claimed) < self.batch_size:
+                return total
+
+    def _claim_due(self):
+        deliveries = WebhookDelivery.__table__
+        now = _utcnow()
+        due = and_(
+            deliveries.c.status == "pending",
+            deliveries.c.next_attempt_at <= now,
+            or_(deliveries.c.lease_until.is_(None), deliveries.c.lease_until < now),
+        )
+        ids = db.session.execute(
+            update(deliveries)
+            .where(
+                deliveries.c.id.in_(
+                    select(deliveries.c.id)
+                    .where(due)
+                    .order_by(deliveries.c.next_attempt_at, deliveries.c.id)
+                    .limit(self.batch_size * self.concurrency)
+                ),
+                due,
+            )
+            .values(lease_until=now + self.lease)
+            .returning(deliveries.c.id)
+        ).scalars().all()
+        db.session.commit()
+        return ids
+
+    def _send_due(self):
+        ids = self._claim_due()
+        if not ids:
+            return 0, 0
+
+        rows = (
+            db.session.query(WebhookDelivery, OutboxEvent)
+            .join(OutboxEvent, OutboxEvent.id == WebhookDelivery.event_id)
+            .filter(WebhookDelivery.id.in_(ids))
+            .order_by(WebhookDelivery.event_id)
+            .all()
+        )
+        subscriptions = {
+            s.id: s for s in WebhookSubscription.query.filter(
+                WebhookSubscription.id.in_({d.subscription_id for d, _ in rows})
+            )
+        }
+
+        batches = {}
+        for delivery, event in rows:
+            batches.setdefault(delivery.subscription_id, []).append((delivery, event))
+
+        jobs = []
+        for subscription_id, items in batches.items():
+            s = subscriptions.get(subscription_id)
+            if s is None or not s.is_active:
+                jobs.append(([d.id for d, _ in items], "subscription disabled", True))
+                continue
+            for start in range(0, len(items), self.batch_size):
+                chunk = items[start:start + self.batch_size]
+                jobs.append(self._senders.submit(self._post, s.url, s.secret, chunk))
+
+        results = [job if isinstance(job, tuple) else job.result() for job in jobs]
+        attempts = {d.id: d.attempts for d, _ in rows}
+        return self._record_results(results, attempts)
+
+    def _post(self, url, secret, items):
+        """Runs on the sender pool. Returns (delivery ids, error or None, give up)."""
+        body = json.dumps({"events": [
+            {"id": event.id, "type": event.event_type,
+             "created_at": event.created_at.isoformat(), "data": json.loads(event.payload)}
+            for _, event in items
+        ]}).encode()
+        ids = [d.id for d, _ in items]
+        try:
+            resp = self.http.post(url, data=body, timeout=self.timeout, headers={
+                "Content-Type": "application/json",
+                "X-Webhook-Signature": sign(secret, body),
+            })
+        except requests.RequestException as exc:
+            return ids, f"{type(exc).__name__}: {exc}"[:500], False
+        if 200 <= resp.status_code < 300:
+            return ids, None, False
+        return ids, f"HTTP {resp.status_code}", False
+
+    def _record_results(self, results, attempts):
+        deliveries = WebhookDelivery.__table__
+        now = _utcnow()
+        delivered, retries = [], []
+        for ids, error, give_up in results:
+            if error is None:
+                delivered.extend(ids)
+                continue
+            for delivery_id in ids:
+                n = attempts[delivery_id] + 1
+                dead = give_up or n >= self.max_attempts
+                retries.append({
+                    "delivery_id": delivery_id,
+                    "attempts": n,
+                    "status": "dead" if dead else "pending",
+                    "next_attempt_at": now + timedelta(
+                        seconds=0 if dead else backoff_seconds(n, self.backoff, self.backoff_max)
+                    ),
+                    "last_error": error,
+                })
+
+        if delivered:
+            db.session.execute(
+                update(deliveries)
+                .where(deliveries.c.id.in_(delivered))
+                .values(status="delivered", delivered_at=now, lease_until=None,
+                        attempts=deliveries.c.attempts + 1, last_error=None)
+            )
+        if retries:
+            db.session.execute(
+                update(deliveries)
+                .where(deliveries.c.id == bindparam("delivery_id"))
+                .values(attempts=bindparam("attempts"), status=bindparam("status"),
+                        next_attempt_at=bindparam("next_attempt_at"),
+                        last_error=bindparam("last_error"), lease_until=None),
+                retries,
+            )
+        db.session.commit()
+        return len(delivered), len(retries)
+
+
+_lock = threading.Lock()
+
+
+def get_webhook_dispatcher():
+    """This process's dispatcher (None when webhooks are off), started on first use."""
+    app = current_app._get_current_object()
+    if not app.config["WEBHOOKS_ENABLED"]:
+        return None
+    dispatcher = app.extensions.get("webhook_dispatcher")
+    if dispatcher is None:
+        with _lock:
+            dispatcher = app.extensions.get("webhook_dispatcher")
+            if dispatcher is None:
+                config = app.config
+                dispatcher = WebhookDispatcher(
+                    app,
+                    interval_seconds=config["WEBHOOK_INTERVAL_SECONDS"],
+                    batch_size=config["WEBHOOK_BATCH_SIZE"],
+                    concurrency=config["WEBHOOK_CONCURRENCY"],
+                    timeout=config["WEBHOOK_TIMEOUT_SECONDS"],
+                    max_attempts=config["WEBHOOK_MAX_ATTEMPTS"],
+                    backoff=config["WEBHOOK_BACKOFF_SECONDS"],
+                    backoff_max=config["WEBHOOK_BACKOFF_MAX_SECONDS"],
+                    lease_seconds=config["WEBHOOK_LEASE_SECONDS"],
+                )
+                app.extensions["webhook_dispatcher"] = dispatcher
+    return dispatcher
+
+
+webhooks_cli = AppGroup("webhooks", help="Webhook outbox delivery.")
+
+
+@webhooks_cli.command("dispatch")
+def dispatch():
+    """Fan out and send everything due now, in the foreground."""
+    dispatcher = get_webhook_dispatcher()
+    if dispatcher is None:
+        raise click.ClickException("WEBHOOKS_ENABLED is off")
+    fanned_out, delivered, failed = dispatcher.run_once()
+    click.echo(f"Fanned out {fanned_out} events, delivered {delivered}, failed {failed}")
+
+
+def purge_events(days):
+    """Delete events older than `days` whose deliveries are all finished. Returns the count."""
+    cutoff = _utcnow() - timedelta(days=days)
+    unfinished = select(WebhookDelivery.event_id).where(WebhookDelivery.status == "pending")
+    old = select(OutboxEvent.id).where(
+        OutboxEvent.dispatched_at.isnot(None),
+        OutboxEvent.created_at < cutoff,
+        OutboxEvent.id.notin_(unfinished),
+    )
+    WebhookDelivery.query.filter(WebhookDelivery.event_id.in_(old)).delete(synchronize_session=False)
+    deleted = OutboxEvent.query.filter(OutboxEvent.id.in_(old)).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+@webhooks_cli.command("purge")
+@click.option("--days", default=7, show_default=True, help="Keep events newer than this.")
+def purge(days):
+    """Delete old events whose deliveries are all finished (delivered or dead)."""
+    deleted = purge_events(days)
+    click.echo(f"Purged {deleted} events")
@@ -0,0 +1,85 @@
+"""
+Bytes on the wire and CPU cost of gzip for the large JSON responses.
+
+For each endpoint: the plain body size, then per COMPRESS_LEVEL the gzipped
+size, the ratio, and the median time spent compressing one body (measured
+on the real response bodies, outside the request).
+
+Usage:
+    python benchmarks/compression.py --scale 20000
+    python benchmarks/compression.py --reuse --levels 1 6 9
+"""
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(ROOT, "bench_endpoints.db"))
+os.environ.setdefault("TRACE_OUTPUT", "buffer")
+
+from sqlalchemy import func
+
+from app import create_app
+from app.extensions import db
+from app.models import Listing
+from seed import CITIES, seed_scale
+
+
+def endpoints(app):
+    with app.app_context():
+        agent_id, _ = (
+            db.session.query(Listing.agent_id, func.count(Listing.id))
+            .group_by(Listing.agent_id)
+            .order_by(func.count(Listing.id).desc())
+            .first()
+        )
+    _, lat, lng, *_ = CITIES[0]
+    return [
+        ("/listings?per_page=100", "/listings?per_page=100"),
+        ("/listings/search 10km", f"/listings/search?lat={lat}&lng={lng}&radius_km=10"),
+        ("/listings/search 50km", f"/listings/search?lat={lat}&lng={lng}&radius_km=50"),
+        ("/agents/<busiest>", f"/agents/{agent_id}"),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=20000)
+    parser.add_argument("--reuse", action="store_true", help="Keep the existing database, skip seeding.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if not args.reuse:
+        seed_scale(args.scale)
+
+    app = create_app()
+    client = app.test_client()
+
+    print(f"{'endpoint':24s} {'plain KB':>9s}" + "".join(
+        f" {'L%d KB' % l:>8s} {'ratio':>6s} {'ms':>7s}" for l in args.levels
+    ))
+    for name, path in endpoints(app):
+        # the identity body, exactly as the app would compress it
+        body = client.get(path).data
+        wire = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert wire.headers.get("Content-Encoding") == "gzip" or len(body) < app.config["COMPRESS_MIN_SIZE"]
+
+        row = f"{name:24s} {len(body) / 1024:9.1f}"
+        for level in args.levels:
+            times = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                packed = gzip.compress(body, compresslevel=level, mtime=0)
+                times.append(time.perf_counter() - t0)
+            row += (f" {len(packed) / 1024:8.1f} {len(body) / len(packed):6.1f}"
+                    f" {statistics.median(times) * 1000:7.2f}")
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
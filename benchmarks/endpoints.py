@@ -0,0 +1,328 @@
+"""
+Endpoint latency benchmarks with JSON baselines.
+
+Seeds a dataset with seed.py --scale, then drives the hot endpoints through
+the Flask test client (in-process) or a real threaded WSGI server over HTTP,
+and reports p50/p95/p99 latency and throughput per scenario.
+
+Usage:
+    python benchmarks/endpoints.py --scale 20000 --save benchmarks/baselines/local.json
+    python benchmarks/endpoints.py --reuse --baseline benchmarks/baselines/local.json
+    python benchmarks/endpoints.py --server wsgi --concurrency 16 --only listings
+
+With --baseline, a scenario regresses when its p95 grows, or its throughput
+drops, by more than --threshold (default 20%); the exit status is then 1.
+The tables are dropped and recreated (unless --reuse), so never point
+DATABASE_URL at real data.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(ROOT, "bench_endpoints.db"))
+os.environ.setdefault("IMAGE_VARIANTS_MODE", "off")  # time the upload, not the resize
+os.environ.setdefault("TRACE_OUTPUT", "buffer")  # keep slow-request traces off stderr
+os.environ.setdefault("RATELIMIT_ENABLED", "false")  # one client sends every request
+os.environ.setdefault("UPLOAD_FOLDER", tempfile.mkdtemp(prefix="bench-uploads-"))
+
+import requests
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func
+from sqlalchemy.engine import make_url
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app
+from app.extensions import db
+from app.models import Listing, User
+from seed import CITIES, seed_scale
+
+PERCENTILES = (50, 95, 99)
+
+
+# --- transports ---------------------------------------------------------
+
+class TestClientTransport:
+    """In-process: no sockets, measures the app itself."""
+
+    name = "testclient"
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, headers=None, json=None, files=None):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        data = None
+        if files:
+            data = {field: (io.BytesIO(body), filename) for field, (filename, body) in files.items()}
+        resp = client.open(path, method=method, headers=headers, json=json, data=data)
+        resp.close()
+        return resp.status_code
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class WSGITransport:
+    """A threaded werkzeug server on a free port, hit over keep-alive HTTP."""
+
+    name = "wsgi"
+
+    def __init__(self, app):
+        self.server = make_server(
+            "127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler
+        )
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        self._local = threading.local()
+
+    def request(self, method, path, headers=None, json=None, files=None):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        resp = session.request(method, self.base_url + path, headers=headers, json=json, files=files)
+        return resp.status_code
+
+    def close(self):
+        self.server.shutdown()
+
+
+# --- scenarios ------------------------------------------------------------
+
+def tiny_png():
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 120, 40)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def build_scenarios(app):
+    """[(name, make_request(rng) -> (method, path, kwargs), ok_statuses)]"""
+    with app.app_context():
+        total = db.session.query(func.count(Listing.id)).scalar()
+        max_id = db.session.query(func.max(Listing.id)).scalar() or 1
+        # the agent with most listings: worst-case inbox and ownership checks
+        agent_id, _ = (
+            db.session.query(Listing.agent_id, func.count(Listing.id))
+            .group_by(Listing.agent_id)
+            .order_by(func.count(Listing.id).desc())
+            .first()
+        )
+        owned = [lid for (lid,) in db.session.query(Listing.id).filter_by(agent_id=agent_id).limit(200)]
+        if not db.session.get(User, agent_id).is_agent:
+            raise SystemExit(f"user {agent_id} owns listings but is not an agent")
+        auth = {"Authorization": f"Bearer {create_access_token(identity=agent_id)}"}
+
+    deep_page = max(1, int(total / 20 * 0.9))
+    _, lat, lng, *_ = CITIES[0]
+    png = tiny_png()
+
+    def get(path, headers=None):
+        return lambda rng: ("GET", path, {"headers": headers})
+
+    def search(radius_km):
+        def make(rng):
+            return ("GET", f"/listings/search?lat={lat + rng.uniform(-0.05, 0.05):.5f}"
+                           f"&lng={lng + rng.uniform(-0.05, 0.05):.5f}&radius_km={radius_km}", {})
+        return make
+
+    def create_booking(rng):
+        start = date(2026, 1, 1) + timedelta(days=rng.randrange(365))
+        return ("POST", "/bookings", {"json": {
+            "listing_id": rng.randint(1, max_id),
+            "guest_name": "Bench Guest",
+            "guest_email": "bench@example.com",
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=rng.randint(0, 5))).isoformat(),
+        }})
+
+    def upload_image(rng):
+        # a fresh byte suffix per request so every upload stores a new file
+        body = png + rng.randbytes(16)
+        return ("POST", f"/listings/{rng.choice(owned)}/images", {
+            "headers": auth,
+            "files": {"images": ("photo.png", body)},
+        })
+
+    return [
+        ("listings", get("/listings"), {200}),
+        ("listings_filtered", get(
+            "/listings?city=Nairobi&property_type=apartment&min_price=50000"
+            "&max_price=150000&bedrooms=2"), {200}),
+        ("listings_status_by_price", get("/listings?status=active&sort=price"), {200}),
+        ("listings_deep_page", get(f"/listings?page={deep_page}"), {200}),
+        ("search_1km", search(1), {200}),
+        ("search_10km", search(10), {200}),
+        ("search_50km", search(50), {200}),
+        ("similar", lambda rng: ("GET", f"/listings/{rng.randint(1, max_id)}/similar", {}), {200, 404}),
+        ("agents", get("/agents"), {200}),
+        ("inbox", get("/messages", auth), {200}),
+        ("inbox_unread", get("/messages?unread=1", auth), {200}),
+        ("inbox_threads", get("/messages/threads", auth), {200}),
+        ("bookings_agent", get("/bookings", auth), {200}),
+        # date conflicts (400) are a normal outcome under concurrency
+        ("bookings_create", create_booking, {201, 400}),
+        ("image_upload", upload_image, {201}),
+    ]
+
+
+# --- measurement ----------------------------------------------------------
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run_scenario(transport, make_request, ok, total, concurrency, warmup, seed):
+    def worker(index, count):
+        rng = random.Random(seed * 1000 + index)
+        latencies, errors = [], {}
+        for _ in range(count):
+            method, path, kwargs = make_request(rng)
+            t0 = time.perf_counter()
+            status = transport.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - t0)
+            if status not in ok:
+                errors[status] = errors.get(status, 0) + 1
+        return latencies, errors
+
+    worker(-1, warmup)
+
+    per_worker = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency), per_worker))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(l for lat, _ in results for l in lat)
+    errors = {}
+    for _, errs in results:
+        for status, n in errs.items():
+            errors[str(status)] = errors.get(str(status), 0) + n
+    stats = {f"p{p}_ms": round(percentile(latencies, p) * 1000, 3) for p in PERCENTILES}
+    stats.update(
+        requests=len(latencies),
+        rps=round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        errors=errors,
+    )
+    return stats
+
+
+def compare(results, baseline, threshold):
+    """Names of scenarios that regressed against the baseline results."""
+    regressed = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        slower = now["p95_ms"] > before["p95_ms"] * (1 + threshold)
+        fewer = now["rps"] < before["rps"] * (1 - threshold)
+        if slower or fewer:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=20000, help="Listings to seed (default 20000).")
+    parser.add_argument("--reuse", action="store_true", help="Keep the existing database, skip seeding.")
+    parser.add_argument("--server", choices=["testclient", "wsgi"], default="testclient")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per scenario.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", action="append", help="Run scenarios whose name starts with this (repeatable).")
+    parser.add_argument("--save", help="Write the results as a JSON baseline to this path.")
+    parser.add_argument("--baseline", help="Compare against this JSON baseline.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression (default 0.2 = 20%%).")
+    args = parser.parse_args()
+
+    if not args.reuse:
+        seed_scale(args.scale, args.seed)
+
+    app = create_app()
+    transport = TestClientTransport(app) if args.server == "testclient" else WSGITransport(app)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            saved = json.load(fh)
+        baseline = saved["results"]
+        for key, value in (("server", transport.name), ("concurrency", args.concurrency)):
+            if saved["meta"].get(key) != value:
+                print(f"warning: baseline was recorded with {key}={saved['meta'].get(key)}, now {value}")
+
+    db_url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    print(f"database: {db_url.render_as_string(hide_password=True)}")
+    print(f"server={transport.name} requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'scenario':26s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'req/s':>9s}  errors")
+
+    results = {}
+    try:
+        for name, make_request, ok in build_scenarios(app):
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            stats = results[name] = run_scenario(
+                transport, make_request, ok, args.requests, args.concurrency, args.warmup, args.seed
+            )
+            flag = ""
+            if baseline and name in compare({name: stats}, baseline, args.threshold):
+                before = baseline[name]
+                flag = f"  REGRESSED (baseline p95 {before['p95_ms']} ms, {before['rps']} req/s)"
+            print(
+                f"{name:26s} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} "
+                f"{stats['rps']:9.1f}  {stats['errors'] or '-'}{flag}"
+            )
+    finally:
+        transport.close()
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as fh:
+            json.dump({
+                "meta": {
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "server": transport.name,
+                    "scale": None if args.reuse else args.scale,
+                    "requests": args.requests,
+                    "concurrency": args.concurrency,
+                    "python": platform.python_version(),
+                    "database": db_url.get_backend_name(),
+                },
+                "results": results,
+            }, fh, indent=2, sort_keys=True)
+        print(f"saved baseline to {args.save}")
+
+    if baseline:
+        regressed = compare(results, baseline, args.threshold)
+        if regressed:
+            print(f"{len(regressed)} scenario(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Password hashing cost per PASSWORD_HASH_METHOD, and login throughput through
+the offloaded hashing pool at several worker counts.
+
+Usage:
+    python benchmarks/password_hash.py
+    python benchmarks/password_hash.py --methods pbkdf2:sha256:600000 scrypt:32768:8:1 --workers 1 2 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.passwords import PasswordHasher
+
+DEFAULT_METHODS = [
+    "pbkdf2:sha256:260000",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:1000000",
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+    "scrypt:65536:8:1",
+]
+
+
+def single(method, runs):
+    stored = generate_password_hash("correct horse", method)
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        check_password_hash(stored, "correct horse")
+        times.append(time.perf_counter() - t0)
+    return stored, statistics.median(times) * 1000
+
+
+def pooled(stored, workers, logins, clients):
+    """Verifications/s with `clients` request threads sharing a pool of `workers`."""
+    hasher = PasswordHasher(workers, queue_size=clients)
+    try:
+        with ThreadPoolExecutor(clients) as requests:
+            t0 = time.perf_counter()
+            list(requests.map(
+                lambda _: hasher.run(check_password_hash, stored, "correct horse"), range(logins)
+            ))
+            return logins / (time.perf_counter() - t0)
+    finally:
+        hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--runs", type=int, default=10, help="Verifications timed per method.")
+    parser.add_argument("--logins", type=int, default=40, help="Verifications per pool run.")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent login requests.")
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} clients={args.clients}")
+    print(f"{'method':24s} {'verify ms':>10s}" + "".join(f" {f'{w}w login/s':>12s}" for w in args.workers))
+    for method in args.methods:
+        stored, ms = single(method, args.runs)
+        row = f"{method:24s} {ms:10.1f}"
+        for workers in args.workers:
+            row += f" {pooled(stored, workers, args.logins, args.clients):12.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
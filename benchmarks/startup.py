@@ -0,0 +1,63 @@
+"""
+Startup cost of the app: import time, create_app(), first request, first
+/swagger.json. Each sample runs in a fresh interpreter.
+
+Usage:
+    python benchmarks/startup.py --runs 5
+    APP_ENV=development python benchmarks/startup.py   # with db.create_all()
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import app as app_pkg
+t1 = time.perf_counter()
+application = app_pkg.create_app()
+t2 = time.perf_counter()
+client = application.test_client()
+client.get("/health")
+t3 = time.perf_counter()
+client.get("/swagger.json")
+t4 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t2) * 1000,
+    "first_swagger_ms": (t4 - t3) * 1000,
+    "time_to_first_request_ms": (t3 - t0) * 1000,
+}))
+"""
+
+
+def sample():
+    env = {**os.environ}
+    env.setdefault("DATABASE_URL", "sqlite:///bench_startup.db")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    print(f"APP_ENV={os.getenv('APP_ENV', 'production')} runs={args.runs} (median / max, ms)")
+    for key in samples[0]:
+        values = [s[key] for s in samples]
+        print(f"  {key:26s} {statistics.median(values):8.1f} {max(values):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# Gunicorn settings: `gunicorn -c gunicorn.conf.py run:app`
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Threaded workers: an /events/stream connection holds one thread for up to
+# EVENTS_STREAM_MAX_SECONDS, not a whole worker, and the gthread worker keeps
+# heartbeating the arbiter meanwhile, so `timeout` only catches a hung
+# worker. Sync workers would be killed mid-stream after `timeout` seconds.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+
+# Import and build the app once in the master; workers fork from it
+preload_app = True
+
+
+def post_fork(server, worker):
+    # create_app() does not open connections, but never share a pooled
+    # socket with the parent if something did
+    from run import app
+    from app.extensions import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    replica = app.extensions.get("db_replica")
+    if replica is not None:
+        replica.dispose(close=False)
@@ -0,0 +1,302 @@
+"""tables added since the baseline schema
+
+Creates the tables the models gained after the migration history started
+(image rows, revoked tokens, view counts and rankings, saved searches and
+alerts, the webhook outbox, jobs and the listing archive) and, on an empty
+database, the original user / listing / booking / message tables as the
+models now define them, so that `flask db upgrade` alone gives a working
+schema. Tables that already exist (e.g. made by an earlier
+`flask create-tables`) are left alone.
+
+Revision ID: 8c41e7d2b9a3
+Revises: 3f9c2a1d7b10
+Create Date: 2026-10-19 18:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e7d2b9a3'
+down_revision = '3f9c2a1d7b10'
+branch_labels = None
+depends_on = None
+
+# present before the migration history started; created here only on an
+# empty database
+BASELINE_TABLES = ('user', 'listing', 'booking', 'message')
+
+# archived listings keep their id: SQLite must never hand it out again
+TABLE_OPTIONS = {'listing': {'sqlite_autoincrement': True}}
+
+
+def _tables():
+    """(name, columns and constraints, indexes) in foreign-key order."""
+    return [
+        ('user', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=120), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('phone', sa.String(length=50), nullable=True),
+            sa.Column('password_hash', sa.String(length=255), nullable=False),
+            sa.Column('is_agent', sa.Boolean(), nullable=True),
+            sa.Column('bio', sa.Text(), nullable=True),
+            sa.Column('company', sa.String(length=120), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+        ], []),
+        ('listing', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('price', sa.Float(), nullable=False),
+            sa.Column('bedrooms', sa.Integer(), nullable=True),
+            sa.Column('bathrooms', sa.Integer(), nullable=True),
+            sa.Column('property_type', sa.String(length=50), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('address', sa.String(length=200), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('lat', sa.Float(), nullable=True),
+            sa.Column('lng', sa.Float(), nullable=True),
+            sa.Column('image_urls', sa.Text(), nullable=True),
+            sa.Column('views', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('status_changed_at', sa.DateTime(), nullable=False,
+                      server_default=sa.func.now()),
+            sa.Column('agent_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['agent_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ], [
+            ('ix_listing_price', ['price']),
+            ('ix_listing_lat', ['lat']),
+            ('ix_listing_lng', ['lng']),
+            ('ix_listing_created_at', ['created_at']),
+            ('ix_listing_agent_id', ['agent_id']),
+            ('ix_listing_status_created', ['status', 'created_at']),
+            ('ix_listing_type_created', ['property_type', 'created_at']),
+            ('ix_listing_status_changed', ['status', 'status_changed_at']),
+        ]),
+        ('booking', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('listing_id', sa.Integer(), nullable=False),
+            sa.Column('guest_name', sa.String(length=120), nullable=False),
+            sa.Column('guest_email', sa.String(length=120), nullable=True),
+            sa.Column('start_date', sa.Date(), nullable=False),
+            sa.Column('end_date', sa.Date(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        ], [
+            ('ix_booking_listing_start', ['listing_id', 'start_date']),
+        ]),
+        ('message', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('listing_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=120), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('phone', sa.String(length=50), nullable=True),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('is_read', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        ], [
+            ('ix_message_listing_created', ['listing_id', 'created_at']),
+        ]),
+        ('outbox_event', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('event_type', sa.String(length=50), nullable=False),
+            sa.Column('payload', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('dispatched_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        ], [
+            ('ix_outbox_event_dispatched_at', ['dispatched_at']),
+        ]),
+        ('webhook_subscription', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('url', sa.String(length=500), nullable=False),
+            sa.Column('secret', sa.String(length=128), nullable=False),
+            sa.Column('event_types', sa.String(length=255), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        ], []),
+        ('archived_listing', [
+            sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('title', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('price', sa.Float(), nullable=False),
+            sa.Column('bedrooms', sa.Integer(), nullable=True),
+            sa.Column('bathrooms', sa.Integer(), nullable=True),
+            sa.Column('property_type', sa.String(length=50), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('address', sa.String(length=200), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('lat', sa.Float(), nullable=True),
+            sa.Column('lng', sa.Float(), nullable=True),
+            sa.Column('image_urls', sa.Text(), nullable=True),
+            sa.Column('images', sa.JSON(), nullable=False),
+            sa.Column('views', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('status_changed_at', sa.DateTime(), nullable=True),
+            sa.Column('archived_at', sa.DateTime(), nullable=False),
+            sa.Column('agent_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['agent_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ], [
+            ('ix_archived_listing_agent_id', ['agent_id']),
+            ('ix_archived_listing_created', ['created_at']),
+            ('ix_archived_listing_lat', ['lat']),
+            ('ix_archived_listing_status_created', ['status', 'created_at']),
+        ]),
+        ('job', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('type', sa.String(length=50), nullable=False),
+            sa.Column('params', sa.Text(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('progress', sa.Float(), nullable=False),
+            sa.Column('message', sa.String(length=255), nullable=True),
+            sa.Column('result', sa.Text(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('lease_owner', sa.String(length=100), nullable=True),
+            sa.Column('lease_until', sa.DateTime(), nullable=True),
+            sa.Column('created_by', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['created_by'], ['user.id'], ondelete='SET NULL'),
+            sa.PrimaryKeyConstraint('id'),
+        ], [
+            ('ix_job_status_id', ['status', 'id']),
+        ]),
+        ('revoked_token', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('jti', sa.String(length=64), nullable=False),
+            sa.Column('token_type', sa.String(length=10), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.Column('revoked_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('jti'),
+        ], [
+            ('ix_revoked_token_expires_at', ['expires_at']),
+            ('ix_revoked_token_revoked_at', ['revoked_at']),
+            ('ix_revoked_token_user_id', ['user_id']),
+        ]),
+        ('saved_search', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=120), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('property_type', sa.String(length=50), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('min_price', sa.Float(), nullable=True),
+            sa.Column('max_price', sa.Float(), nullable=True),
+            sa.Column('bedrooms', sa.Integer(), nullable=True),
+            sa.Column('bathrooms', sa.Integer(), nullable=True),
+            sa.Column('lat', sa.Float(), nullable=True),
+            sa.Column('lng', sa.Float(), nullable=True),
+            sa.Column('radius_km', sa.Float(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('city_key', sa.String(length=120), nullable=False),
+            sa.Column('property_type_key', sa.String(length=50), nullable=False),
+            sa.Column('price_floor', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        ], [
+            ('ix_saved_search_bucket', ['city_key', 'property_type_key', 'price_floor']),
+            ('ix_saved_search_user_id', ['user_id']),
+        ]),
+        ('webhook_delivery', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('subscription_id', sa.Integer(), nullable=False),
+            sa.Column('event_id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+            sa.Column('lease_until', sa.DateTime(), nullable=True),
+            sa.Column('last_error', sa.String(length=500), nullable=True),
+            sa.Column('delivered_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['event_id'], ['outbox_event.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['subscription_id'], ['webhook_subscription.id'],
+                                    ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('subscription_id', 'event_id', name='uq_webhook_delivery_event'),
+        ], [
+            ('ix_webhook_delivery_due', ['status', 'next_attempt_at']),
+        ]),
+        ('listing_image', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('listing_id', sa.Integer(), nullable=False),
+            sa.Column('sha256', sa.String(length=64), nullable=False),
+            sa.Column('url', sa.String(length=255), nullable=False),
+            sa.Column('size', sa.Integer(), nullable=True),
+            sa.Column('variants', sa.JSON(none_as_null=True), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['listing_id'], ['listing.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('listing_id', 'sha256', name='uq_listing_image_sha256'),
+        ], [
+            ('ix_listing_image_listing_id', ['listing_id']),
+            ('ix_listing_image_sha256', ['sha256']),
+        ]),
+        ('listing_view_daily', [
+            sa.Column('listing_id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('views', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['listing_id'], ['listing.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('listing_id', 'day'),
+        ], [
+            ('ix_listing_view_daily_day', ['day']),
+        ]),
+        ('popular_listing', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('window', sa.String(length=10), nullable=False),
+            sa.Column('city', sa.String(length=120), nullable=False),
+            sa.Column('rank', sa.Integer(), nullable=False),
+            sa.Column('listing_id', sa.Integer(), nullable=False),
+            sa.Column('views', sa.Integer(), nullable=False),
+            sa.Column('computed_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['listing_id'], ['listing.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('window', 'city', 'rank', name='uq_popular_listing_rank'),
+        ], []),
+        ('search_alert', [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('saved_search_id', sa.Integer(), nullable=False),
+            sa.Column('listing_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('delivered_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['listing_id'], ['listing.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['saved_search_id'], ['saved_search.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('saved_search_id', 'listing_id', name='uq_search_alert_listing'),
+        ], [
+            ('ix_search_alert_pending', ['delivered_at', 'id']),
+            ('ix_search_alert_user', ['user_id', 'id']),
+        ]),
+    ]
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, columns, indexes in _tables():
+        if name in existing:
+            continue
+        op.create_table(name, *columns, **TABLE_OPTIONS.get(name, {}))
+        for index, index_columns in indexes:
+            op.create_index(index, name, index_columns)
+
+
+def downgrade():
+    # the original tables stay: they predate the migration history
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, _, _ in reversed(_tables()[len(BASELINE_TABLES):]):
+        if name in existing:
+            op.drop_table(name)
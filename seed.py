@@ -1,5 +1,23 @@
-from datetime import date
+"""
+Sample data.
 
+    python seed.py                      # a handful of demo rows
+    python seed.py --scale 1000000      # ~1M listings for performance work
+
+--scale N generates N listings plus proportional agents, bookings and
+messages, reproducibly from --seed. Rows go in through bulk INSERTs (COPY
+on Postgres) in batches of --batch rows. Both modes drop all tables first.
+"""
+import argparse
+import csv
+import io
+import itertools
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, text
 from werkzeug.security import generate_password_hash
 
 from app import create_app
@@ -143,5 +161,271 @@ def seed():
         print("✅ Seeding complete.")
 
 
+# (city, lat, lng, spread in km, weight, neighbourhoods)
+CITIES = [
+    ("Nairobi", -1.2864, 36.8172, 12, 40,
+     ["Kilimani", "Westlands", "Karen", "Lavington", "Kileleshwa", "South B", "Runda", "Parklands"]),
+    ("Mombasa", -4.0435, 39.6682, 8, 15, ["Nyali", "Bamburi", "Shanzu", "Tudor", "Mtwapa"]),
+    ("Kisumu", -0.0917, 34.7680, 6, 8, ["Milimani", "Riat", "Nyalenda", "Mamboleo"]),
+    ("Nakuru", -0.3031, 36.0800, 6, 8, ["Milimani", "Section 58", "Lanet", "Free Area"]),
+    ("Eldoret", 0.5143, 35.2698, 5, 6, ["Elgon View", "Kapsoya", "Pioneer"]),
+    ("Thika", -1.0333, 37.0693, 4, 5, ["Makongeni", "Landless", "Section 9"]),
+    ("Malindi", -3.2192, 40.1169, 4, 4, ["Casuarina", "Silversands", "Shella"]),
+    ("Naivasha", -0.7167, 36.4333, 5, 4, ["Lake View", "Kabati", "Mirera"]),
+    ("Nyeri", -0.4201, 36.9476, 4, 3, ["Ruring'u", "Kamakwa", "Skuta"]),
+    ("Kampala", 0.3476, 32.5825, 10, 4, ["Kololo", "Naguru", "Muyenga", "Ntinda"]),
+    ("Dar es Salaam", -6.7924, 39.2083, 12, 3, ["Masaki", "Oyster Bay", "Mikocheni"]),
+]
+
+# property_type -> (weight, bedroom range, base monthly rent)
+PROPERTY_TYPES = {
+    "apartment": (50, (1, 4), 45000),
+    "house": (15, (2, 6), 90000),
+    "townhouse": (10, (2, 5), 110000),
+    "studio": (15, (0, 0), 20000),
+    "land": (5, (0, 0), 60000),
+    "office": (5, (0, 0), 150000),
+}
+
+STATUSES = (["active"] * 70 + ["pending"] * 5 + ["rented"] * 12
+            + ["sold"] * 8 + ["draft"] * 5)
+FIRST_NAMES = ["Amina", "Brian", "Cynthia", "David", "Esther", "Faith", "George", "Halima",
+               "Ian", "Joy", "Kevin", "Lucy", "Mercy", "Njeri", "Otieno", "Peter", "Wanjiru"]
+LAST_NAMES = ["Achieng", "Kamau", "Mwangi", "Odhiambo", "Wambui", "Kiptoo", "Mutua", "Njoroge",
+              "Omondi", "Chebet", "Kariuki", "Atieno", "Mohamed", "Otieno"]
+COMPANIES = ["Nairobi Homes Ltd", "Coastal Realty", "Lakeside Properties", "Savannah Estates",
+             "Highland Realtors", "Prime Lettings"]
+QUESTIONS = [
+    "Is this still available?",
+    "Can I view it this weekend?",
+    "Is the price negotiable?",
+    "Are pets allowed?",
+    "Is parking included?",
+    "How far is it from the nearest school?",
+]
+
+KM_PER_DEG = 111.32
+
+
+class Loader:
+    """Bulk-loads row dicts: executemany INSERTs, or COPY on Postgres."""
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.copy = db.engine.dialect.name == "postgresql"
+
+    def load(self, model, rows):
+        table = model.__table__
+        total = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.batch:
+                total += self._flush(table, chunk)
+                chunk = []
+        if chunk:
+            total += self._flush(table, chunk)
+        if self.copy:
+            # explicit ids bypass the serial sequence; move it past them
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"(SELECT max(id) FROM {db.engine.dialect.identifier_preparer.format_table(table)}))"
+            ))
+            db.session.commit()
+        return total
+
+    def _flush(self, table, chunk):
+        if not self.copy:
+            db.session.execute(insert(table), chunk)
+            db.session.commit()
+            return len(chunk)
+
+        columns = list(chunk[0])
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in chunk:
+            writer.writerow(["" if row[c] is None else row[c] for c in columns])
+        buf.seek(0)
+        conn = db.session.connection().connection
+        with conn.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {db.engine.dialect.identifier_preparer.format_table(table)} "
+                f"({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buf,
+            )
+        db.session.commit()
+        return len(chunk)
+
+
+def jitter(rng, lat, lng, spread_km):
+    """A point around (lat, lng), normally distributed with spread_km."""
+    dlat = rng.gauss(0, spread_km) / KM_PER_DEG
+    dlng = rng.gauss(0, spread_km) / (KM_PER_DEG * math.cos(math.radians(lat)))
+    return round(lat + dlat, 6), round(lng + dlng, 6)
+
+
+def gen_users(rng, n_agents, n_users, password_hash):
+    for i in range(1, n_agents + n_users + 1):
+        is_agent = i <= n_agents
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            "id": i,
+            "name": f"{first} {last}",
+            "email": f"{first}.{last}.{i}@example.com".lower().replace("'", ""),
+            "phone": f"+2547{rng.randrange(10**8):08d}",
+            "password_hash": password_hash,
+            "is_agent": is_agent,
+            "bio": f"Agent covering {rng.choice(CITIES)[0]}." if is_agent else None,
+            "company": rng.choice(COMPANIES) if is_agent else None,
+        }
+
+
+def listing_created_at(i, n, start, end):
+    # ids grow with created_at, like in production
+    return start + (end - start) / n * i
+
+
+def gen_listings(rng, n, n_agents, start, end):
+    city_weights = list(itertools.accumulate(c[4] for c in CITIES))
+    types = list(PROPERTY_TYPES)
+    type_weights = list(itertools.accumulate(PROPERTY_TYPES[t][0] for t in types))
+    # a few busy agents own most listings
+    agents = range(1, n_agents + 1)
+    agent_weights = list(itertools.accumulate(1 / i ** 0.8 for i in agents))
+
+    for i in range(1, n + 1):
+        city, lat, lng, spread, _, areas = rng.choices(CITIES, cum_weights=city_weights)[0]
+        ptype = rng.choices(types, cum_weights=type_weights)[0]
+        _, (lo, hi), base = PROPERTY_TYPES[ptype]
+        bedrooms = rng.randint(lo, hi)
+        area = rng.choice(areas)
+        lat, lng = jitter(rng, lat, lng, spread)
+        price = base * (1 + 0.6 * bedrooms) * rng.lognormvariate(0, 0.35)
+        what = f"{bedrooms}BR {ptype.title()}" if bedrooms else ptype.title()
+        yield {
+            "id": i,
+            "title": f"{what} in {area}",
+            "description": f"{what} in {area}, {city}.",
+            "price": round(price, -2),
+            "bedrooms": bedrooms,
+            "bathrooms": max(1, bedrooms - rng.randint(0, 1)) if bedrooms else 1,
+            "property_type": ptype,
+            "status": rng.choice(STATUSES),
+            "address": f"{rng.randint(1, 400)} {area} Road",
+            "city": city,
+            "lat": lat,
+            "lng": lng,
+            "image_urls": "[]",
+            "created_at": listing_created_at(i, n, start, end),
+            "agent_id": rng.choices(agents, cum_weights=agent_weights)[0],
+        }
+
+
+def gen_bookings(rng, n_listings, start, end, per_listing):
+    """Non-overlapping bookings per listing: mostly same-day viewings, some stays."""
+    booking_id = 0
+    for listing_id in range(1, n_listings + 1):
+        count = min(int(rng.expovariate(1 / per_listing)), 30)
+        listed = listing_created_at(listing_id, n_listings, start, end)
+        day = listed.date()
+        for _ in range(count):
+            day += timedelta(days=rng.randint(1, 21))
+            # busier around December and August holidays
+            if day.month in (8, 12) and rng.random() < 0.3:
+                day -= timedelta(days=rng.randint(0, 3))
+            length = 0 if rng.random() < 0.6 else rng.choice([2, 3, 5, 7, 7, 14, 30])
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            booking_id += 1
+            past = day < end.date()
+            yield {
+                "id": booking_id,
+                "listing_id": listing_id,
+                "guest_name": f"{first} {last}",
+                "guest_email": f"{first}.{booking_id}@example.com".lower(),
+                "start_date": day,
+                "end_date": day + timedelta(days=length),
+                "status": rng.choices(
+                    ["confirmed", "cancelled", "pending"],
+                    [70, 20, 10] if past else [40, 10, 50],
+                )[0],
+                "created_at": max(listed, datetime.combine(day, datetime.min.time())
+                                  - timedelta(days=rng.randint(1, 30))),
+            }
+            day += timedelta(days=length)
+
+
+def gen_messages(rng, n_listings, start, end, per_listing):
+    """Inquiry threads per listing; ids grow with created_at within a listing."""
+    message_id = 0
+    for listing_id in range(1, n_listings + 1):
+        count = min(int(rng.expovariate(1 / per_listing)), 50)
+        at = listing_created_at(listing_id, n_listings, start, end)
+        senders = []
+        for _ in range(max(1, count // 3)):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            tag = rng.randrange(10**6)
+            senders.append((f"{first} {last}", f"{first}.{tag}@example.com".lower(),
+                            f"+2547{rng.randrange(10**8):08d}"))
+        for _ in range(count):
+            at += timedelta(minutes=rng.expovariate(1 / 600))
+            name, email, phone = rng.choice(senders)
+            message_id += 1
+            yield {
+                "id": message_id,
+                "listing_id": listing_id,
+                "name": name,
+                "email": email,
+                "phone": phone,
+                "content": rng.choice(QUESTIONS),
+                "is_read": at < end - timedelta(days=3) or rng.random() < 0.3,
+                "created_at": at,
+            }
+
+
+def seed_scale(scale, seed_value=42, batch=10000):
+    """Generate `scale` listings and proportional related rows."""
+    app = create_app()
+    with app.app_context():
+        rng = random.Random(seed_value)
+        loader = Loader(batch)
+        end = datetime(2026, 1, 1)
+        start = end - timedelta(days=730)
+
+        print(f"Seeding {scale} listings into {db.engine.url.render_as_string()}...")
+        db.drop_all()
+        db.create_all()
+
+        n_agents = max(1, scale // 50)
+        n_users = max(1, scale // 100)
+        steps = [
+            ("users", User, lambda: gen_users(
+                rng, n_agents, n_users, generate_password_hash("password123"))),
+            ("listings", Listing, lambda: gen_listings(rng, scale, n_agents, start, end)),
+            ("bookings", Booking, lambda: gen_bookings(rng, scale, start, end, per_listing=1.5)),
+            ("messages", Message, lambda: gen_messages(rng, scale, start, end, per_listing=3)),
+        ]
+        for name, model, rows in steps:
+            t0 = time.perf_counter()
+            count = loader.load(model, rows())
+            print(f"  {name:9s} {count:>10d} rows in {time.perf_counter() - t0:6.1f}s")
+
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        print("✅ Seeding complete.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with sample data.")
+    parser.add_argument("--scale", type=int, help="Generate this many listings (bulk mode).")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for --scale (default 42).")
+    parser.add_argument("--batch", type=int, default=10000, help="Rows per INSERT/COPY batch.")
+    args = parser.parse_args()
+
+    if args.scale:
+        seed_scale(args.scale, args.seed, args.batch)
+    else:
+        seed()
+
+
 if __name__ == "__main__":
-    seed()
+    main()
@@ -1,6 +1,9 @@
 import os
 import sys
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
 
 # Ensure project root is on sys.path
 # tests/ -> go up one level to project root
@@ -10,9 +13,21 @@ if BASE_DIR not in sys.path:
 
 # Use in-memory SQLite for tests
 os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ.setdefault("APP_ENV", "testing")
+# Query budgets measure the steady state: no periodic denylist re-sync mid-test
+os.environ.setdefault("REVOCATION_SYNC_SECONDS", "3600")
+# View counts, search alerts and webhooks are flushed explicitly by the tests that check them
+os.environ.setdefault("VIEW_FLUSH_SECONDS", "3600")
+os.environ.setdefault("SEARCH_ALERT_INTERVAL_SECONDS", "3600")
+os.environ.setdefault("WEBHOOK_INTERVAL_SECONDS", "3600")
+# Tracing is off by default; on here so the tracing tests can read traces
+os.environ.setdefault("TRACE_ENABLED", "true")
+# Jobs only run on the runners the job tests drive themselves
+os.environ.setdefault("JOB_WORKERS", "0")
 
 from app import create_app
 from app.extensions import db
+from app.revocation import get_denylist
 
 
 @pytest.fixture()
@@ -23,7 +38,12 @@ def app():
     with app.app_context():
         db.drop_all()
         db.create_all()
+        get_denylist().sync()  # the one-off load a worker does on first use
         yield app
+        for name in ("view_counter", "alert_matcher", "webhook_dispatcher"):
+            worker = app.extensions.get(name)
+            if worker is not None:
+                worker.stop()  # flush while the tables still exist
         db.session.remove()
         db.drop_all()
 
@@ -51,3 +71,44 @@ def agent_token(client):
 
 def auth_headers(token: str) -> dict:
     return {"Authorization": f"Bearer {token}"}
+
+
+class QueryCounter:
+    """Counts SQL statements executed on an engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "after_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "after_cursor_execute", self._record)
+
+
+@pytest.fixture()
+def count_queries(app):
+    """`with count_queries() as q: ...` then inspect q.count / q.statements."""
+    return lambda: QueryCounter(db.engine)
+
+
+@pytest.fixture()
+def query_budget(count_queries):
+    """`with query_budget(3): client.get(...)` fails if more statements run."""
+    @contextmanager
+    def budget(limit):
+        with count_queries() as counter:
+            yield counter
+        assert counter.count <= limit, (
+            f"{counter.count} queries, budget {limit}:\n" + "\n".join(counter.statements)
+        )
+    return budget
@@ -0,0 +1,47 @@
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def register_agent(client, n):
+    return client.post(
+        "/auth/register",
+        json={"name": f"Agent {n}", "email": f"agent{n}@example.com", "password": "pass123", "is_agent": True},
+    ).get_json()["access_token"]
+
+
+def test_agent_list_counts_listings_without_n_plus_one(client, count_queries):
+    counts = []
+    n = 0
+    for batch in (2, 8):
+        for _ in range(batch):
+            token = register_agent(client, n)
+            for i in range(n % 3):
+                client.post("/listings", headers=auth_headers(token), json={"title": f"L{i}", "price": 1})
+            n += 1
+        with count_queries() as q:
+            resp = client.get("/agents?per_page=100")
+        assert resp.status_code == 200
+        counts.append(q.count)
+
+    assert counts[0] == counts[1] <= 3
+    by_name = {a["name"]: a["listing_count"] for a in resp.get_json()["items"]}
+    assert by_name["Agent 2"] == 2
+    assert by_name["Agent 3"] == 0
+
+
+def test_agent_profile_shows_active_listings_by_default(client):
+    token = register_agent(client, 0)
+    for title, status in (("Live", "active"), ("Draft", "draft"), ("Sold", "sold")):
+        client.post("/listings", headers=auth_headers(token),
+                    json={"title": title, "price": 1, "status": status})
+    agent = client.get("/agents").get_json()["items"][0]
+    assert agent["listing_count"] == 1
+
+    def titles(query=""):
+        resp = client.get(f"/agents/{agent['id']}{query}")
+        assert resp.status_code == 200
+        return [l["title"] for l in resp.get_json()["listings"]]
+
+    assert titles() == ["Live"]
+    assert titles("?status=sold") == ["Sold"]
+    assert titles("?status=") == ["Live", "Draft", "Sold"]
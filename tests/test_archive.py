@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create(client, token, title, status="active", **extra):
+    resp = client.post("/listings", headers=auth_headers(token), json={
+        "title": title, "price": 50000, "city": "Nairobi", "status": status, **extra,
+    })
+    assert resp.status_code == 201
+    return resp.get_json()["id"]
+
+
+def age(*listing_ids, days=400):
+    from app.extensions import db
+    from app.models import Listing
+
+    Listing.query.filter(Listing.id.in_(listing_ids)).update(
+        {"status_changed_at": datetime.utcnow() - timedelta(days=days)}
+    )
+    db.session.commit()
+
+
+def titles(resp):
+    assert resp.status_code == 200
+    return sorted(item["title"] for item in resp.get_json()["items"])
+
+
+def test_archived_listings_leave_browsing_but_keep_bookings_and_messages(app, client, agent_token):
+    from app.extensions import db
+    from app.models import ArchivedListing, Listing, ListingImage
+
+    headers = auth_headers(agent_token)
+    near = {"lat": -1.2921, "lng": 36.7831}
+    active = create(client, agent_token, "Active", **near)
+    sold = create(client, agent_token, "Sold long ago", **near)
+    rented = create(client, agent_token, "Rented long ago", status="rented")
+    recent = create(client, agent_token, "Sold recently")
+    draft = create(client, agent_token, "Old draft", status="draft")
+
+    booking = client.post("/bookings", json={
+        "listing_id": sold, "guest_name": "Guest",
+        "start_date": "2026-03-01", "end_date": "2026-03-02",
+    }).get_json()["id"]
+    message = client.post("/messages", json={
+        "listing_id": sold, "name": "Prospect", "email": "p@example.com", "content": "Still there?",
+    }).get_json()["id"]
+    db.session.add(ListingImage(listing_id=sold, sha256="ab" * 32, url="/uploads/ab.jpg"))
+    db.session.commit()
+
+    assert client.patch(f"/listings/{sold}", headers=headers, json={"status": "sold"}).status_code == 200
+    assert client.patch(f"/listings/{recent}", headers=headers, json={"status": "sold"}).status_code == 200
+    age(sold, rented, draft)
+
+    cli = app.test_cli_runner()
+    assert "2 listings due" in cli.invoke(args=["listings", "archive", "--dry-run"]).output
+    result = cli.invoke(args=["listings", "archive", "--batch-size", "1"])
+    assert result.output.splitlines()[-1] == "Archived 2 listings"
+    assert sorted(l.id for l in Listing.query) == sorted([active, recent, draft])
+    assert ListingImage.query.count() == 0
+    archived = db.session.get(ArchivedListing, sold)
+    assert archived.status == "sold"
+    assert archived.images[0]["sha256"] == "ab" * 32
+
+    # public reads: active only by default, the archive on request
+    assert titles(client.get("/listings")) == ["Active"]
+    assert titles(client.get("/listings?status=sold")) == ["Sold recently"]
+    assert titles(client.get("/listings?status=sold&include_archived=1")) == [
+        "Sold long ago", "Sold recently",
+    ]
+    page = client.get("/listings?include_archived=true&per_page=3").get_json()
+    assert page["total"] == 5
+    assert [item["title"] for item in page["items"]] == ["Old draft", "Sold recently", "Rented long ago"]
+    assert "archived_at" in page["items"][2] and "archived_at" not in page["items"][0]
+
+    assert client.get(f"/listings/{sold}").status_code == 404
+    resp = client.get(f"/listings/{sold}?include_archived=1")
+    assert resp.status_code == 200
+    assert resp.get_json()["image_urls"] == ["/uploads/ab.jpg"]
+
+    search = "/listings/search?lat=-1.2921&lng=36.7831&radius_km=5"
+    assert titles(client.get(search)) == ["Active"]
+    assert titles(client.get(search + "&include_archived=1")) == ["Active", "Sold long ago"]
+
+    # the agent still sees the archived listing's booking and message
+    assert client.get(f"/bookings/{booking}", headers=headers).status_code == 200
+    assert [b["id"] for b in client.get("/bookings", headers=headers).get_json()["items"]] == [booking]
+    assert client.get(f"/messages/{message}", headers=headers).status_code == 200
+    threads = client.get("/messages/threads", headers=headers).get_json()["items"]
+    assert [t["listing_id"] for t in threads] == [sold]
+    # but nobody books it any more
+    assert client.post("/bookings", json={
+        "listing_id": sold, "guest_name": "Late", "start_date": "2026-04-01", "end_date": "2026-04-02",
+    }).status_code == 404
+
+
+def test_archive_runs_as_a_job(app, client, agent_token):
+    from app.jobs import new_runner
+    from app.models import ArchivedListing, Job
+
+    ids = [create(client, agent_token, f"Sold {n}", status="sold") for n in range(3)]
+    age(*ids[:2])
+
+    runner = new_runner(app, background=False)
+    try:
+        app.config["ADMIN_TOKEN"] = "s3cret"
+        resp = client.post("/jobs", headers={"X-Admin-Token": "s3cret"},
+                           json={"type": "listings.archive", "params": {"batch_size": 1}})
+        assert resp.status_code == 202
+        assert runner.drain() == 1
+    finally:
+        runner.stop()
+
+    job = Job.query.one()
+    assert job.status == "succeeded"
+    assert job.result == '{"archived": 2}'
+    assert sorted(a.id for a in ArchivedListing.query) == ids[:2]
+
+
+def test_new_listings_never_reuse_archived_ids(app, client, agent_token):
+    from app.archive import archive_listings
+    from app.extensions import db
+    from app.models import ArchivedListing
+
+    ids = [create(client, agent_token, f"Sold {n}", status="sold") for n in range(3)]
+    age(*ids)
+    assert archive_listings(180, ["sold"], 10) == 3
+
+    fresh = create(client, agent_token, "Fresh", status="sold")
+    assert fresh > max(ids)
+    age(fresh)
+    assert archive_listings(180, ["sold"], 10) == 1
+    assert db.session.query(ArchivedListing).count() == 4
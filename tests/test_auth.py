@@ -1,13 +1,17 @@
-def test_register_creates_user_and_token(client):
-    resp = client.post(
-        "/auth/register",
-        json={
-            "name": "Rhoda",
-            "email": "rhoda@example.com",
-            "password": "secret",
-            "is_agent": False,
-        },
-    )
+from datetime import datetime
+
+
+def test_register_creates_user_and_token(client, query_budget):
+    with query_budget(3):
+        resp = client.post(
+            "/auth/register",
+            json={
+                "name": "Rhoda",
+                "email": "rhoda@example.com",
+                "password": "secret",
+                "is_agent": False,
+            },
+        )
     assert resp.status_code == 201
     data = resp.get_json()
     assert "access_token" in data
@@ -30,7 +34,7 @@ def test_register_duplicate_email_fails(client):
     assert "Email already registered" in data["message"]
 
 
-def test_login_success(client):
+def test_login_success(client, query_budget):
     # first register
     client.post(
         "/auth/register",
@@ -41,21 +45,174 @@ def test_login_success(client):
         },
     )
 
-    resp = client.post(
-        "/auth/login",
-        json={"email": "login@example.com", "password": "secret"},
-    )
+    with query_budget(1):
+        resp = client.post(
+            "/auth/login",
+            json={"email": "login@example.com", "password": "secret"},
+        )
     assert resp.status_code == 200
     data = resp.get_json()
     assert "access_token" in data
     assert data["user"]["email"] == "login@example.com"
 
 
-def test_login_invalid_credentials(client):
-    resp = client.post(
-        "/auth/login",
-        json={"email": "nope@example.com", "password": "wrong"},
-    )
+def test_login_invalid_credentials(client, query_budget):
+    with query_budget(1):
+        resp = client.post(
+            "/auth/login",
+            json={"email": "nope@example.com", "password": "wrong"},
+        )
     assert resp.status_code == 401
     data = resp.get_json()
     assert "Invalid credentials" in data["message"]
+
+
+def test_production_boot_does_not_touch_database(tmp_path):
+    from app import create_app
+    from app.config import Config
+
+    class ProdConfig(Config):
+        APP_ENV = "production"
+        AUTO_CREATE_TABLES = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'prod.db'}"
+
+    app = create_app(ProdConfig())
+    assert app.test_client().get("/health").status_code == 200
+    assert not (tmp_path / "prod.db").exists()
+
+
+def test_login_upgrades_outdated_password_hash(app, client):
+    from app.models.user import User
+
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1000"
+    creds = {"email": "old@example.com", "password": "secret"}
+    client.post("/auth/register", json={"name": "Old", **creds})
+    assert User.query.filter_by(email="old@example.com").one().password_hash.startswith("pbkdf2:sha256:1000$")
+
+    app.config["PASSWORD_HASH_METHOD"] = "scrypt:16384:8:1"
+    assert client.post("/auth/login", json=creds).status_code == 200
+    upgraded = User.query.filter_by(email="old@example.com").one().password_hash
+    assert upgraded.startswith("scrypt:16384:8:1$")
+
+    # the upgraded hash verifies, and a wrong password does not trigger an upgrade
+    assert client.post("/auth/login", json=creds).status_code == 200
+    assert client.post("/auth/login", json={**creds, "password": "nope"}).status_code == 401
+    assert User.query.filter_by(email="old@example.com").one().password_hash == upgraded
+
+
+def test_login_returns_503_when_hash_queue_is_full(app, client):
+    import threading
+
+    from app.passwords import get_password_hasher
+
+    client.post("/auth/register", json={"name": "Busy", "email": "busy@example.com", "password": "secret"})
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0)
+    app.extensions.pop("password_hasher", None)
+    hasher = get_password_hasher()
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_job():
+        started.set()
+        release.wait()
+
+    blocker = threading.Thread(target=hasher.run, args=(slow_job,))
+    blocker.start()
+    started.wait()  # the only worker slot is taken
+    try:
+        resp = client.post("/auth/login", json={"email": "busy@example.com", "password": "secret"})
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+        blocker.join()
+    assert client.post("/auth/login", json={"email": "busy@example.com", "password": "secret"}).status_code == 200
+
+
+def register_tokens(client, email="tokens@example.com"):
+    resp = client.post("/auth/register", json={"name": "Tok", "email": email, "password": "secret"})
+    return resp.get_json()
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, query_budget):
+    tokens = register_tokens(client)
+    access = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    resp = client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=access)
+    assert resp.status_code == 200
+
+    # the denylist is checked in memory: a revoked token costs no query
+    with query_budget(0):
+        assert client.get("/bookings", headers=access).status_code == 401
+    refresh = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    assert client.post("/auth/refresh", headers=refresh).status_code == 401
+
+
+def test_refresh_rotates_refresh_token(client):
+    tokens = register_tokens(client)
+    old = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+
+    resp = client.post("/auth/refresh", headers=old)
+    assert resp.status_code == 200
+    fresh = resp.get_json()
+    assert client.get("/messages", headers={"Authorization": f"Bearer {fresh['access_token']}"}).status_code == 403
+
+    # access tokens cannot refresh, and the used refresh token is spent
+    access = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.post("/auth/refresh", headers=access).status_code == 422
+    assert client.post("/auth/refresh", headers=old).status_code == 401
+    assert client.post(
+        "/auth/refresh", headers={"Authorization": f"Bearer {fresh['refresh_token']}"}
+    ).status_code == 200
+
+
+def test_concurrent_refreshes_with_one_token_rotate_it_once(app, client):
+    from flask_jwt_extended import decode_token
+    from sqlalchemy import event, insert
+    from sqlalchemy.orm import Session
+
+    from app.models.revoked_token import RevokedToken
+
+    tokens = register_tokens(client)
+    payload = decode_token(tokens["refresh_token"])
+    old = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+
+    def other_refresh_wins(session, flush_context, instances):
+        # the other request passed the same checks and inserts the jti first
+        if any(isinstance(obj, RevokedToken) for obj in session.new):
+            session.execute(insert(RevokedToken).values(
+                jti=payload["jti"], token_type="refresh", user_id=payload["sub"],
+                expires_at=datetime.utcfromtimestamp(payload["exp"]), revoked_at=datetime.utcnow(),
+            ))
+
+    event.listen(Session, "before_flush", other_refresh_wins)
+    try:
+        resp = client.post("/auth/refresh", headers=old)
+    finally:
+        event.remove(Session, "before_flush", other_refresh_wins)
+    assert resp.status_code == 401
+    assert resp.get_json()["message"] == "token revoked"
+    assert client.post("/auth/refresh", headers=old).status_code == 401
+
+
+def test_revocations_from_other_workers_are_synced(app, client):
+    from flask_jwt_extended import decode_token
+
+    from app.extensions import db
+    from app.models.revoked_token import RevokedToken
+    from app.revocation import get_denylist
+
+    tokens = register_tokens(client)
+    payload = decode_token(tokens["access_token"])
+    # another worker revoked it: only the table knows
+    db.session.add(RevokedToken(
+        jti=payload["jti"], token_type="access", user_id=payload["sub"],
+        expires_at=datetime.utcfromtimestamp(payload["exp"]),
+    ))
+    db.session.commit()
+
+    access = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/messages", headers=access).status_code == 403  # not synced yet
+
+    get_denylist()._next_sync = 0  # sync interval elapsed
+    assert client.get("/messages", headers=access).status_code == 401
@@ -20,34 +20,94 @@ def create_listing(client, token):
     return resp.get_json()["id"]
 
 
-def test_booking_overlap_is_rejected(client, agent_token):
+def test_booking_overlap_is_rejected(client, agent_token, query_budget):
     listing_id = create_listing(client, agent_token)
 
     # First booking
-    r1 = client.post(
-        "/bookings",
-        json={
-            "listing_id": listing_id,
-            "guest_name": "Guest One",
-            "guest_email": "guest1@example.com",
-            "start_date": "2025-12-01",
-            "end_date": "2025-12-05",
-        },
-    )
+    with query_budget(5):
+        r1 = client.post(
+            "/bookings",
+            json={
+                "listing_id": listing_id,
+                "guest_name": "Guest One",
+                "guest_email": "guest1@example.com",
+                "start_date": "2025-12-01",
+                "end_date": "2025-12-05",
+            },
+        )
     assert r1.status_code == 201
 
     # Overlapping booking should fail
-    r2 = client.post(
+    with query_budget(3):
+        r2 = client.post(
+            "/bookings",
+            json={
+                "listing_id": listing_id,
+                "guest_name": "Guest Two",
+                "guest_email": "guest2@example.com",
+                "start_date": "2025-12-03",
+                "end_date": "2025-12-06",
+            },
+        )
+    assert r2.status_code == 400
+    data = r2.get_json()
+    assert "Dates not available" in data["message"]
+    assert "conflict" in data
+
+
+def register_agent(client, email):
+    resp = client.post(
+        "/auth/register",
+        json={"name": "Other Agent", "email": email, "password": "pass123", "is_agent": True},
+    )
+    return resp.get_json()["access_token"]
+
+
+def test_booking_detail_owner_only(client, agent_token, query_budget):
+    listing_id = create_listing(client, agent_token)
+    r = client.post(
         "/bookings",
         json={
             "listing_id": listing_id,
-            "guest_name": "Guest Two",
-            "guest_email": "guest2@example.com",
-            "start_date": "2025-12-03",
-            "end_date": "2025-12-06",
+            "guest_name": "Guest",
+            "start_date": "2025-12-01",
+            "end_date": "2025-12-02",
         },
     )
-    assert r2.status_code == 400
-    data = r2.get_json()
-    assert "Dates not available" in data["message"]
-    assert "conflict" in data
+    booking_id = r.get_json()["id"]
+
+    # one ownership-scoped query, no separate user/listing lookups
+    with query_budget(1):
+        resp = client.get(f"/bookings/{booking_id}", headers=auth_headers(agent_token))
+    assert resp.status_code == 200
+    assert resp.get_json()["id"] == booking_id
+
+    other = register_agent(client, "other@test.com")
+    resp = client.get(f"/bookings/{booking_id}", headers=auth_headers(other))
+    assert resp.status_code == 403
+
+    resp = client.patch(
+        f"/bookings/{booking_id}", headers=auth_headers(other), json={"status": "confirmed"}
+    )
+    assert resp.status_code == 403
+
+    resp = client.get("/bookings/9999", headers=auth_headers(agent_token))
+    assert resp.status_code == 404
+
+
+def test_booking_list_query_count_is_independent_of_page_size(client, agent_token, count_queries):
+    listing_id = create_listing(client, agent_token)
+    counts = []
+    for start, end in (("2026-01-01", "2026-01-02"), ("2026-02-01", "2026-02-10")):
+        for day in range(int(start[-2:]), int(end[-2:]) + 1):
+            client.post("/bookings", json={
+                "listing_id": listing_id,
+                "guest_name": "Guest",
+                "start_date": f"{start[:-2]}{day:02d}",
+                "end_date": f"{start[:-2]}{day:02d}",
+            })
+        with count_queries() as q:
+            resp = client.get("/bookings?per_page=100", headers=auth_headers(agent_token))
+        assert resp.status_code == 200
+        counts.append(q.count)
+    assert counts[0] == counts[1] <= 3
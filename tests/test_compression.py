@@ -0,0 +1,72 @@
+import gzip
+import zlib
+
+from flask import Response
+
+
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_listings(client, token, n):
+    for i in range(n):
+        client.post(
+            "/listings",
+            json={"title": f"Listing {i}", "description": "A fine home. " * 20, "price": 1000 + i,
+                  "city": "Nairobi", "lat": -1.29, "lng": 36.78},
+            headers=auth_headers(token),
+        )
+
+
+def test_large_json_is_gzipped_when_accepted(client, agent_token):
+    create_listings(client, agent_token, 10)
+
+    plain = client.get("/listings")
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    resp = client.get("/listings", headers={"Accept-Encoding": "br, gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert int(resp.headers["Content-Length"]) == len(resp.data) < len(plain.data)
+    assert gzip.decompress(resp.data) == plain.data
+
+
+def test_small_and_refused_responses_stay_plain(client, agent_token):
+    create_listings(client, agent_token, 10)
+
+    assert "Content-Encoding" not in client.get("/health", headers={"Accept-Encoding": "gzip"}).headers
+    refused = client.get("/listings", headers={"Accept-Encoding": "gzip;q=0, *"})
+    assert "Content-Encoding" not in refused.headers
+
+
+def test_streamed_responses_are_compressed_chunk_by_chunk(app):
+    chunks = [f"line {i}\n" for i in range(50)]
+    app.add_url_rule("/_stream", "stream", lambda: Response(iter(chunks), mimetype="text/plain"))
+    app.add_url_rule(
+        "/_events", "events", lambda: Response(iter(["data: 1\n\n"]), mimetype="text/event-stream")
+    )
+    client = app.test_client()
+
+    resp = client.get("/_stream", headers={"Accept-Encoding": "gzip"}, buffered=False)
+    assert resp.headers["Content-Encoding"] == "gzip"
+    pieces = list(resp.response)
+    # every chunk is flushed on its own, not held back until the end
+    assert len(pieces) > len(chunks)
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(pieces[0]) == b"line 0\n"
+    assert gzip.decompress(b"".join(pieces)) == "".join(chunks).encode()
+
+    # SSE is not in COMPRESS_MIMETYPES: proxies and EventSource get it as-is
+    sse = client.get("/_events", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in sse.headers
+
+
+def test_uploaded_files_are_not_recompressed(app, client, tmp_path):
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    (tmp_path / "notes.txt").write_text("plain text file " * 500)
+
+    resp = client.get("/uploads/notes.txt", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert "Content-Encoding" not in resp.headers
@@ -0,0 +1,89 @@
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def read_stream(client, token, **headers):
+    resp = client.get("/events/stream", headers={**auth_headers(token), **headers})
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/event-stream"
+    return resp.get_data(as_text=True)
+
+
+def test_stream_replays_events_after_last_event_id(app, client, agent_token):
+    app.config.update(EVENTS_STREAM_MAX_SECONDS=0.05, EVENTS_HEARTBEAT_SECONDS=0.05)
+
+    listing_id = client.post(
+        "/listings",
+        headers=auth_headers(agent_token),
+        json={"title": "SSE Listing", "price": 1000, "city": "Nairobi"},
+    ).get_json()["id"]
+    client.post(
+        "/messages",
+        json={"listing_id": listing_id, "name": "P", "email": "p@example.com", "content": "Hi"},
+    )
+    client.post(
+        "/bookings",
+        json={
+            "listing_id": listing_id,
+            "guest_name": "G",
+            "start_date": "2025-12-01",
+            "end_date": "2025-12-02",
+        },
+    )
+
+    body = read_stream(client, agent_token, **{"Last-Event-ID": "0"})
+    assert "event: message.created" in body
+    assert "event: booking.created" in body
+
+    ids = [line[4:] for line in body.splitlines() if line.startswith("id: ")]
+    assert len(ids) == 2
+
+    body = read_stream(client, agent_token, **{"Last-Event-ID": ids[0]})
+    assert "event: message.created" not in body
+    assert "event: booking.created" in body
+
+
+def test_any_user_streams_only_their_own_events(app, client):
+    from app.events import get_event_backend
+
+    app.config.update(EVENTS_STREAM_MAX_SECONDS=0.05, EVENTS_HEARTBEAT_SECONDS=0.05)
+    data = client.post(
+        "/auth/register",
+        json={"name": "U", "email": "u@example.com", "password": "pass123"},
+    ).get_json()
+    user_id = data["user"]["id"]
+    get_event_backend().publish(user_id, "search.alerts", {"alerts": []})
+    get_event_backend().publish(user_id + 1, "search.alerts", {"alerts": []})
+
+    body = read_stream(client, data["access_token"], **{"Last-Event-ID": "0"})
+    assert body.count("event: search.alerts") == 1
+
+
+def test_fresh_stream_skips_history(app, client, agent_token):
+    from app.events import get_event_backend
+
+    app.config.update(EVENTS_STREAM_MAX_SECONDS=0.05, EVENTS_HEARTBEAT_SECONDS=0.05)
+    agent_id = client.get("/agents").get_json()["items"][0]["id"]
+    get_event_backend().publish(agent_id, "message.created", {"id": 1})
+
+    body = read_stream(client, agent_token)
+    assert "event: message.created" not in body
+    assert ": keep-alive" in body
+
+
+def test_stream_holds_no_database_session(app, client, agent_token, monkeypatch):
+    from app.events import get_event_backend
+    from app.extensions import db
+
+    app.config.update(EVENTS_STREAM_MAX_SECONDS=0.05, EVENTS_HEARTBEAT_SECONDS=0.05)
+    backend = get_event_backend()
+    sessions = []
+    read = backend.read
+
+    def spy(*args):
+        sessions.append(db.session.registry.has())
+        return read(*args)
+
+    monkeypatch.setattr(backend, "read", spy)
+    read_stream(client, agent_token)
+    assert sessions and not any(sessions)
@@ -0,0 +1,179 @@
+import csv
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+ADMIN = {"X-Admin-Token": "s3cret"}
+
+
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture()
+def runner(app):
+    from app.jobs import new_runner
+
+    app.config["ADMIN_TOKEN"] = "s3cret"
+    runner = new_runner(app, background=False)
+    yield runner
+    runner.stop()
+
+
+def queue(client, job_type, **params):
+    resp = client.post("/jobs", headers=ADMIN, json={"type": job_type, "params": params})
+    assert resp.status_code == 202, resp.get_json()
+    return resp.get_json()["id"]
+
+
+def job_status(client, job_id):
+    resp = client.get(f"/jobs/{job_id}", headers=ADMIN)
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def wait_idle(runner, timeout=5):
+    deadline = time.monotonic() + timeout
+    while runner.running() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not runner.running()
+
+
+def test_export_job_reports_progress_and_result(app, client, agent_token, runner, tmp_path, monkeypatch):
+    import app.jobs as jobs
+
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL", 0)
+    app.config["JOB_EXPORT_FOLDER"] = str(tmp_path)
+    for n, city in enumerate(["Nairobi", "Mombasa", "Nairobi", "Nairobi"]):
+        client.post("/listings", headers=auth_headers(agent_token), json={
+            "title": f"Listing {n}", "price": 1000 + n, "city": city,
+        })
+
+    assert client.post("/jobs", json={"type": "listings.export"}).status_code == 403
+    assert client.post("/jobs", headers=ADMIN, json={"type": "nope"}).status_code == 400
+    job_id = queue(client, "listings.export", filters={"city": "Nairobi"}, chunk_size=2)
+    assert job_status(client, job_id)["status"] == "queued"
+
+    assert runner.drain() == 1
+    job = job_status(client, job_id)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+    assert job["message"] == "2/3 listings"  # last report before the final chunk
+    assert job["attempts"] == 1
+    assert job["result"]["rows"] == 3
+    with open(job["result"]["path"]) as fh:
+        rows = list(csv.DictReader(fh))
+    assert [r["title"] for r in rows] == ["Listing 3", "Listing 2", "Listing 0"]
+
+    assert client.post(f"/jobs/{job_id}/cancel", headers=ADMIN).status_code == 409
+    listed = client.get("/jobs?status=succeeded", headers=ADMIN).get_json()["items"]
+    assert [j["id"] for j in listed] == [job_id]
+
+
+def test_cancel_queued_and_running_jobs(app, client, runner, monkeypatch):
+    import app.jobs as jobs
+
+    started, go = threading.Event(), threading.Event()
+
+    def slow(ctx):
+        started.set()
+        go.wait(5)
+        for _ in range(100):
+            ctx.check_cancelled()
+            time.sleep(0.01)
+        return {"finished": True}
+
+    monkeypatch.setitem(jobs.JOBS, "test.slow", slow)
+    running_id = queue(client, "test.slow")
+    assert runner.run_pending() == [running_id]
+    assert started.wait(5)
+    queued_id = queue(client, "test.slow")
+
+    resp = client.post(f"/jobs/{queued_id}/cancel", headers=ADMIN)
+    assert resp.get_json()["status"] == "cancelled"
+    resp = client.post(f"/jobs/{running_id}/cancel", headers=ADMIN)
+    assert resp.get_json()["status"] == "running"
+    assert resp.get_json()["cancel_requested"] is True
+
+    go.set()
+    wait_idle(runner)
+    assert job_status(client, running_id)["status"] == "cancelled"
+    assert job_status(client, queued_id)["status"] == "cancelled"
+    assert runner.drain() == 0  # the cancelled queued job is never claimed
+
+
+def test_failed_handler_and_lost_runner(app, client, runner, monkeypatch):
+    import app.jobs as jobs
+    from app.extensions import db
+    from app.models import Job
+
+    def broken(ctx):
+        raise ValueError("bad input")
+
+    monkeypatch.setitem(jobs.JOBS, "test.broken", broken)
+    monkeypatch.setitem(jobs.JOBS, "test.noop", lambda ctx: {"ok": True})
+    failed_id = queue(client, "test.broken")
+    runner.drain()
+    job = job_status(client, failed_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "ValueError: bad input"
+
+    # a runner that died mid-job: its lease expires and another runner takes over
+    stale = datetime.utcnow() - timedelta(seconds=1)
+    orphan = Job(type="test.noop", status="running", attempts=1,
+                 lease_owner="gone:1:dead", lease_until=stale)
+    doomed = Job(type="test.noop", status="running", attempts=3,
+                 lease_owner="gone:1:dead", lease_until=stale)
+    db.session.add_all([orphan, doomed])
+    db.session.commit()
+
+    assert runner.drain() == 1
+    db.session.expire_all()
+    assert (orphan.status, orphan.attempts, orphan.lease_owner) == ("succeeded", 2, runner.owner)
+    assert doomed.status == "failed"
+    assert "lease expired" in doomed.error
+
+
+def test_jobs_cli_enqueue_and_work(app, monkeypatch):
+    import app.jobs as jobs
+    from app.models import Job
+
+    seen = []
+    monkeypatch.setitem(jobs.JOBS, "test.echo", lambda ctx, **params: seen.append(params) or params)
+    cli = app.test_cli_runner()
+
+    result = cli.invoke(args=["jobs", "enqueue", "test.echo", "-p", "days=3", "-p", "name=x"])
+    assert "Queued job" in result.output
+    assert "Unknown job type" in cli.invoke(args=["jobs", "enqueue", "nope"]).output
+
+    result = cli.invoke(args=["jobs", "work", "--once"])
+    assert result.output.strip() == "Ran 1 jobs"
+    assert seen == [{"days": 3, "name": "x"}]
+    assert Job.query.one().status == "succeeded"
+
+
+def test_lease_is_renewed_while_a_quiet_job_runs(app, client, monkeypatch):
+    import app.jobs as jobs
+
+    app.config.update(ADMIN_TOKEN="s3cret", JOB_LEASE_SECONDS=0.3)
+    calls = []
+    # never reports progress, and runs several leases long
+    monkeypatch.setitem(jobs.JOBS, "test.quiet", lambda ctx: calls.append(1) or time.sleep(1.2))
+    first = jobs.new_runner(app, workers=1, background=False)
+    second = jobs.new_runner(app, background=False)
+    try:
+        job_id = queue(client, "test.quiet")
+        assert first.run_pending() == [job_id]
+        for _ in range(4):
+            time.sleep(0.25)
+            assert second.run_pending() == []
+        wait_idle(first)
+    finally:
+        first.stop()
+        second.stop()
+
+    job = job_status(client, job_id)
+    assert (job["status"], job["attempts"]) == ("succeeded", 1)
+    assert calls == [1]
@@ -3,34 +3,36 @@ def auth_headers(token: str) -> dict:
 
 
 
-def test_get_empty_listings(client):
-    resp = client.get("/listings")
+def test_get_empty_listings(client, query_budget):
+    with query_budget(2):
+        resp = client.get("/listings")
     assert resp.status_code == 200
     data = resp.get_json()
     assert data["items"] == []
     assert data["total"] == 0
 
 
-def test_agent_can_create_listing(client, agent_token):
-    resp = client.post(
-        "/listings",
-        headers=auth_headers(agent_token),
-        json={
-            "title": "2BR in Kilimani",
-            "price": 80000,
-            "bedrooms": 2,
-            "bathrooms": 2,
-            "property_type": "apartment",
-            "city": "Nairobi",
-        },
-    )
+def test_agent_can_create_listing(client, agent_token, query_budget):
+    with query_budget(4):
+        resp = client.post(
+            "/listings",
+            headers=auth_headers(agent_token),
+            json={
+                "title": "2BR in Kilimani",
+                "price": 80000,
+                "bedrooms": 2,
+                "bathrooms": 2,
+                "property_type": "apartment",
+                "city": "Nairobi",
+            },
+        )
     assert resp.status_code == 201
     data = resp.get_json()
     assert data["title"] == "2BR in Kilimani"
     assert data["city"] == "Nairobi"
 
 
-def test_filter_listings_by_city(client, agent_token):
+def test_filter_listings_by_city(client, agent_token, query_budget):
     # create two listings in different cities
     client.post(
         "/listings",
@@ -59,8 +61,336 @@ def test_filter_listings_by_city(client, agent_token):
     )
 
     # filter by Nairobi
-    resp = client.get("/listings?city=Nairobi")
+    with query_budget(3):
+        resp = client.get("/listings?city=Nairobi")
     assert resp.status_code == 200
     data = resp.get_json()
     assert data["total"] == 1
     assert data["items"][0]["city"] == "Nairobi"
+
+
+def test_listing_endpoints_query_count_is_independent_of_page_size(
+    client, agent_token, count_queries
+):
+    headers = auth_headers(agent_token)
+    counts = []
+    for batch in (2, 10):
+        for i in range(batch):
+            client.post("/listings", headers=headers, json={
+                "title": f"Listing {i}", "price": 1000 + i, "city": "Nairobi",
+                "lat": -1.29, "lng": 36.78,
+            })
+        with count_queries() as q:
+            assert client.get("/listings?per_page=100").status_code == 200
+            assert client.get("/listings/search?lat=-1.29&lng=36.78").status_code == 200
+        counts.append(q.count)
+    assert counts[0] == counts[1]
+
+
+def test_listing_item_query_budgets(client, agent_token, query_budget):
+    headers = auth_headers(agent_token)
+    listing_id = client.post(
+        "/listings", headers=headers, json={"title": "Budget", "price": 1}
+    ).get_json()["id"]
+
+    with query_budget(2):
+        assert client.get(f"/listings/{listing_id}").status_code == 200
+    with query_budget(5):
+        assert client.patch(
+            f"/listings/{listing_id}", headers=headers, json={"price": 2}
+        ).status_code == 200
+    with query_budget(3):
+        assert client.delete(f"/listings/{listing_id}", headers=headers).status_code == 200
+
+
+def upload(client, token, listing_id, *files):
+    import io
+
+    return client.post(
+        f"/listings/{listing_id}/images",
+        headers=auth_headers(token),
+        data={"images": [(io.BytesIO(body), name) for name, body in files]},
+        content_type="multipart/form-data",
+    )
+
+
+def test_image_upload_is_content_addressed(app, client, agent_token, tmp_path):
+    import hashlib
+    import os
+
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), IMAGE_VARIANTS_MODE="off")
+    ids = [
+        client.post(
+            "/listings",
+            headers=auth_headers(agent_token),
+            json={"title": f"Photo Listing {i}", "price": 1000},
+        ).get_json()["id"]
+        for i in range(2)
+    ]
+
+    r1 = upload(client, agent_token, ids[0], ("a.jpeg", b"same-bytes"))
+    r2 = upload(client, agent_token, ids[1], ("b.jpg", b"same-bytes"))
+    assert r1.status_code == 201 and r2.status_code == 201
+    assert r1.get_json()["image_urls"] == r2.get_json()["image_urls"]
+    assert len([n for n in os.listdir(tmp_path) if not n.startswith(".")]) == 1
+
+    # re-uploading to the same listing does not duplicate the reference
+    upload(client, agent_token, ids[0], ("a.jpeg", b"same-bytes"))
+    listing = client.get(f"/listings/{ids[0]}").get_json()
+    assert len(listing["image_urls"]) == 1
+
+    app.config["MAX_IMAGE_BYTES"] = 4
+    resp = upload(client, agent_token, ids[0], ("big.png", b"too-large"))
+    assert resp.status_code == 413
+    assert os.listdir(tmp_path) == [os.path.basename(listing["image_urls"][0])]
+
+    # nothing of a rejected batch stays on disk, except files already in use
+    resp = upload(client, agent_token, ids[1], ("new.png", b"new"), ("c.jpg", b"same-bytes"),
+                  ("big.png", b"too-large"))
+    assert resp.status_code == 413
+    assert os.listdir(tmp_path) == [os.path.basename(listing["image_urls"][0])]
+
+    # a file another upload put in place but has not committed a row for yet
+    pending = hashlib.sha256(b"pnd").hexdigest() + ".png"
+    (tmp_path / pending).write_bytes(b"pnd")
+    resp = upload(client, agent_token, ids[1], ("p.png", b"pnd"), ("big.png", b"too-large"))
+    assert resp.status_code == 413
+    assert (tmp_path / pending).exists()
+
+
+def test_uploads_are_cacheable_and_support_ranges(app, client, tmp_path):
+    name = "a" * 64 + ".jpg"
+    (tmp_path / name).write_bytes(b"0123456789")
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+
+    resp = client.get(f"/uploads/{name}")
+    assert resp.status_code == 200
+    assert resp.cache_control.immutable
+    assert resp.cache_control.max_age == 365 * 24 * 3600
+
+    resp = client.get(f"/uploads/{name}", headers={"If-None-Match": resp.headers["ETag"]})
+    assert resp.status_code == 304
+
+    resp = client.get(f"/uploads/{name}", headers={"Range": "bytes=2-4"})
+    assert resp.status_code == 206
+    assert resp.data == b"234"
+
+    app.config["UPLOADS_SERVE_MODE"] = "x-accel"
+    resp = client.get(f"/uploads/{name}")
+    assert resp.headers["X-Accel-Redirect"] == f"/protected-uploads/{name}"
+    assert resp.data == b""
+    assert client.get("/uploads/missing.jpg").status_code == 404
+
+
+def png_bytes(size=(800, 600)):
+    import io
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def test_upload_renders_variants(app, client, agent_token, tmp_path):
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), IMAGE_VARIANTS_MODE="inline")
+    listing_id = client.post(
+        "/listings",
+        headers=auth_headers(agent_token),
+        json={"title": "Thumb Listing", "price": 1000},
+    ).get_json()["id"]
+
+    assert upload(client, agent_token, listing_id, ("photo.png", png_bytes())).status_code == 201
+
+    image = client.get(f"/listings/{listing_id}").get_json()["images"][0]
+    assert set(image["variants"]) == {"thumb", "medium"}
+    assert image["variants"]["thumb"].endswith("-thumb.jpg")
+    thumb = client.get(image["variants"]["thumb"])
+    assert thumb.status_code == 200
+    assert thumb.cache_control.immutable
+
+
+def test_images_backfill_imports_legacy_urls(app, agent_token, client, tmp_path):
+    from app.extensions import db
+    from app.models import Listing
+
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    (tmp_path / "legacy.png").write_bytes(png_bytes((50, 40)))
+    listing_id = client.post(
+        "/listings",
+        headers=auth_headers(agent_token),
+        json={"title": "Legacy Listing", "price": 1000},
+    ).get_json()["id"]
+    listing = db.session.get(Listing, listing_id)
+    listing.image_urls = '["/uploads/legacy.png"]'
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["images", "backfill", "--workers", "1"])
+    assert "Imported 1 legacy images" in result.output
+    assert "Rendered variants for 1/1 images" in result.output
+
+    data = client.get(f"/listings/{listing_id}").get_json()
+    assert len(data["image_urls"]) == 1
+    assert data["images"][0]["variants"]["medium"].endswith("-medium.jpg")
+
+
+def test_public_reads_use_replica_until_client_writes(tmp_path):
+    from sqlalchemy import insert
+
+    from app import create_app
+    from app.config import Config
+    from app.extensions import db
+    from app.models import Listing
+
+    class ReplicaConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        DATABASE_REPLICA_URL = f"sqlite:///{tmp_path / 'replica.db'}"
+        REPLICA_ENGINE_OPTIONS = {}
+
+    app = create_app(ReplicaConfig())
+    with app.app_context():
+        db.create_all()
+        replica = app.extensions["db_replica"]
+        db.metadata.create_all(replica)
+        with replica.begin() as conn:
+            conn.execute(insert(Listing), {"title": "Replica Only", "price": 1, "agent_id": 1})
+
+        client = app.test_client()
+        token = client.post(
+            "/auth/register",
+            json={"name": "A", "email": "a@example.com", "password": "pass123", "is_agent": True},
+        ).get_json()["access_token"]
+        client.delete_cookie("db_primary")
+
+        data = client.get("/listings").get_json()
+        assert [item["title"] for item in data["items"]] == ["Replica Only"]
+
+        resp = client.post(
+            "/listings", headers=auth_headers(token), json={"title": "Primary", "price": 2}
+        )
+        assert "db_primary" in resp.headers.get("Set-Cookie", "")
+
+        # read-your-writes: this client now reads the primary
+        data = client.get("/listings").get_json()
+        assert [item["title"] for item in data["items"]] == ["Primary"]
+        db.session.remove()
+
+
+def test_views_are_counted_in_memory_and_flushed_in_bulk(app, client, agent_token):
+    from app.extensions import db
+    from app.models import Listing, ListingViewDaily
+    from app.popularity import get_view_counter
+
+    ids = []
+    for title in ("A", "B"):
+        resp = client.post(
+            "/listings",
+            headers=auth_headers(agent_token),
+            json={"title": title, "price": 1000, "city": "Nairobi"},
+        )
+        ids.append(resp.get_json()["id"])
+
+    for listing_id in (ids[0], ids[0], ids[0], ids[1]):
+        assert client.get(f"/listings/{listing_id}").status_code == 200
+
+    counter = get_view_counter()
+    assert counter.pending() == 4
+    assert db.session.get(Listing, ids[0]).views == 0  # nothing written yet
+
+    assert counter.flush() == 4
+    assert counter.pending() == 0
+    db.session.expire_all()
+    assert db.session.get(Listing, ids[0]).views == 3
+    assert db.session.get(Listing, ids[1]).views == 1
+
+    client.get(f"/listings/{ids[0]}")
+    counter.flush()
+    daily = {row.listing_id: row.views for row in ListingViewDaily.query}
+    assert daily == {ids[0]: 4, ids[1]: 1}
+
+
+def test_popular_listings_per_city_and_window(app, client, agent_token):
+    from datetime import datetime, timedelta
+
+    from app.extensions import db
+    from app.models import ListingViewDaily
+    from app.popularity import recompute_popular
+
+    def create(title, city):
+        resp = client.post(
+            "/listings",
+            headers=auth_headers(agent_token),
+            json={"title": title, "price": 1000, "city": city},
+        )
+        return resp.get_json()["id"]
+
+    nairobi, mombasa, old = create("N", "Nairobi"), create("M", "Mombasa"), create("O", "Nairobi")
+    now = datetime(2025, 3, 10, 12, 0)
+    today = now.date()
+    db.session.add_all([
+        ListingViewDaily(listing_id=nairobi, day=today, views=5),
+        ListingViewDaily(listing_id=mombasa, day=today - timedelta(days=1), views=8),
+        ListingViewDaily(listing_id=old, day=today - timedelta(days=20), views=50),
+    ])
+    db.session.commit()
+    recompute_popular(top_n=10, now=now)
+
+    def ranked(**params):
+        resp = client.get("/listings/popular", query_string=params)
+        assert resp.status_code == 200
+        return [(item["id"], item["window_views"]) for item in resp.get_json()["items"]]
+
+    assert ranked(window="1d") == [(nairobi, 5)]
+    assert ranked() == [(mombasa, 8), (nairobi, 5)]  # 7d
+    assert ranked(window="30d") == [(old, 50), (mombasa, 8), (nairobi, 5)]
+    assert ranked(window="30d", city="nairobi") == [(old, 50), (nairobi, 5)]
+    assert ranked(window="30d", limit=1) == [(old, 50)]
+    assert ranked(window="30d", limit=-5) == [(old, 50)]
+    assert client.get("/listings/popular?window=1y").status_code == 400
+
+    # only active listings are ranked, and sold ones drop out before the next refresh
+    draft = create("D", "Nairobi")
+    client.patch(f"/listings/{draft}", headers=auth_headers(agent_token), json={"status": "draft"})
+    db.session.add(ListingViewDaily(listing_id=draft, day=today, views=99))
+    db.session.commit()
+    recompute_popular(top_n=10, now=now)
+    assert ranked(window="1d") == [(nairobi, 5)]
+    client.patch(f"/listings/{nairobi}", headers=auth_headers(agent_token), json={"status": "sold"})
+    assert ranked(window="1d") == []
+
+
+def test_similar_listings_rank_alike_and_nearby_first(app, client, agent_token):
+    from app.similarity import get_similarity_index
+
+    headers = auth_headers(agent_token)
+
+    def create(title, price, bedrooms, lat, lng, property_type="apartment", status="active"):
+        return client.post("/listings", headers=headers, json={
+            "title": title, "price": price, "bedrooms": bedrooms, "bathrooms": 1,
+            "property_type": property_type, "status": status, "lat": lat, "lng": lng,
+        }).get_json()["id"]
+
+    target = create("Target", 80000, 2, -1.2900, 36.7800)
+    twin = create("Twin", 82000, 2, -1.2910, 36.7810)
+    pricier = create("Pricier", 300000, 4, -1.2905, 36.7805)
+    house = create("House", 80000, 2, -1.2920, 36.7790, property_type="house")
+    create("Rented", 80000, 2, -1.2901, 36.7801, status="rented")
+    create("Far away", 80000, 2, -4.0435, 39.6682)  # Mombasa
+
+    resp = client.get(f"/listings/{target}/similar")
+    assert resp.status_code == 200
+    assert [item["id"] for item in resp.get_json()["items"]] == [twin, house, pricier]
+
+    # writes through the API update the built index without a rebuild
+    added = create("Added", 80500, 2, -1.2900, 36.7801)
+    client.patch(f"/listings/{twin}", headers=headers, json={"status": "rented"})
+    client.delete(f"/listings/{house}", headers=headers)
+    items = client.get(f"/listings/{target}/similar?k=2").get_json()["items"]
+    assert [item["id"] for item in items] == [added, pricier]
+    assert items[0]["distance_km"] < 0.1
+
+    index = get_similarity_index()
+    assert len(index) == 4  # target, pricier, added, far away
+    index.reload()
+    assert len(index) == 4  # target, pricier, added, far away
+    assert client.get("/listings/999/similar").status_code == 404
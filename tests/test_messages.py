@@ -0,0 +1,141 @@
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_listing(client, token):
+    resp = client.post(
+        "/listings",
+        headers=auth_headers(token),
+        json={"title": "Message Test Listing", "price": 60000, "city": "Nairobi"},
+    )
+    assert resp.status_code == 201
+    return resp.get_json()["id"]
+
+
+def send_message(client, listing_id, email="prospect@example.com"):
+    resp = client.post(
+        "/messages",
+        json={
+            "listing_id": listing_id,
+            "name": "Prospect",
+            "email": email,
+            "content": "Is this still available?",
+        },
+    )
+    assert resp.status_code == 201
+    return resp.get_json()["id"]
+
+
+def test_message_detail_owner_only(client, agent_token):
+    listing_id = create_listing(client, agent_token)
+    message_id = send_message(client, listing_id)
+
+    resp = client.get(f"/messages/{message_id}", headers=auth_headers(agent_token))
+    assert resp.status_code == 200
+    assert resp.get_json()["content"] == "Is this still available?"
+
+    other = client.post(
+        "/auth/register",
+        json={"name": "Other", "email": "other@test.com", "password": "pass123", "is_agent": True},
+    ).get_json()["access_token"]
+    resp = client.get(f"/messages/{message_id}", headers=auth_headers(other))
+    assert resp.status_code == 403
+
+    resp = client.get("/messages/9999", headers=auth_headers(agent_token))
+    assert resp.status_code == 404
+
+
+def test_threads_group_by_sender_with_unread_counts(client, agent_token):
+    listing_id = create_listing(client, agent_token)
+    first = send_message(client, listing_id, "a@example.com")
+    send_message(client, listing_id, "a@example.com")
+    send_message(client, listing_id, "b@example.com")
+
+    resp = client.patch(
+        f"/messages/{first}", headers=auth_headers(agent_token), json={"is_read": True}
+    )
+    assert resp.status_code == 200
+    assert resp.get_json()["is_read"] is True
+
+    resp = client.get("/messages/threads", headers=auth_headers(agent_token))
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["total"] == 2
+    threads = {t["email"]: t for t in data["items"]}
+    assert threads["a@example.com"]["message_count"] == 2
+    assert threads["a@example.com"]["unread_count"] == 1
+    assert threads["b@example.com"]["unread_count"] == 1
+    assert data["items"][0]["email"] == "b@example.com"
+
+    resp = client.get("/messages?unread=1", headers=auth_headers(agent_token))
+    assert resp.get_json()["total"] == 2
+
+
+def test_batched_ingestion_queues_and_applies_backpressure(app, client, agent_token):
+    from app.ingest import get_message_ingestor
+    from app.models import Message
+
+    app.config.update(
+        MESSAGE_INGEST_MODE="batched",
+        MESSAGE_BATCH_MAX_ROWS=100,
+        MESSAGE_BATCH_INTERVAL_MS=60000,
+        MESSAGE_QUEUE_SIZE=2,
+    )
+    listing_id = create_listing(client, agent_token)
+    payload = {"listing_id": listing_id, "name": "P", "email": "p@example.com", "content": "Hi"}
+
+    assert client.post("/messages", json=payload).status_code == 202
+    assert client.post("/messages", json=payload).status_code == 202
+    resp = client.post("/messages", json=payload)
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "2"
+    assert Message.query.count() == 0
+
+    ingestor = get_message_ingestor()
+    ingestor.stop()
+    assert Message.query.count() == 2
+
+
+def test_batched_ingestion_drops_only_the_rejected_row(app, client, agent_token):
+    from app.ingest import get_message_ingestor
+    from app.models import Message
+
+    app.config.update(MESSAGE_INGEST_MODE="batched", MESSAGE_BATCH_INTERVAL_MS=60000)
+    listing_id = create_listing(client, agent_token)
+    ingestor = get_message_ingestor()
+    good = {"listing_id": listing_id, "name": "P", "email": "p@example.com", "content": "Hi"}
+    ingestor.submit(good)
+    ingestor.submit({**good, "content": None})  # rejected by the database
+    ingestor.submit({**good, "name": "Q"})
+
+    assert ingestor.flush() == 2
+    assert sorted(m.name for m in Message.query) == ["P", "Q"]
+    ingestor.stop()
+
+
+def test_batched_ingestion_keeps_rows_while_the_database_is_down(app, client, agent_token, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    from app.ingest import MessageIngestor, get_message_ingestor
+    from app.models import Message
+
+    app.config.update(MESSAGE_INGEST_MODE="batched", MESSAGE_BATCH_INTERVAL_MS=60000)
+    listing_id = create_listing(client, agent_token)
+    ingestor = get_message_ingestor()
+    for name in ("P", "Q"):
+        ingestor.submit({"listing_id": listing_id, "name": name, "email": "p@example.com",
+                         "content": "Hi"})
+
+    insert = MessageIngestor._insert
+
+    def down(rows):
+        raise OperationalError("INSERT", {}, Exception("connection refused"))
+
+    monkeypatch.setattr(MessageIngestor, "_insert", staticmethod(down))
+    assert ingestor.flush() == 0
+    assert ingestor.pending() == 2
+
+    monkeypatch.setattr(MessageIngestor, "_insert", staticmethod(insert))
+    assert ingestor.flush() == 2
+    assert sorted(m.name for m in Message.query) == ["P", "Q"]
+    ingestor.stop()
@@ -0,0 +1,50 @@
+def metric(body, line_prefix):
+    for line in body.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_metrics_count_requests_and_queries(client):
+    client.get("/listings")
+    client.get("/listings")
+    client.get("/nope")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+    body = resp.get_data(as_text=True)
+
+    assert metric(body, 'http_requests_total{endpoint="/listings",method="GET",status="200"}') == 2
+    assert metric(body, 'http_requests_total{endpoint="unmatched",method="GET",status="404"}') == 1
+    assert metric(body, 'http_request_duration_seconds_count{endpoint="/listings",method="GET"}') == 2
+    assert metric(body, 'db_queries_total{endpoint="/listings"}') >= 2
+    assert metric(body, 'http_response_bytes_total{endpoint="/listings"}') > 0
+    assert 'endpoint="/metrics"' not in body
+
+
+def test_slow_requests_are_traced_with_sql_and_plans(app, client):
+    app.config.update(TRACE_SLOW_MS=0, TRACE_EXPLAIN=True, TRACE_OUTPUT="buffer", ADMIN_TOKEN="s3cret")
+
+    client.get("/listings?city=Nairobi")
+
+    assert client.get("/admin/traces").status_code == 403
+    resp = client.get("/admin/traces?limit=1", headers={"X-Admin-Token": "s3cret"})
+    assert resp.status_code == 200
+    trace = resp.get_json()["items"][0]
+
+    assert trace["endpoint"] == "/listings"
+    kinds = [s["kind"] for s in trace["spans"]]
+    assert kinds[0] == "request"
+    assert "serialize" in kinds
+    selects = [s for s in trace["spans"] if s["kind"] == "sql"]
+    assert trace["sql_count"] == len(selects) >= 2
+    assert not any("Nairobi" in str(s["parameters"]) for s in selects)
+    assert any("'str(9)'" in str(s["parameters"]) for s in selects)  # '%Nairobi%'
+    assert all("plan" in s for s in selects)
+
+    # values only with the explicit opt-in
+    app.config["TRACE_PARAMETERS"] = True
+    client.get("/listings?city=Nairobi")
+    trace = client.get("/admin/traces?limit=1", headers={"X-Admin-Token": "s3cret"}).get_json()["items"][0]
+    assert any("%Nairobi%" in str(s["parameters"]) for s in trace["spans"] if s["kind"] == "sql")
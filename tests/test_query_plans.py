@@ -0,0 +1,317 @@
+"""
+Query-plan regression checks for the hot queries.
+
+The SQL is built by the same query builders the resources use, run once
+against a seeded database, and the captured statement is re-run under
+EXPLAIN (EXPLAIN QUERY PLAN on SQLite). A hot query fails when its plan falls back to
+a full table scan or a temp B-tree / explicit sort. On SQLite any SCAN of a
+table counts, including a walk of a whole index (SCAN ... USING [COVERING]
+INDEX): only SEARCH narrows the rows. A test that relies on an index-ordered
+walk (ORDER BY ... LIMIT) names that index in allow_walks.
+
+SQLite (in-memory) always runs. Set PLAN_TEST_DATABASE_URL to a scratch
+Postgres database to check the Postgres plans too; its tables are dropped
+and recreated.
+"""
+import os
+import random
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert, text
+
+from app import create_app
+from app.config import Config, engine_options
+from app.extensions import db
+from app.archive import archivable_query
+from app.models.archived_listing import ArchivedListing
+from app.models.booking import Booking
+from app.models.listing import Listing
+from app.models.message import Message
+from app.models.saved_search import SavedSearch
+from app.models.user import User
+from app.alerts import matching_searches_query
+from app.resources.bookings import agent_bookings_query, overlapping_booking_query
+from app.resources.listings import filtered_listings_query, geo_candidates_query
+from app.resources.messages import agent_messages_query
+
+N_AGENTS = 20
+N_LISTINGS = 3000
+N_ARCHIVED = 2000
+N_BOOKINGS = 6000
+N_MESSAGES = 6000
+N_SAVED_SEARCHES = 6000
+
+BACKENDS = ["sqlite"]
+if os.getenv("PLAN_TEST_DATABASE_URL"):
+    BACKENDS.append("postgresql")
+
+
+def seed(rng):
+    now = datetime(2026, 1, 1)
+    db.session.execute(insert(User), [
+        {"id": i, "name": f"Agent {i}", "email": f"agent{i}@plans.test",
+         "password_hash": "x", "is_agent": True}
+        for i in range(1, N_AGENTS + 1)
+    ])
+    db.session.execute(insert(Listing), [
+        {
+            "id": i,
+            "title": f"Listing {i}",
+            "price": rng.randrange(10_000, 500_000),
+            "bedrooms": rng.randrange(0, 6),
+            "bathrooms": rng.randrange(1, 4),
+            "property_type": rng.choice(["apartment", "house", "studio", "land", "office"]),
+            "status": rng.choice(["active"] * 2 + ["pending", "sold", "rented", "draft"]),
+            "city": rng.choice(["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika"]),
+            "lat": rng.uniform(-60, 60),
+            "lng": rng.uniform(-179, 179),
+            "agent_id": rng.randrange(1, N_AGENTS + 1),
+            "created_at": now - timedelta(minutes=i),
+            "status_changed_at": now - timedelta(days=rng.randrange(0, 400)),
+        }
+        for i in range(1, N_LISTINGS + 1)
+    ])
+    db.session.execute(insert(ArchivedListing), [
+        {
+            "id": i,
+            "title": f"Listing {i}",
+            "price": rng.randrange(10_000, 500_000),
+            "status": rng.choice(["sold", "rented"]),
+            "city": rng.choice(["Nairobi", "Mombasa", "Kisumu"]),
+            "lat": rng.uniform(-60, 60),
+            "lng": rng.uniform(-179, 179),
+            "images": [],
+            "agent_id": rng.randrange(1, N_AGENTS + 1),
+            "created_at": now - timedelta(days=400, minutes=i),
+        }
+        for i in range(N_LISTINGS + 1, N_LISTINGS + N_ARCHIVED + 1)
+    ])
+    bookings = []
+    for i in range(1, N_BOOKINGS + 1):
+        start = date(2026, 1, 1) + timedelta(days=rng.randrange(0, 365))
+        bookings.append({
+            "id": i,
+            "listing_id": rng.randrange(1, N_LISTINGS + 1),
+            "guest_name": f"Guest {i}",
+            "start_date": start,
+            "end_date": start + timedelta(days=rng.randrange(0, 14)),
+            "status": rng.choice(["pending", "confirmed", "cancelled"]),
+        })
+    db.session.execute(insert(Booking), bookings)
+    db.session.execute(insert(Message), [
+        {
+            "id": i,
+            "listing_id": rng.randrange(1, N_LISTINGS + 1),
+            "name": f"Sender {i}",
+            "email": f"sender{i % 500}@plans.test",
+            "content": "Is this still available?",
+            "is_read": rng.random() < 0.5,
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(1, N_MESSAGES + 1)
+    ])
+    searches = []
+    for i in range(1, N_SAVED_SEARCHES + 1):
+        city = rng.choice([None, "Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika"])
+        ptype = rng.choice([None, "apartment", "house", "studio", "land", "office"])
+        min_price = rng.choice([None, rng.randrange(10_000, 300_000)])
+        searches.append({
+            "id": i,
+            "user_id": rng.randrange(1, N_AGENTS + 1),
+            "city": city,
+            "property_type": ptype,
+            "min_price": min_price,
+            "max_price": rng.choice([None, (min_price or 0) + rng.randrange(20_000, 200_000)]),
+            "city_key": (city or "").lower(),
+            "property_type_key": ptype or "",
+            "price_floor": min_price or 0,
+        })
+    db.session.execute(insert(SavedSearch), searches)
+    db.session.commit()
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+
+@pytest.fixture(scope="module", params=BACKENDS)
+def plan_db(request):
+    if request.param == "sqlite":
+        app = create_app()
+    else:
+        url = os.environ["PLAN_TEST_DATABASE_URL"]
+
+        class PlanConfig(Config):
+            SQLALCHEMY_DATABASE_URI = url
+            SQLALCHEMY_ENGINE_OPTIONS = engine_options(url)
+            AUTO_CREATE_TABLES = False
+
+        app = create_app(PlanConfig())
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(random.Random(38))
+        yield request.param
+        db.session.remove()
+        db.drop_all()
+
+
+def capture(run):
+    """The first SELECT (with parameters) executed by `run()`.
+
+    Later statements are eager loads of the page's rows (listing images),
+    which touch a handful of rows by key.
+    """
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    assert captured, "query builder ran no SELECT"
+    return captured[0]
+
+
+def query_plan(backend, statement, parameters):
+    with db.engine.connect() as conn:
+        if backend == "sqlite":
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [row[3] for row in rows]
+        # make the planner prefer anything over a seq scan / sort, so
+        # seeing one means no index can serve the query
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        conn.exec_driver_sql("SET enable_sort = off")
+        rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+        return [row[0] for row in rows]
+
+
+TABLES = ("listing", "archived_listing", "booking", "message", "user")
+
+SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?")
+SQLITE_SORT = re.compile(r"USE TEMP B-TREE")
+PG_SCAN = re.compile(r"Seq Scan on (\w+)")
+PG_SORT = re.compile(r"\bSort\b(?! Key)")
+
+
+def plan_problems(backend, plan, allow_sort, allow_walks=()):
+    problems = []
+    for line in plan:
+        if backend == "sqlite":
+            scan, sort = SQLITE_SCAN.search(line), SQLITE_SORT.search(line)
+            if scan and scan.group(2) in allow_walks:
+                scan = None
+        else:
+            scan, sort = PG_SCAN.search(line), PG_SORT.search(line)
+        if scan and scan.group(1).strip('"') in TABLES:
+            problems.append(line)
+        if sort and not allow_sort:
+            problems.append(line)
+    return problems
+
+
+def assert_indexed(backend, run, allow_sort=False, allow_walks=()):
+    statement, parameters = capture(run)
+    plan = query_plan(backend, statement, parameters)
+    problems = plan_problems(backend, plan, allow_sort, allow_walks)
+    assert not problems, (
+        f"{backend} plan regressed ({problems}):\n{statement}\n" + "\n".join(plan)
+    )
+
+
+def listing_case(args, allow_walks=()):
+    case_id = ",".join(f"{k}={v}" for k, v in args.items()) or "default"
+    return pytest.param(args, allow_walks, id=case_id)
+
+
+@pytest.mark.parametrize("args,allow_walks", [
+    listing_case({}),
+    listing_case({"status": "active"}),
+    listing_case({"property_type": "house"}),
+    listing_case({"status": "active", "sort": "-created_at"}),
+    # a price-ordered page walks ix_listing_price and stops after 20 active rows
+    listing_case({"sort": "price"}, allow_walks=("ix_listing_price",)),
+    listing_case({"sort": "-price"}, allow_walks=("ix_listing_price",)),
+    listing_case({"min_price": "100000", "max_price": "120000", "sort": "price"}),
+    listing_case({"city": "Nairobi"}),
+    listing_case({"bedrooms": "2", "bathrooms": "2"}),
+])
+def test_listing_filters_use_indexes(plan_db, args, allow_walks):
+    # the page query; the COUNT of a non-indexable filter is a scan by nature
+    assert_indexed(
+        plan_db, lambda: filtered_listings_query(args).limit(20).all(), allow_walks=allow_walks
+    )
+
+
+@pytest.mark.parametrize("center", [(-1.29, 36.78, 10), (45.0, 179.9, 50), (0.0, 0.0, 500)])
+def test_geo_candidates_use_bounding_box(plan_db, center):
+    assert_indexed(plan_db, lambda: geo_candidates_query(*center).all())
+    assert_indexed(
+        plan_db, lambda: geo_candidates_query(*center, status=None, model=ArchivedListing).all()
+    )
+
+
+def test_archive_scan_uses_index(plan_db):
+    cutoff = datetime(2026, 1, 1) - timedelta(days=180)
+    assert_indexed(
+        plan_db,
+        lambda: db.session.scalars(archivable_query(cutoff, ["sold", "rented"]).limit(500)).all(),
+    )
+
+
+def test_booking_overlap_check_uses_index(plan_db):
+    assert_indexed(
+        plan_db,
+        lambda: overlapping_booking_query(7, date(2026, 3, 1), date(2026, 3, 5)).first(),
+    )
+
+
+# The agent joins sort rows gathered from many listings, so a sort step is
+# expected; what must not happen is a scan of booking or message.
+@pytest.mark.parametrize("status", [None, "pending"])
+def test_agent_bookings_join_uses_indexes(plan_db, status):
+    assert_indexed(
+        plan_db, lambda: agent_bookings_query(3, status).limit(20).all(), allow_sort=True
+    )
+
+
+@pytest.mark.parametrize("unread", [False, True])
+def test_agent_messages_join_uses_indexes(plan_db, unread):
+    assert_indexed(
+        plan_db, lambda: agent_messages_query(3, unread).limit(20).all(), allow_sort=True
+    )
+
+
+def test_plan_check_catches_missing_index(plan_db):
+    # guard against the checker itself going blind
+    statement, parameters = capture(
+        lambda: Listing.query.filter(Listing.title == "Listing 5").all()
+    )
+    plan = query_plan(plan_db, statement, parameters)
+    assert plan_problems(plan_db, plan, allow_sort=False)
+
+
+def test_plan_check_catches_full_index_walk():
+    # a walk of a whole index is a scan too, unless the test allows it
+    for line in ("SCAN listing USING INDEX ix_listing_price",
+                 "SCAN listing USING COVERING INDEX ix_listing_status_created"):
+        assert plan_problems("sqlite", [line], allow_sort=False)
+    assert not plan_problems(
+        "sqlite", ["SCAN listing USING INDEX ix_listing_price"], allow_sort=False,
+        allow_walks=("ix_listing_price",),
+    )
+    assert not plan_problems(
+        "sqlite", ["SEARCH listing USING INDEX ix_listing_status_created (status=?)"],
+        allow_sort=False,
+    )
+
+
+@pytest.mark.parametrize("listing_id", [1, 2, 3])
+def test_saved_search_matching_probes_buckets(plan_db, listing_id):
+    listing = db.session.get(Listing, listing_id)
+    assert_indexed(plan_db, lambda: matching_searches_query(listing).all())
@@ -0,0 +1,90 @@
+from app.ratelimit import MemoryBackend, _slots, parse_limit
+
+SEARCH = "/listings/search?lat=-1.29&lng=36.78"
+
+
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_login_is_rate_limited_per_client(app, client):
+    app.config["RATE_LIMITS"] = {"login": "3/minute"}
+    creds = {"email": "nobody@test.com", "password": "wrong"}
+
+    for _ in range(3):
+        assert client.post("/auth/login", json=creds).status_code == 401
+    resp = client.post("/auth/login", json=creds)
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+
+    # another address has its own budget
+    other = client.post("/auth/login", json=creds, environ_base={"REMOTE_ADDR": "10.0.0.9"})
+    assert other.status_code == 401
+
+
+def test_forwarded_for_is_only_trusted_behind_a_configured_proxy(app, client):
+    from app import create_app
+    from app.config import Config
+    from app.extensions import db
+
+    creds = {"email": "nobody@test.com", "password": "wrong"}
+
+    def login(client, address):
+        return client.post("/auth/login", json=creds, headers={"X-Forwarded-For": address}).status_code
+
+    # no proxy by default: a made-up X-Forwarded-For does not buy a new budget
+    app.config["RATE_LIMITS"] = {"login": "1/minute"}
+    assert login(client, "203.0.113.5") == 401
+    assert login(client, "198.51.100.7") == 429
+
+    class ProxiedConfig(Config):
+        PROXY_FIX_X_FOR = 1
+        RATE_LIMITS = {"login": "1/minute"}
+
+    proxied = create_app(ProxiedConfig())
+    with proxied.app_context():
+        db.create_all()
+        client = proxied.test_client()
+        assert login(client, "203.0.113.5") == 401
+        assert login(client, "203.0.113.5") == 429
+        assert login(client, "198.51.100.7") == 401  # same proxy, another client
+
+
+def test_token_holders_are_limited_by_identity(app, client, agent_token):
+    app.config["RATE_LIMITS"] = {"search": "2/minute"}
+
+    assert client.get(SEARCH).status_code == 200
+    assert client.get(SEARCH).status_code == 200
+    assert client.get(SEARCH).status_code == 429
+    # same IP, but the token is its own client
+    assert client.get(SEARCH, headers=auth_headers(agent_token)).status_code == 200
+
+
+def test_sliding_window_weights_previous_window():
+    backend = MemoryBackend()
+    assert parse_limit("4/minute") == (4, 60)
+    assert parse_limit("5/30s") == (5, 30)
+
+    for t in (0, 1, 2, 3):
+        assert backend.hit("k", 4, 60, now=t)[0]
+    allowed, retry_after = backend.hit("k", 4, 60, now=30)
+    assert not allowed and retry_after == 30
+
+    # 15s into the next window 3/4 of the previous 4 still count
+    assert backend.hit("k", 4, 60, now=75)[0]  # 3 + 0 used
+    assert not backend.hit("k", 4, 60, now=75)[0]  # 3 + 1 used
+    assert backend.hit("k", 4, 60, now=90)[0]  # 2 + 1 used
+
+
+def test_search_sheds_load_over_in_flight_limit(app, client):
+    app.config["LOAD_SHED_LIMITS"] = {"Listings": 1}
+    busy = _slots(app, "Listings", 1)
+
+    busy.acquire()  # one search already in flight
+    try:
+        resp = client.get(SEARCH)
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == str(app.config["LOAD_SHED_RETRY_AFTER"])
+    finally:
+        busy.release()
+    assert client.get(SEARCH).status_code == 200
@@ -0,0 +1,122 @@
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def register_buyer(client, email="buyer@test.com"):
+    resp = client.post(
+        "/auth/register",
+        json={"name": "Buyer", "email": email, "password": "pass123"},
+    )
+    return resp.get_json()["access_token"]
+
+
+def create_listing(client, token, **fields):
+    data = {"title": "Listing", "price": 100000, "bedrooms": 3, "bathrooms": 2,
+            "property_type": "house", "city": "Nairobi", **fields}
+    return client.post("/listings", headers=auth_headers(token), json=data).get_json()["id"]
+
+
+def test_listing_writes_queue_alerts_for_matching_searches(app, client, agent_token):
+    from app.alerts import get_alert_matcher
+    from app.events import get_event_backend
+
+    buyer = register_buyer(client)
+    headers = auth_headers(buyer)
+
+    def save(**filters):
+        resp = client.post("/saved-searches", headers=headers, json=filters)
+        assert resp.status_code == 201
+        return resp.get_json()["id"]
+
+    app.config["SEARCH_ALERT_PUSH"] = True  # one process: the memory backend reaches the stream
+    karen = save(name="3BR in Karen", city="nairobi", property_type="house",
+                 bedrooms=3, max_price=150000, lat=-1.3197, lng=36.7073, radius_km=3)
+    anything = save(name="Anything under 60k", max_price=60000)
+    save(name="Mombasa", city="Mombasa")
+
+    in_karen = create_listing(client, agent_token, title="Karen house", lat=-1.3200, lng=36.7100)
+    westlands = create_listing(client, agent_token, title="Westlands house", lat=-1.2670, lng=36.8040)
+    pricey = create_listing(client, agent_token, title="Karen mansion", price=400000,
+                            lat=-1.3190, lng=36.7080)
+    create_listing(client, agent_token, title="Draft", price=50000, status="draft")
+
+    matcher = get_alert_matcher()
+    assert matcher.pending() == 4
+    assert matcher.flush() == (1, 1)  # only the Karen house matches
+
+    # a price drop makes the mansion match; editing it again alerts nobody twice
+    for price in (140000, 130000):
+        client.patch(f"/listings/{pricey}", headers=auth_headers(agent_token), json={"price": price})
+    client.patch(f"/listings/{westlands}", headers=auth_headers(agent_token), json={"price": 55000})
+    assert matcher.flush() == (2, 2)
+    assert matcher.flush() == (0, 0)
+
+    alerts = client.get("/saved-searches/alerts", headers=headers).get_json()["items"]
+    assert [(a["saved_search_id"], a["listing"]["id"]) for a in alerts] == [
+        (karen, pricey), (anything, westlands), (karen, in_karen),
+    ]
+    assert all(a["delivered_at"] for a in alerts)
+
+    buyer_id = alerts[0]["user_id"]
+    events = get_event_backend().read(buyer_id, "0", timeout=0)
+    assert [e.type for e in events] == ["search.alerts", "search.alerts"]
+    assert [a["listing_id"] for a in events[1].data["alerts"]] == [westlands, pricey]
+
+    # the agent's own listings never alert the agent
+    client.post("/saved-searches", headers=auth_headers(agent_token), json={"city": "Nairobi"})
+    create_listing(client, agent_token, title="Own listing")
+    assert matcher.flush() == (0, 0)
+    mine = client.get("/saved-searches/alerts", headers=auth_headers(agent_token)).get_json()
+    assert mine["items"] == []
+
+    # malformed paging arguments fall back to the defaults
+    resp = client.get("/saved-searches/alerts?limit=abc&before_id=x", headers=headers)
+    assert resp.status_code == 200 and resp.get_json()["count"] == 3
+    assert client.get("/saved-searches/alerts?limit=-5", headers=headers).get_json()["count"] == 1
+
+
+def test_saved_search_crud_and_validation(client, agent_token):
+    buyer = register_buyer(client)
+    other = register_buyer(client, "other@test.com")
+
+    resp = client.post("/saved-searches", headers=auth_headers(buyer), json={"radius_km": 5})
+    assert resp.status_code == 400
+    resp = client.post("/saved-searches", headers=auth_headers(buyer), json={"bedrooms": "three"})
+    assert resp.status_code == 400
+
+    search_id = client.post(
+        "/saved-searches", headers=auth_headers(buyer), json={"city": "Nairobi", "max_price": 200000}
+    ).get_json()["id"]
+    listed = client.get("/saved-searches", headers=auth_headers(buyer)).get_json()
+    assert [(s["id"], s["city"], s["max_price"]) for s in listed] == [(search_id, "Nairobi", 200000)]
+    assert client.get("/saved-searches", headers=auth_headers(other)).get_json() == []
+
+    assert client.delete(f"/saved-searches/{search_id}", headers=auth_headers(other)).status_code == 404
+    assert client.delete(f"/saved-searches/{search_id}", headers=auth_headers(buyer)).status_code == 200
+    assert client.get("/saved-searches", headers=auth_headers(buyer)).get_json() == []
+
+
+def test_each_alert_batch_is_claimed_by_one_worker(app, client, agent_token):
+    from app.alerts import claim_alerts, deliver_alerts, match_listings
+
+    client.post("/saved-searches", headers=auth_headers(register_buyer(client)), json={})
+    ids = [create_listing(client, agent_token, title=f"Listing {n}") for n in range(3)]
+    assert match_listings(ids) == 3
+
+    # another worker's matcher got to the first two
+    assert [a.listing_id for a in claim_alerts(2)] == ids[:2]
+    assert deliver_alerts(10) == 1
+    assert claim_alerts(10) == [] and deliver_alerts(10) == 0
+
+
+def test_alerts_stay_in_the_feed_without_a_shared_event_backend(app, client, agent_token):
+    from app.alerts import get_alert_matcher
+
+    assert app.config["SEARCH_ALERT_PUSH"] is False  # memory events backend
+    headers = auth_headers(register_buyer(client))
+    client.post("/saved-searches", headers=headers, json={})
+    create_listing(client, agent_token)
+
+    assert get_alert_matcher().flush() == (1, 0)
+    alerts = client.get("/saved-searches/alerts", headers=headers).get_json()["items"]
+    assert len(alerts) == 1 and alerts[0]["delivered_at"] is None
@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+def auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+class StubReceiver:
+    """Local HTTP endpoint recording webhook requests; answers `statuses` in order, then 200."""
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.requests.append((self.path, dict(self.headers), body))
+                status = receiver.statuses.pop(0) if receiver.statuses else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def events(self, path):
+        return [json.loads(body)["events"] for p, _, body in self.requests if p == path]
+
+
+@pytest.fixture()
+def receiver():
+    stub = StubReceiver()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def subscribe(client, url, event_types=None):
+    resp = client.post(
+        "/admin/webhooks",
+        headers={"X-Admin-Token": "s3cret"},
+        json={"url": url, **({"event_types": event_types} if event_types else {})},
+    )
+    assert resp.status_code == 201
+    return resp.get_json()
+
+
+def test_events_are_batched_per_subscriber_and_signed(app, client, agent_token, receiver):
+    from app.models import OutboxEvent
+    from app.webhooks import get_webhook_dispatcher
+
+    app.config["ADMIN_TOKEN"] = "s3cret"
+    everything = subscribe(client, receiver.url + "/all")
+    subscribe(client, receiver.url + "/bookings", ["booking.created"])
+    assert client.post(
+        "/admin/webhooks", headers={"X-Admin-Token": "s3cret"},
+        json={"url": receiver.url, "event_types": ["listing.sold"]},
+    ).status_code == 400
+
+    listing_id = client.post(
+        "/listings", headers=auth_headers(agent_token), json={"title": "Hooked", "price": 1000}
+    ).get_json()["id"]
+    booking = {"listing_id": listing_id, "guest_name": "G",
+               "start_date": "2025-12-01", "end_date": "2025-12-02"}
+    assert client.post("/bookings", json=booking).status_code == 201
+    assert client.post("/bookings", json=booking).status_code == 400  # conflict: no event
+    client.post("/messages", json={"listing_id": listing_id, "name": "P",
+                                   "email": "p@example.com", "content": "Hi"})
+    assert OutboxEvent.query.count() == 3
+    assert receiver.requests == []  # nothing is sent on the request path
+
+    assert get_webhook_dispatcher().run_once() == (3, 4, 0)
+    all_events = receiver.events("/all")
+    assert len(all_events) == 1  # one batch
+    assert [e["type"] for e in all_events[0]] == ["listing.created", "booking.created", "message.created"]
+    assert all_events[0][0]["data"]["id"] == listing_id
+    assert [e["type"] for batch in receiver.events("/bookings") for e in batch] == ["booking.created"]
+
+    _, headers, body = next(r for r in receiver.requests if r[0] == "/all")
+    expected = hmac.new(everything["secret"].encode(), body, hashlib.sha256).hexdigest()
+    assert headers["X-Webhook-Signature"] == f"sha256={expected}"
+
+    assert get_webhook_dispatcher().run_once() == (0, 0, 0)
+    listed = client.get("/admin/webhooks", headers={"X-Admin-Token": "s3cret"}).get_json()["items"]
+    assert [s["deliveries"] for s in listed] == [{"delivered": 3}, {"delivered": 1}]
+
+
+def test_failed_batches_retry_with_backoff_then_give_up(app, client, agent_token, receiver):
+    from app.extensions import db
+    from app.models import WebhookDelivery
+    from app.webhooks import backoff_seconds, get_webhook_dispatcher
+
+    app.config.update(ADMIN_TOKEN="s3cret", WEBHOOK_BACKOFF_SECONDS=0, WEBHOOK_MAX_ATTEMPTS=3)
+    flaky = subscribe(client, receiver.url + "/flaky")
+    unreachable = subscribe(client, "http://127.0.0.1:9/unreachable")  # discard port
+
+    client.post("/listings", headers=auth_headers(agent_token), json={"title": "Retry", "price": 1})
+    dispatcher = get_webhook_dispatcher()
+
+    receiver.statuses = [500, 503]
+    assert dispatcher.run_once() == (1, 0, 2)
+    delivery = WebhookDelivery.query.filter_by(subscription_id=flaky["id"]).one()
+    assert (delivery.status, delivery.attempts, delivery.last_error) == ("pending", 1, "HTTP 500")
+
+    assert dispatcher.run_once() == (0, 0, 2)
+    assert dispatcher.run_once() == (0, 1, 1)  # flaky recovers, unreachable gives up
+    db.session.expire_all()
+    statuses = dict(
+        (d.subscription_id, (d.status, d.attempts)) for d in WebhookDelivery.query.all()
+    )
+    assert statuses == {flaky["id"]: ("delivered", 3), unreachable["id"]: ("dead", 3)}
+    assert len(receiver.requests) == 3
+    assert dispatcher.run_once() == (0, 0, 0)
+
+    # exponential, jittered, capped
+    assert all(5 <= backoff_seconds(1, 10, 3600) <= 10 for _ in range(20))
+    assert all(20 <= backoff_seconds(3, 10, 3600) <= 40 for _ in range(20))
+    assert backoff_seconds(30, 10, 3600) <= 3600